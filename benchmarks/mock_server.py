@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+"""Local HTTP server emulating the Cortex Data Lake API for benchmarks.
+
+Serves the in-memory `MockCDL` model from the test-suite over a real
+socket, so benchmarks exercise connection pooling, HTTP parsing and
+compression exactly as against the real service, plus the OAuth2
+`RequestToken` endpoint used by `Credentials.refresh()`.
+
+    with MockServer(MockCDL(rows=100000, page_size=1000), latency=0.005) as s:
+        qs = QueryService(url=s.url, port=s.port)
+
+"""
+
+import base64
+import json
+import os
+import sys
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from tests.mock_cdl import MockCDL, compress  # noqa: E402
+
+
+def make_jwt(exp):
+    """Return an unsigned JWT whose payload only carries `exp`."""
+
+    def encode(claims):
+        raw = json.dumps(claims).encode("utf-8")
+        return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+    return "%s.%s.sig" % (encode({"alg": "none"}), encode({"exp": int(exp)}))
+
+
+class MockServer(object):
+    """Serve a `MockCDL` on a local port from a background thread."""
+
+    def __init__(self, cdl=None, latency=0, token_ttl=3600, cache=True):
+        """
+
+        Args:
+            cdl (MockCDL): API model. Defaults to `MockCDL()`.
+            latency (float): Seconds added to every response. Defaults to `0`.
+            token_ttl (int): Lifetime of issued access tokens, in seconds. Defaults to `3600`.
+            cache (bool): Replay the bytes of `DONE` result pages instead of re-rendering them, so the server spends as little CPU (and GIL) as possible. Defaults to `True`.
+
+        """
+        self.cdl = cdl or MockCDL()
+        self.latency = latency
+        self.token_ttl = token_ttl
+        self.cache = {} if cache else None
+        self.requests = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_port
+
+    @property
+    def url(self):
+        return "http://127.0.0.1"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="mock-cdl-server"
+        )
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counters(self):
+        """Zero the request count and drop the model's request log."""
+        with self._lock:
+            self.requests = 0
+            del self.cdl.requests[:]
+
+    def respond(self, method, path, body, accept_encoding=""):
+        """Return `(status, bytes, headers)` for a request."""
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if path.startswith("/api/oauth2/RequestToken"):
+            with self._lock:
+                self.tokens += 1
+            payload = {
+                "access_token": make_jwt(time.time() + self.token_ttl),
+                "token_type": "Bearer",
+                "expires_in": self.token_ttl,
+            }
+            headers = {"Content-Type": "application/json"}
+            return 200, json.dumps(payload).encode("utf-8"), headers
+        key = (method, path, accept_encoding)
+        if self.cache is not None and key in self.cache:
+            status, content, headers = self.cache[key]
+            return status, content, dict(headers)
+        status, content, headers = self.cdl.dispatch(method, path, body)
+        done_page = (
+            method == "GET"
+            and path.startswith("/query/v2/jobResults/")
+            and b'"rowsInPage"' in content[:4096]
+        )
+        encoding = self.cdl.encoding
+        if encoding and encoding in accept_encoding:
+            content = compress(content, encoding)
+            headers["Content-Encoding"] = encoding
+        if self.cache is not None and done_page:
+            self.cache[key] = (status, content, headers)
+        return status, content, headers
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body are separate writes
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else None
+                status, content, headers = server.respond(
+                    self.command,
+                    self.path,
+                    body,
+                    self.headers.get("Accept-Encoding", ""),
+                )
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_DELETE = _serve
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
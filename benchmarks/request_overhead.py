@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Microbenchmark: per-request client overhead of HTTPClient.
+
+Requests are answered by an in-process adapter that returns a canned
+response, so the numbers measure only the SDK and `requests` work done
+per call, not the network.
+
+    python benchmarks/request_overhead.py [-n 20000]
+
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import requests
+from requests.adapters import BaseAdapter
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake import HTTPClient  # noqa: E402
+
+BODY = b'{"jobId": "abc", "state": "DONE"}'
+
+
+class CannedAdapter(BaseAdapter):
+    def send(self, request, **kwargs):
+        r = requests.Response()
+        r.status_code = 200
+        r.headers["Content-Type"] = "application/json"
+        r._content = BODY
+        r.url = request.url
+        r.request = request
+        return r
+
+    def close(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--number", type=int, default=20000)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    client = HTTPClient(url="https://api.example.com", headers={"X-Tenant": "t"})
+    client.session.mount("https://", CannedAdapter())
+    endpoint = client.endpoint("GET", "/query/v2/jobResults/{job_id}")
+    params = {"pageCursor": "abc", "maxWait": 2000}
+
+    cases = [
+        (
+            "HTTPClient.request()",
+            lambda: client.request(
+                method="GET",
+                endpoint="/query/v2/jobResults/abc",
+                params=params,
+                enforce_json=True,
+            ),
+        ),
+        (
+            "HTTPClient.endpoint()",
+            lambda: endpoint(job_id="abc", params=params, enforce_json=True),
+        ),
+    ]
+    baseline = None
+    print("%-24s %12s %10s" % ("path", "us/request", "relative"))
+    for name, fn in cases:
+        fn()  # warm up
+        best = min(timeit.repeat(fn, number=args.number, repeat=args.repeat))
+        us = best / args.number * 1e6
+        baseline = baseline or us
+        print("%-24s %12.1f %9.2fx" % (name, us, us / baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark: QueryService result iteration against a local mock server.
+
+Each scenario submits a query to an in-process `MockServer`, waits for
+the job to change state from RUNNING to DONE, then drains its results
+with one of the `QueryService` iteration paths. Authentication goes
+through the OAuth2 `RequestToken` endpoint of the mock server. Nothing
+leaves the machine.
+
+Reported per scenario:
+
+- ttfr_ms: time from `create_query()` to the first result row.
+- rows_s, req_s: rows and HTTP requests per second while draining a
+  completed job (best of `--repeat` runs).
+- peak_mib: `tracemalloc` high-water mark of one drain. This includes
+  the mock server's per-request buffers.
+
+    python benchmarks/throughput.py [--rows 100000] [--page-size 1000]
+        [--latency-ms 0] [--encoding gzip] [--json results.json]
+
+Compare `--json` outputs of two releases to catch regressions.
+
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake import Credentials, QueryService  # noqa: E402
+from pan_cortex_data_lake.policies import AdaptiveWait  # noqa: E402
+
+from benchmarks.mock_server import MockCDL, MockServer  # noqa: E402
+
+
+def _pages(pages):
+    for r in pages:
+        yield len(r.json().get("page", {}).get("result", {}).get("data") or ())
+
+
+def _rows(rows):
+    for _ in rows:
+        yield 1
+
+
+SCENARIOS = [
+    ("iter_job_results", lambda qs, job_id: _pages(qs.iter_job_results(job_id))),
+    (
+        "iter_job_results prefetch=2",
+        lambda qs, job_id: _pages(qs.iter_job_results(job_id, prefetch=2)),
+    ),
+    (
+        "iter_job_results workers=4",
+        lambda qs, job_id: _pages(qs.iter_job_results(job_id, workers=4)),
+    ),
+    ("iter_records", lambda qs, job_id: _rows(qs.iter_records(job_id))),
+    (
+        "iter_records valuesArray",
+        lambda qs, job_id: _rows(
+            qs.iter_records(job_id, result_format="valuesArray")
+        ),
+    ),
+]
+
+
+def drain(counts, started=None):
+    """Consume a scenario; return `(rows, seconds from started to first row)`."""
+    started = started or time.perf_counter()
+    first, rows = None, 0
+    for n in counts:
+        if n and first is None:
+            first = time.perf_counter() - started
+        rows += n
+    return rows, first
+
+
+def run(qs, server, scenario, repeat):
+    """Benchmark one scenario and return its measurements."""
+    # fresh job: submit, poll through RUNNING -> DONE, first row
+    started = time.perf_counter()
+    r = qs.create_query(query_params={"query": "SELECT * FROM bench"})
+    job_id = r.json()["jobId"]
+    rows, ttfr = drain(scenario(qs, job_id), started)
+
+    # completed job: throughput, best of `repeat`
+    best = None
+    for _ in range(repeat):
+        server.reset_counters()
+        t = time.perf_counter()
+        n, _ = drain(scenario(qs, job_id))
+        elapsed = time.perf_counter() - t
+        if best is None or elapsed < best[0]:
+            best = (elapsed, n, server.requests)
+
+    # completed job: memory high-water mark
+    tracemalloc.start()
+    try:
+        drain(scenario(qs, job_id))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    elapsed, n, requests = best
+    return {
+        "rows": rows,
+        "ttfr_ms": (ttfr or 0) * 1000,
+        "rows_s": n / elapsed,
+        "req_s": requests / elapsed,
+        "peak_mib": peak / 1048576.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--pending-polls", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--encoding", choices=["gzip", "br", "zstd"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-k", "--scenario", help="Only run scenarios containing this")
+    parser.add_argument("--json", help="Also write results to this file")
+    args = parser.parse_args()
+
+    cdl = MockCDL(
+        rows=args.rows,
+        page_size=args.page_size,
+        pending_polls=args.pending_polls,
+        encoding=args.encoding,
+    )
+    results = {}
+    with MockServer(cdl, latency=args.latency_ms / 1000.0) as server:
+        with tempfile.TemporaryDirectory() as tmp:
+            credentials = Credentials(
+                client_id="bench",
+                client_secret="bench",
+                refresh_token="bench",
+                token_url=server.url,
+                port=server.port,
+                storage_params={"dbfile": os.path.join(tmp, "credentials.json")},
+            )
+            qs = QueryService(
+                url=server.url,
+                port=server.port,
+                credentials=credentials,
+                wait_policy=AdaptiveWait(base=0.001, long_polls=0, jitter=False),
+            )
+            print(
+                "%-28s %10s %12s %10s %10s"
+                % ("scenario", "ttfr_ms", "rows/s", "req/s", "peak_MiB")
+            )
+            for name, scenario in SCENARIOS:
+                if args.scenario and args.scenario not in name:
+                    continue
+                res = results[name] = run(qs, server, scenario, args.repeat)
+                if res["rows"] != args.rows:
+                    raise SystemExit(
+                        "%s: expected %d rows, got %d" % (name, args.rows, res["rows"])
+                    )
+                print(
+                    "%-28s %10.1f %12.0f %10.1f %10.2f"
+                    % (
+                        name,
+                        res["ttfr_ms"],
+                        res["rows_s"],
+                        res["req_s"],
+                        res["peak_mib"],
+                    )
+                )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"args": vars(args), "results": results}, f, indent=2, sort_keys=True
+            )
+
+
+if __name__ == "__main__":
+    main()
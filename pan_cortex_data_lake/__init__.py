@@ -6,7 +6,9 @@ __author__ = "Palo Alto Networks"
 __version__ = "2.0.0b1"
 
 from .exceptions import (  # noqa: F401
+    CircuitOpenError,
     CortexError,
+    DeadlineExceededError,
     HTTPError,
     UnexpectedKwargsError,
     RequiredKwargsError,
@@ -0,0 +1,668 @@
+# -*- coding: utf-8 -*-
+
+"""
+:::info
+Native `asyncio` counterparts of [HTTPClient](httpclient.md#httpclient)
+and [QueryService](query.md#queryservice). Requires Python 3.7+ and the
+optional `httpx` library (`pip install pan-cortex-data-lake[aio]`).
+:::
+
+Examples:
+
+```python
+import asyncio
+
+from pan_cortex_data_lake import Credentials
+from pan_cortex_data_lake.aio import AsyncQueryService
+
+
+async def main():
+    async with AsyncQueryService(credentials=Credentials()) as qs:
+        q = await qs.create_query(query_params={"query": "SELECT 1"})
+        async for page in qs.iter_job_results(job_id=q.json()["jobId"]):
+            print(page.json())
+
+asyncio.run(main())
+```
+
+"""
+
+from __future__ import absolute_import
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from .exceptions import (
+    UnexpectedKwargsError,
+    RequiredKwargsError,
+    HTTPError,
+    CortexError,
+)
+from . import __version__
+from .policies import AdaptiveWait
+from .utils import ApiStats, json_decoder
+
+
+if httpx is not None:
+
+    class AsyncResponse(httpx.Response):
+        """`httpx.Response` that decodes its JSON body at most once."""
+
+        def json(self, **kwargs):
+            """Return the decoded JSON body, decoding it on first access.
+
+            Args:
+                **kwargs: Optional arguments forwarded to `httpx.Response.json()`, which bypasses the cache.
+
+            Returns:
+                Decoded JSON payload.
+
+            """
+            if kwargs:
+                return super(AsyncResponse, self).json(**kwargs)
+            try:
+                return self._payload
+            except AttributeError:
+                pass
+            self._payload = self._decoder(self.content)
+            return self._payload
+
+
+class AsyncHTTPClient(object):
+    """Asynchronous HTTP client for the Cortex™ REST API"""
+
+    def __init__(self, **kwargs):
+        """Persist `AsyncClient()` attributes and implement connection-pooling.
+
+        :::info
+        Built on top of the `httpx` library, `AsyncHTTPClient` mirrors
+        [HTTPClient](httpclient.md#httpclient) but sends requests as
+        coroutines, so a single event loop can keep many requests in
+        flight over one shared connection pool.
+        :::
+
+        Parameters:
+            auto_refresh (bool): Perform token refresh prior to request if `access_token` is `None` or expired. Defaults to `True`.
+            credentials (Credentials): [Credentials](credentials.md#credentials) object. Defaults to `None`.
+            enforce_json (bool): Require properly-formatted JSON or raise [CortexError](exceptions.md#cortexerror). Defaults to `False`.
+            force_trace (bool): If `True`, forces trace and forces `x-request-id` to be returned in the response headers. Defaults to `False`.
+            http2 (bool): Negotiate HTTP/2 so concurrent requests share one connection per host. Requires the `h2` library. Defaults to `False`.
+            json_decoder (str or callable): `json`, `ujson`, `orjson`, `auto` or a callable used to decode response bodies. Defaults to `auto` (fastest installed).
+            port (int): TCP port to append to URL. Defaults to `443`.
+            raise_for_status (bool): If `True`, raises [HTTPError](exceptions.md#httperror) if status_code not in 2XX. Defaults to `False`.
+            url (str): URL to send API requests to - gets combined with `port` and `endpoint` parameter. Defaults to `None`.
+
+        Args:
+            **kwargs: Supported [AsyncClient](https://www.python-httpx.org/api/#asyncclient) parameters.
+
+        """
+        if httpx is None:
+            raise CortexError("AsyncHTTPClient requires the 'httpx' library")
+        self.kwargs = kwargs.copy()  # used for __repr__
+
+        headers = {
+            "Accept": "application/json",
+            "User-Agent": "%s/%s" % ("cortex-data-lake-python", __version__),
+        }
+        headers.update(kwargs.pop("headers", {}))
+
+        # AsyncClient key-word arguments
+        _kwargs = {}
+        for x in [
+            "auth",
+            "cert",
+            "cookies",
+            "http1",
+            "http2",
+            "limits",
+            "params",
+            "proxy",
+            "timeout",
+            "transport",
+            "trust_env",
+            "verify",
+        ]:
+            if x in kwargs:
+                _kwargs[x] = kwargs.pop(x)
+
+        # Non-httpx key-word arguments
+        self.auto_refresh = kwargs.pop("auto_refresh", True)
+        self.credentials = kwargs.pop("credentials", None)
+        self._token = None  # (credentials, access_token, exp) of the last lookup
+        self._token_lock = None  # asyncio.Lock, created on the running loop
+        self.enforce_json = kwargs.pop("enforce_json", False)
+        self.force_trace = kwargs.pop("force_trace", False)
+        if self.force_trace is True:
+            headers.update({"x-envoy-force-trace": ""})
+        self.json_decoder = json_decoder(kwargs.pop("json_decoder", "auto"))
+        self.port = kwargs.pop("port", 443)
+        self.raise_for_status = kwargs.pop("raise_for_status", False)
+        self.url = kwargs.pop("url", "https://api.us.cdl.paloaltonetworks.com")
+
+        if len(kwargs) > 0:  # Handle invalid kwargs
+            raise UnexpectedKwargsError(kwargs)
+
+        try:
+            self.session = httpx.AsyncClient(headers=headers, **_kwargs)
+        except ImportError as e:  # http2=True without h2
+            raise CortexError("Module import error: %s" % e)
+        logger.debug("Default headers applied: %r" % self.session.headers)
+        self.stats = ApiStats({"transactions": 0})
+
+    def __repr__(self):
+        for k in self.kwargs.get("headers", {}):
+            if k.lower() == "authorization":
+                x = dict(self.kwargs["headers"].items())
+                x[k] = "*" * 6  # starrify token
+                return "{}({}, {})".format(
+                    self.__class__.__name__,
+                    ", ".join(
+                        "%s=%r" % (x, _)
+                        for x, _ in self.kwargs.items()
+                        if x != "headers"
+                    ),
+                    "headers=%r" % x,
+                )
+        return "{}({})".format(
+            self.__class__.__name__, ", ".join("%s=%r" % x for x in self.kwargs.items())
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the underlying connection pool."""
+        await self.session.aclose()
+
+    async def _apply_credentials(self, auto_refresh=True, credentials=None, headers=None):
+        """Update Authorization header.
+
+        Same as [HTTPClient._apply_credentials()](httpclient.md#_apply_credentials),
+        except that the credentials lookup, which may read the credentials
+        store, and any token refresh run in the default executor. The
+        token is then reused from memory until it expires or the
+        credentials hold a different `access_token`, so most requests do
+        not leave the event loop at all. Concurrent requests share a
+        single lookup.
+
+        Args:
+            auto_refresh (bool): Perform token refresh if access_token is `None` or expired. Defaults to `True`.
+            credentials (class): Read-only credentials.
+            headers (dict): Request headers.
+
+        """
+        token = self._cached_token(credentials)
+        if token is None:
+            if self._token_lock is None:
+                self._token_lock = asyncio.Lock()
+            async with self._token_lock:
+                token = self._cached_token(credentials)  # looked up meanwhile
+                if token is None:
+                    loop = asyncio.get_running_loop()
+                    token, exp = await loop.run_in_executor(
+                        None, self._lookup_token, auto_refresh, credentials
+                    )
+                    if exp is not None:
+                        self._token = (credentials, token, exp)
+        headers.update({"Authorization": "Bearer {}".format(token)})
+        logger.debug("Credentials applied to authorization header")
+
+    def _cached_token(self, credentials):
+        """Return the remembered token if it is still current, else `None`."""
+        cached = self._token
+        if cached is None or cached[0] is not credentials or cached[2] <= time.time():
+            return None
+        current = getattr(credentials, "access_token_", None)  # in memory only
+        if current is not None and current != cached[1]:
+            return None  # rotated, e.g. refreshed by another client
+        return cached[1]
+
+    @staticmethod
+    def _lookup_token(auto_refresh, credentials):
+        """Resolve, and refresh if needed, an access token; blocking.
+
+        Returns:
+            tuple: `(access_token, exp)`, with `exp` `None` if the token has no expiration.
+
+        """
+        token = credentials.get_credentials().access_token
+        if auto_refresh is True:
+            if token is None:
+                token = credentials.refresh(access_token=None, timeout=10)
+                logger.debug("Token refreshed due to 'None' condition")
+            elif credentials.jwt_is_expired(token):
+                token = credentials.refresh(timeout=10)
+                logger.debug("Token refreshed due to 'expired' condition")
+        try:
+            exp = int(credentials.decode_jwt_payload(token)["exp"])
+        except (CortexError, KeyError, TypeError, ValueError):
+            exp = None  # looked up again on the next request
+        return token, exp
+
+    async def _send_request(self, enforce_json, method, raise_for_status, url, **kwargs):
+        """Send HTTP request.
+
+        Args:
+             enforce_json (bool): Require properly-formatted JSON or raise [CortexError](exceptions.md#cortexerror). Defaults to `False`.
+             method (str): HTTP method.
+             raise_for_status (bool): If `True`, raises [HTTPError](exceptions.md#httperror) if status_code not in 2XX. Defaults to `False`.
+             url (str): Request URL.
+             **kwargs (dict): Re-packed key-word arguments.
+
+         Returns:
+            AsyncResponse: [AsyncResponse()](#asyncresponse) object
+
+        """
+        r = await self.session.request(method, url, **kwargs)
+        r.__class__ = AsyncResponse
+        r._decoder = self.json_decoder
+        if raise_for_status:
+            r.raise_for_status()
+        if enforce_json:
+            if "application/json" in self.session.headers.get("Accept", ""):
+                try:
+                    r.json()
+                except ValueError as e:
+                    raise CortexError("Invalid JSON: {}".format(e))
+        self.stats.incr("transactions")
+        return r
+
+    async def request(self, **kwargs):
+        """Generate HTTP request using given parameters.
+
+        Parameters:
+            enforce_json (bool): Require properly-formatted JSON or raise [HTTPError](exceptions.md#httperror). Defaults to `False`.
+            endpoint (str): URI path to append to URL. Defaults to `empty`.
+            raise_for_status (bool): If `True`, raises [HTTPError](exceptions.md#httperror) if status_code not in 2XX. Defaults to `False`.
+
+        Args:
+            **kwargs: Supported [AsyncClient.request()](https://www.python-httpx.org/api/#asyncclient) parameters.
+
+        Returns:
+            httpx.Response: [Response()](https://www.python-httpx.org/api/#response) object
+
+        Raises:
+            HTTPError: If `raise_for_status = True` and non-2XX HTTP status returned or `HTTPError` raised by httpx.
+            RequiredKwargsError: If `method` kwarg not included in `request()`.
+            UnexpectedKwargsError: If unsupported kwarg is passed.
+
+        """
+        url = kwargs.pop("url", self.url)
+        headers = dict(self.session.headers)
+        headers.update(kwargs.pop("headers", {}))
+
+        # Non-httpx key-word arguments
+        auto_refresh = kwargs.pop("auto_refresh", self.auto_refresh)
+        credentials = kwargs.pop("credentials", self.credentials)
+        endpoint = kwargs.pop("endpoint", "")  # default to empty endpoint
+        enforce_json = kwargs.pop("enforce_json", self.enforce_json)
+        raise_for_status = kwargs.pop("raise_for_status", self.raise_for_status)
+        url = "{}:{}{}".format(url, self.port, endpoint)
+
+        if credentials:
+            logger.debug("Applying method-level credentials")
+            await self._apply_credentials(
+                auto_refresh=auto_refresh, credentials=credentials, headers=headers
+            )
+
+        k = {"headers": headers}
+
+        # Request() overrides
+        for x in ["content", "cookies", "data", "json", "method", "params", "timeout"]:
+            if x in kwargs:
+                k[x] = kwargs.pop(x)
+        if "allow_redirects" in kwargs:
+            k["follow_redirects"] = kwargs.pop("allow_redirects")
+
+        # Handle invalid kwargs
+        if len(kwargs) > 0:
+            raise UnexpectedKwargsError(kwargs)
+
+        try:
+            method = k.pop("method")
+        except KeyError:
+            raise RequiredKwargsError("method")
+
+        # Prepare and send the Request() and return Response()
+        try:
+            r = await self._send_request(
+                enforce_json, method, raise_for_status, url, **k
+            )
+            return r
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            raise HTTPError(e)
+
+
+class AsyncQueryService(object):
+    """An asynchronous Cortex™ Query Service instance."""
+
+    def __init__(self, **kwargs):
+        """
+
+        Parameters:
+            session (AsyncHTTPClient): [AsyncHTTPClient](#asynchttpclient) object. Defaults to `None`.
+            url (str): URL to send API requests to. Later combined with `port` and `endpoint` parameter.
+            wait_policy (WaitPolicy): [WaitPolicy](policies.md#waitpolicy) used while a job is pending or running. Defaults to [AdaptiveWait()](policies.md#adaptivewait).
+
+        Args:
+            **kwargs: Supported [AsyncHTTPClient](#asynchttpclient) parameters.
+
+        """
+        self.kwargs = kwargs.copy()  # used for __repr__
+        self.session = kwargs.pop("session", None)
+        self.wait_policy = kwargs.pop("wait_policy", None) or AdaptiveWait()
+        self._httpclient = self.session or AsyncHTTPClient(**kwargs)
+        self._httpclient.stats.update(
+            {
+                "cancel_job": 0,
+                "create_query": 0,
+                "get_job": 0,
+                "list_jobs": 0,
+                "get_job_results": 0,
+                "records": 0,
+                "results_seconds": 0,
+                "polls": 0,
+                "poll_sleep": 0,
+                "job_waits": OrderedDict(),  # last 1024 jobs
+            }
+        )
+        self.stats = self._httpclient.stats
+        self.url = self._httpclient.url
+        self._debug = logging.getLogger(__name__).debug
+
+    def __repr__(self):
+        for k in self.kwargs.get("headers", {}):
+            if k.lower() == "authorization":
+                x = dict(self.kwargs["headers"].items())
+                x[k] = "*" * 6  # starrify token
+                return "{}({}, {})".format(
+                    self.__class__.__name__,
+                    ", ".join(
+                        "%s=%r" % (x, _)
+                        for x, _ in self.kwargs.items()
+                        if x != "headers"
+                    ),
+                    "headers=%r" % x,
+                )
+        return "{}({})".format(
+            self.__class__.__name__, ", ".join("%s=%r" % x for x in self.kwargs.items())
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the underlying [AsyncHTTPClient](#asynchttpclient)."""
+        await self._httpclient.close()
+
+    async def cancel_job(self, job_id=None, **kwargs):
+        """Cancel a query job.
+
+        Args:
+            job_id (str): Specifies the ID of the query job.
+            **kwargs: Supported [AsyncHTTPClient.request()](#request) parameters.
+
+        Returns:
+            httpx.Response: [Response()](https://www.python-httpx.org/api/#response) object.
+
+        """
+        endpoint = "/query/v2/jobs/{}".format(job_id)
+        r = await self._httpclient.request(
+            method="DELETE", url=self.url, endpoint=endpoint, **kwargs
+        )
+        self.stats.incr("cancel_job")
+        return r
+
+    async def create_query(self, job_id=None, query_params=None, **kwargs):
+        """Create a search request.
+
+        Args:
+            job_id (str): Specifies the ID of the query job. (optional)
+            query_params (dict): Query parameters.
+            **kwargs: Supported [AsyncHTTPClient.request()](#request) parameters.
+
+        Returns:
+            httpx.Response: [Response()](https://www.python-httpx.org/api/#response) object.
+
+        """
+        json = kwargs.pop("json", {})
+        for name, value in [("jobId", job_id), ("params", query_params)]:
+            if value is not None:
+                json.update({name: value})
+        json.update(
+            {
+                "clientType": "cortex-data-lake-python",
+                "clientVersion": "%s" % __version__,
+            }
+        )
+        endpoint = "/query/v2/jobs"
+        r = await self._httpclient.request(
+            method="POST", url=self.url, json=json, endpoint=endpoint, **kwargs
+        )
+        self.stats.incr("create_query")
+        return r
+
+    async def get_job(self, job_id=None, **kwargs):
+        """Get specific job matching criteria.
+
+        Args:
+            job_id (str): Specifies the ID of the query job.
+            **kwargs: Supported [AsyncHTTPClient.request()](#request) parameters.
+
+        Returns:
+            httpx.Response: [Response()](https://www.python-httpx.org/api/#response) object.
+
+        """
+        endpoint = "/query/v2/jobs/{}".format(job_id)
+        r = await self._httpclient.request(
+            method="GET", url=self.url, endpoint=endpoint, **kwargs
+        )
+        self.stats.incr("get_job")
+        return r
+
+    async def get_job_results(
+        self,
+        job_id=None,
+        max_wait=None,
+        offset=None,
+        page_cursor=None,
+        page_number=None,
+        page_size=None,
+        result_format=None,
+        **kwargs
+    ):
+        """Get results for a specific job_id.
+
+        Args:
+            job_id (str): Specifies the ID of the query job.
+            max_wait (int): How long to wait in ms for a job to complete. Max 2000.
+            offset (int): Along with pageSize, offset can be used to page through result set.
+            page_cursor (str): Token/handle that can be used to fetch more data.
+            page_number (int): Return the nth page from the result set as specified by this parameter.
+            page_size (int): If specified, limits the size of a batch of results to the specified value.
+            result_format (str): valuesArray or valuesDictionary.
+            **kwargs: Supported [AsyncHTTPClient.request()](#request) parameters.
+
+        Returns:
+            httpx.Response: [Response()](https://www.python-httpx.org/api/#response) object.
+
+        """
+        params = kwargs.pop("params", {})
+        for name, value in [
+            ("maxWait", max_wait),
+            ("offset", offset),
+            ("pageCursor", page_cursor),
+            ("pageNumber", page_number),
+            ("pageSize", page_size),
+            ("resultFormat", result_format),
+        ]:
+            if value is not None:
+                params.update({name: value})
+        endpoint = "/query/v2/jobResults/{}".format(job_id)
+        started = time.monotonic()
+        r = await self._httpclient.request(
+            method="GET", url=self.url, params=params, endpoint=endpoint, **kwargs
+        )
+        self.stats.incr("get_job_results")
+
+        rows = r.json().get("rowsInPage")
+        if rows is not None:
+            self.stats.incr("records", rows)
+            self.stats.incr("results_seconds", time.monotonic() - started)
+
+        return r
+
+    async def iter_job_results(
+        self,
+        job_id=None,
+        max_wait=None,
+        offset=None,
+        page_cursor=None,
+        page_number=None,
+        page_size=None,
+        result_format=None,
+        **kwargs
+    ):
+        """Retrieve results iteratively in a non-greedy manner using scroll token.
+
+        Args:
+            job_id (str): Specifies the ID of the query job.
+            max_wait (int): How long to wait in ms for a job to complete. Max 2000.
+            offset (int): Along with pageSize, offset can be used to page through result set.
+            page_cursor (str): Token/handle that can be used to fetch more data.
+            page_number (int): Return the nth page from the result set as specified by this parameter.
+            page_size (int): If specified, limits the size of a batch of results to the specified value.
+            result_format (str): valuesArray or valuesJson.
+            wait_policy (WaitPolicy): Override the instance [WaitPolicy](policies.md#waitpolicy).
+            **kwargs: Supported [AsyncHTTPClient.request()](#request) parameters.
+
+        Yields:
+            httpx.Response: [Response()](https://www.python-httpx.org/api/#response) object.
+
+        """
+        params = kwargs.pop("params", {})
+        enforce_json = kwargs.pop("enforce_json", True)
+        wait_policy = kwargs.pop("wait_policy", None) or self.wait_policy
+        for name, value in [
+            ("maxWait", max_wait),
+            ("offset", offset),
+            ("pageCursor", page_cursor),
+            ("pageNumber", page_number),
+            ("pageSize", page_size),
+            ("resultFormat", result_format),
+        ]:
+            if value is not None:
+                params.update({name: value})
+
+        long_poll = "maxWait" not in params
+        waiting, polls, sleep, started = True, 0, 0, time.time()
+        while True:
+            if waiting and long_poll:
+                params.pop("maxWait", None)
+                max_wait = wait_policy.max_wait(polls)
+                if max_wait is not None:
+                    params["maxWait"] = max_wait
+            r = await self.get_job_results(
+                job_id=job_id, params=params, enforce_json=enforce_json, **kwargs
+            )
+            r_json = r.json()
+            if r_json["state"] in ("RUNNING", "PENDING"):
+                d = wait_policy.delay(polls)
+                polls += 1
+                if d:
+                    await asyncio.sleep(d)
+                    sleep += d
+                continue
+            if waiting:
+                self._record_wait(job_id, polls, sleep, time.time() - started)
+                waiting = False
+                if long_poll:
+                    params.pop("maxWait", None)
+            if r_json["state"] == "DONE":
+                page_cursor = r_json["page"].get("pageCursor")
+                if page_cursor is not None:
+                    params["pageCursor"] = page_cursor
+                    yield r
+                else:
+                    yield r
+                    break
+            elif r_json["state"] == "FAILED":
+                yield r
+                break
+            else:
+                raise CortexError("Bad state: %s" % r_json["state"])
+
+    def _record_wait(self, job_id, polls, sleep, wait):
+        """Record SDK-side wait accounting for a job.
+
+        `polls` and `poll_sleep` are totals; per-job entries of
+        `job_waits` are kept for the most recent 1024 jobs only.
+
+        Args:
+            job_id (str): Specifies the ID of the query job.
+            polls (int): Number of not-ready responses received.
+            sleep (float): Seconds slept client-side between polls.
+            wait (float): Seconds elapsed until the job left the running state.
+
+        """
+        self.stats.incr("polls", polls)
+        self.stats.incr("poll_sleep", sleep)
+        waits = self.stats.job_waits
+        waits[job_id] = {"polls": polls, "sleep": sleep, "wait": wait}
+        while len(waits) > 1024:
+            waits.popitem(last=False)
+
+    async def list_jobs(
+        self,
+        max_jobs=None,
+        created_after=None,
+        state=None,
+        job_type=None,
+        tenant_id=None,
+        **kwargs
+    ):
+        """Get all jobs matching criteria.
+
+        Args:
+            max_jobs (int): Max number of jobs.
+            created_after (int): List jobs created after this unix epoch UTC datetime.
+            state (str): Job state, e.g. 'RUNNING', 'PENDING', 'FAILED', 'DONE'.
+            job_type (str): Query type hint.
+            tenant_id (str): Tenant ID.
+            **kwargs: Supported [AsyncHTTPClient.request()](#request) parameters.
+
+        Returns:
+            httpx.Response: [Response()](https://www.python-httpx.org/api/#response) object.
+
+        """
+        params = kwargs.pop("params", {})
+        for name, value in [
+            ("maxJobs", max_jobs),
+            ("createdAfter", created_after),
+            ("state", state),
+            ("type", job_type),
+            ("tenantId", tenant_id),
+        ]:
+            if value is not None:
+                params.update({name: value})
+        endpoint = "/query/v2/jobs"
+        r = await self._httpclient.request(
+            method="GET", url=self.url, params=params, endpoint=endpoint, **kwargs
+        )
+        self.stats.incr("list_jobs")
+        return r
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+"""
+:::info
+Per-host circuit breaker for [HTTPClient](httpclient.md#httpclient).
+When a host keeps failing or responding too slowly, its circuit opens
+and further requests fail immediately with
+[CircuitOpenError](exceptions.md#circuitopenerror) instead of tying up
+worker threads until they time out. After `reset_timeout` seconds a
+limited number of probe requests are let through; a successful probe
+closes the circuit, a failed one opens it again.
+:::
+
+Examples:
+
+```python
+from pan_cortex_data_lake import QueryService
+from pan_cortex_data_lake.breaker import CircuitBreaker
+
+qs = QueryService(
+    credentials=c,
+    circuit_breaker=CircuitBreaker(failure_threshold=5, slow_call=10),
+)
+print(qs.stats.circuits)  # {'api.us.cdl.paloaltonetworks.com:443': 'closed'}
+```
+
+"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+
+from .exceptions import CircuitOpenError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker(object):
+    """Thread-safe circuit breaker keyed by host."""
+
+    def __init__(
+        self,
+        failure_threshold=5,
+        reset_timeout=30,
+        slow_call=None,
+        half_open_probes=1,
+        statuses=(500, 502, 503, 504),
+    ):
+        """
+
+        Args:
+            failure_threshold (int): Consecutive failures that open a circuit. Defaults to `5`.
+            reset_timeout (float): Seconds a circuit stays open before probing. Defaults to `30`.
+            slow_call (float): Requests slower than this many seconds count as failures. Defaults to `None` (latency is ignored).
+            half_open_probes (int): Concurrent probe requests allowed while half-open. Defaults to `1`.
+            statuses (tuple): HTTP status codes counted as failures. Defaults to `(500, 502, 503, 504)`.
+
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call = slow_call
+        self.half_open_probes = half_open_probes
+        self.statuses = frozenset(statuses)
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "{}(failure_threshold={!r}, reset_timeout={!r}, slow_call={!r})".format(
+            self.__class__.__name__,
+            self.failure_threshold,
+            self.reset_timeout,
+            self.slow_call,
+        )
+
+    def _circuit(self, host):
+        c = self._circuits.get(host)
+        if c is None:
+            c = self._circuits[host] = {
+                "state": CLOSED,
+                "failures": 0,
+                "opened_at": 0.0,
+                "probes": 0,
+            }
+        return c
+
+    def state(self, host):
+        """Return the state of a host's circuit.
+
+        Args:
+            host (str): Host (`netloc`).
+
+        Returns:
+            str: `closed`, `open` or `half_open`.
+
+        """
+        with self._lock:
+            return self._circuit(host)["state"]
+
+    def states(self):
+        """Return the state of every known circuit.
+
+        Returns:
+            dict: Host to state.
+
+        """
+        with self._lock:
+            return dict((h, c["state"]) for h, c in self._circuits.items())
+
+    def before(self, host):
+        """Admit a request to `host` or fail fast.
+
+        Args:
+            host (str): Host (`netloc`).
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with all probe slots taken.
+
+        """
+        with self._lock:
+            c = self._circuit(host)
+            if c["state"] == OPEN:
+                remaining = c["opened_at"] + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(host, remaining)
+                c["state"], c["probes"] = HALF_OPEN, 0
+            if c["state"] == HALF_OPEN:
+                if c["probes"] >= self.half_open_probes:
+                    raise CircuitOpenError(host)
+                c["probes"] += 1
+
+    def record(self, host, status_code=None, elapsed=None):
+        """Record the outcome of an admitted request.
+
+        Args:
+            host (str): Host (`netloc`).
+            status_code (int): HTTP status code, or `None` if the request raised.
+            elapsed (float): Request duration in seconds. Defaults to `None`.
+
+        Returns:
+            str: New state of the circuit.
+
+        """
+        timed = self.slow_call is not None and elapsed is not None
+        failed = status_code is None or status_code in self.statuses
+        failed = failed or (timed and elapsed > self.slow_call)
+        with self._lock:
+            c = self._circuit(host)
+            if not failed:
+                c["failures"] = 0
+                c["state"] = CLOSED
+            else:
+                c["failures"] += 1
+                if c["state"] == HALF_OPEN or c["failures"] >= self.failure_threshold:
+                    c["state"], c["opened_at"] = OPEN, time.monotonic()
+            return c["state"]
+
+    def reset(self, host=None):
+        """Close one circuit, or all of them.
+
+        Args:
+            host (str): Host (`netloc`). Defaults to `None` (all hosts).
+
+        """
+        with self._lock:
+            if host is None:
+                self._circuits.clear()
+            else:
+                self._circuits.pop(host, None)
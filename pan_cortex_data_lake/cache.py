@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+"""
+:::info
+Opt-in local cache of query results, keyed on normalized
+`query_params`. Entries live in an in-memory LRU tier and, optionally,
+in a gzip-compressed on-disk tier; both expire after a TTL.
+:::
+
+Examples:
+
+```python
+from pan_cortex_data_lake import QueryService
+from pan_cortex_data_lake.cache import ResultCache
+
+qs = QueryService(cache=ResultCache(ttl=60, directory="/var/cache/cdl"))
+```
+
+"""
+
+from __future__ import absolute_import
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache(object):
+    """Two-tier TTL/LRU cache of result pages."""
+
+    def __init__(
+        self,
+        max_entries=128,
+        ttl=300,
+        directory=None,
+        max_disk_entries=1024,
+        max_rows=100000,
+        compresslevel=6,
+    ):
+        """
+
+        Args:
+            max_entries (int): Max entries held in memory. Defaults to `128`.
+            ttl (float): Seconds an entry stays valid. Defaults to `300`.
+            directory (str): Directory of the on-disk tier. Defaults to `None` (memory only).
+            max_disk_entries (int): Max entries kept on disk. Defaults to `1024`.
+            max_rows (int): Results with more rows than this are not cached. Defaults to `100000`.
+            compresslevel (int): gzip compression level of the on-disk tier. Defaults to `6`.
+
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self.max_rows = max_rows
+        self.compresslevel = compresslevel
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __repr__(self):
+        return "{}(max_entries={!r}, ttl={!r}, directory={!r})".format(
+            self.__class__.__name__, self.max_entries, self.ttl, self.directory
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(query_params):
+        """Return the cache key of `query_params`.
+
+        :::info
+        Parameters are serialized with sorted keys and the SQL text is
+        stripped of leading and trailing whitespace, so equivalent
+        requests share a key regardless of dict ordering.
+        :::
+
+        Args:
+            query_params (dict): Query parameters passed to `create_query()`.
+
+        Returns:
+            str: Hex digest.
+
+        """
+        params = dict(query_params)
+        if isinstance(params.get("query"), str):
+            params["query"] = params["query"].strip()
+        blob = json.dumps(params, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json.gz")
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key):
+        """Return cached pages for `key` or `None`.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            list: Decoded result pages or `None` on a miss.
+
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                del self._entries[key]
+        if self.directory is None:
+            return None
+        try:
+            with gzip.open(self._path(key), "rt") as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if self._expired(entry["created"]):
+            self._remove(key)
+            return None
+        self._remember(key, entry["created"], entry["pages"])
+        return entry["pages"]
+
+    def put(self, key, pages):
+        """Store result pages.
+
+        Args:
+            key (str): Cache key.
+            pages (list): Decoded result pages.
+
+        Returns:
+            bool: `True` if stored, `False` if the result exceeds `max_rows`.
+
+        """
+        rows = sum(len(p.get("page", {}).get("result", {}).get("data") or ()) for p in pages)
+        if self.max_rows is not None and rows > self.max_rows:
+            return False
+        created = time.time()
+        self._remember(key, created, pages)
+        if self.directory is not None:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as raw:
+                with gzip.GzipFile(
+                    fileobj=raw, mode="wb", compresslevel=self.compresslevel
+                ) as f:
+                    f.write(
+                        json.dumps({"created": created, "pages": pages}).encode("utf-8")
+                    )
+            os.replace(tmp, self._path(key))
+            self._prune()
+        return True
+
+    def _remember(self, key, created, pages):
+        with self._lock:
+            self._entries[key] = (created, pages)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _remove(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _prune(self):
+        files = [
+            os.path.join(self.directory, f)
+            for f in os.listdir(self.directory)
+            if f.endswith(".json.gz")
+        ]
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=os.path.getmtime)
+        for f in files[: len(files) - self.max_disk_entries]:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove all entries from both tiers."""
+        with self._lock:
+            self._entries.clear()
+        if self.directory is not None:
+            for f in os.listdir(self.directory):
+                if f.endswith(".json.gz"):
+                    self._remove(f[: -len(".json.gz")])
+
+
+def convert_page(payload, result_format=None):
+    """Convert a cached page between `valuesArray` and `valuesDictionary`.
+
+    Args:
+        payload (dict): Decoded result page.
+        result_format (str): Requested format. Defaults to `None` (as stored).
+
+    Returns:
+        dict: Page in the requested format, or unchanged if no schema is available.
+
+    """
+    stored = payload.get("resultFormat", "valuesDictionary")
+    fields = (payload.get("schema") or {}).get("fields")
+    if result_format in (None, stored) or not fields:
+        return payload
+    names = [f["name"] for f in fields]
+    data = payload.get("page", {}).get("result", {}).get("data") or []
+    if result_format == "valuesArray":
+        data = [[row.get(n) for n in names] for row in data]
+    else:
+        data = [dict(zip(names, row)) for row in data]
+    page = dict(payload["page"], result=dict(payload["page"]["result"], data=data))
+    return dict(payload, page=page, resultFormat=result_format)
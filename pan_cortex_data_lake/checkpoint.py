@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+:::info
+Page-cursor checkpoints for resumable result iteration. A checkpoint
+records how far a job's results have been handed off to the caller so
+an interrupted drain can continue from there instead of page 1.
+:::
+
+Examples:
+
+```python
+from pan_cortex_data_lake import QueryService
+
+qs = QueryService(credentials=c)
+for page in qs.iter_job_results(job_id=job_id, checkpoint="drain.json"):
+    process(page)
+
+# ...after a crash, pick up where the last handed-off page left off
+for page in qs.iter_job_results(resume_from="drain.json"):
+    process(page)
+```
+
+"""
+
+from __future__ import absolute_import
+
+import json
+import os
+import tempfile
+
+from .exceptions import CortexError
+
+
+class Checkpoint(object):
+    """Small JSON state file tracking a job's iteration position."""
+
+    def __init__(self, path):
+        """
+
+        Args:
+            path (str): State file location.
+
+        """
+        self.path = path
+        self.state = None
+
+    def __repr__(self):
+        return "{}(path={!r}, state={!r})".format(
+            self.__class__.__name__, self.path, self.state
+        )
+
+    @classmethod
+    def coerce(cls, value):
+        """Return `value` as a `Checkpoint`.
+
+        Args:
+            value (str or Checkpoint): State file path or checkpoint.
+
+        Returns:
+            Checkpoint: Checkpoint object, or `None` if `value` is `None`.
+
+        """
+        if value is None or isinstance(value, cls):
+            return value
+        return cls(value)
+
+    def load(self):
+        """Read the persisted state.
+
+        Returns:
+            dict: Checkpoint state, or `None` if the file does not exist.
+
+        Raises:
+            CortexError: If the file cannot be decoded.
+
+        """
+        try:
+            with open(self.path) as f:
+                self.state = json.load(f)
+        except (IOError, OSError):
+            return None
+        except ValueError as e:
+            raise CortexError("Invalid checkpoint %s: %s" % (self.path, e))
+        return self.state
+
+    def save(self, state):
+        """Durably replace the persisted state.
+
+        :::info
+        State is written to a temporary file in the same directory,
+        fsynced and then renamed over the checkpoint, so a crash leaves
+        either the previous or the new state on disk, never a torn one.
+        :::
+
+        Args:
+            state (dict): Checkpoint state.
+
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.state = state
+
+    def clear(self):
+        """Delete the state file."""
+        self.state = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def advance(self, job_id, payload, offset=0):
+        """Record that a result page has been handed off.
+
+        Args:
+            job_id (str): Specifies the ID of the query job.
+            payload (dict): Decoded `jobResults` page.
+            offset (int): Row offset the iteration started from. Defaults to `0`.
+
+        Returns:
+            dict: New checkpoint state.
+
+        """
+        state = self.state if (self.state or {}).get("jobId") == job_id else None
+        state = dict(state or {"jobId": job_id, "offset": offset, "pages": 0})
+        rows_in_job = payload.get("rowsInJob")
+        state["offset"] += payload.get("rowsInPage") or 0
+        state["pages"] += 1
+        state["pageCursor"] = (payload.get("page") or {}).get("pageCursor")
+        state["done"] = state["pageCursor"] is None and (
+            rows_in_job is None or state["offset"] >= rows_in_job
+        )
+        self.save(state)
+        return state
@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+
+"""
+:::info
+Columnar materialization of `valuesArray` result pages. Numeric,
+boolean and timestamp fields are stored in contiguous `array` buffers,
+string fields are dictionary-encoded, and everything can be handed to
+NumPy or pandas without a row-by-row copy.
+:::
+
+Examples:
+
+```python
+from pan_cortex_data_lake import QueryService
+
+qs = QueryService(credentials=c)
+job_id = qs.create_query(query_params={"query": sql}).json()["jobId"]
+df = qs.get_job_columns(job_id=job_id).to_pandas(timestamp_unit="us")
+```
+
+"""
+
+from __future__ import absolute_import
+
+from abc import ABC, abstractmethod
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+from .exceptions import CortexError
+
+INTEGER_TYPES = ("int", "integer", "int32", "int64", "long", "bigint")
+FLOAT_TYPES = ("float", "double", "float32", "float64", "numeric", "decimal")
+BOOLEAN_TYPES = ("bool", "boolean")
+TIMESTAMP_TYPES = ("timestamp", "datetime")
+STRING_TYPES = ("string", "str", "varchar")
+
+
+class Column(ABC):
+    """Base class for column buffers."""
+
+    def __init__(self, name, type_=None):
+        """
+
+        Args:
+            name (str): Field name.
+            type_ (str): Field type as reported by the page schema.
+
+        """
+        self.name = name
+        self.type = type_
+        self.length = 0
+        self.validity = None  # bytearray of 1/0 flags, allocated on first null
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return "{}(name={!r}, type={!r}, length={!r})".format(
+            self.__class__.__name__, self.name, self.type, self.length
+        )
+
+    def _split_nulls(self, values, fill):
+        """Return `values` with `None` replaced by `fill`, and their validity flags."""
+        if None not in values:
+            return values, None
+        flags = bytearray(0 if v is None else 1 for v in values)
+        return [fill if v is None else v for v in values], flags
+
+    def _extend_validity(self, flags, count):
+        """Record validity flags for `count` appended values (`None`: all valid)."""
+        if flags is None:
+            if self.validity is not None:
+                self.validity.extend(b"\x01" * count)
+            return
+        if self.validity is None:
+            self.validity = bytearray(b"\x01" * self.length)
+        self.validity.extend(flags)
+
+    def _mask(self):
+        """Return a NumPy boolean null mask or `None`."""
+        if self.validity is None or all(self.validity):
+            return None
+        return numpy.frombuffer(bytes(self.validity), dtype=numpy.uint8) == 0
+
+    @abstractmethod
+    def extend(self, values):
+        """Append a sequence of values.
+
+        Args:
+            values (sequence): Column values of one page.
+
+        Raises:
+            TypeError: If a value does not fit the column buffer; the column is then unchanged.
+
+        """
+
+    @abstractmethod
+    def to_list(self):
+        """Return the column as a list of Python objects."""
+
+    @abstractmethod
+    def to_numpy(self, timestamp_unit=None):
+        """Return the column as a NumPy array."""
+
+    def to_pandas(self, timestamp_unit=None):
+        """Return the column as a pandas-compatible array."""
+        return self.to_numpy(timestamp_unit=timestamp_unit)
+
+
+class NumericColumn(Column):
+    """Fixed-width numeric, boolean or timestamp column."""
+
+    def __init__(self, name, type_=None, typecode="q"):
+        """
+
+        Args:
+            name (str): Field name.
+            type_ (str): Field type as reported by the page schema.
+            typecode (str): `array` typecode, e.g. `q` (int64), `d` (float64) or `b` (bool).
+
+        """
+        super(NumericColumn, self).__init__(name, type_)
+        self.values = array(typecode)
+
+    @property
+    def is_timestamp(self):
+        return (self.type or "").lower() in TIMESTAMP_TYPES
+
+    def extend(self, values):
+        filled, flags = self._split_nulls(values, 0)
+        converted = array(self.values.typecode, filled)  # may raise; nothing changed yet
+        self._extend_validity(flags, len(converted))
+        self.values.extend(converted)
+        self.length += len(converted)
+
+    def to_list(self):
+        if self.validity is None:
+            return self.values.tolist()
+        return [v if ok else None for v, ok in zip(self.values, self.validity)]
+
+    def to_numpy(self, timestamp_unit=None):
+        if numpy is None:
+            raise CortexError("Module import error: numpy")
+        dtype = {"q": numpy.int64, "d": numpy.float64, "b": numpy.int8}
+        x = numpy.frombuffer(self.values, dtype=dtype[self.values.typecode]).copy()
+        if self.values.typecode == "b":
+            x = x.astype(bool)
+        if timestamp_unit and self.is_timestamp:
+            x = x.view("datetime64[%s]" % timestamp_unit)
+        mask = self._mask()
+        if mask is not None:
+            return numpy.ma.masked_array(x, mask=mask)
+        return x
+
+    def to_pandas(self, timestamp_unit=None):
+        x = self.to_numpy(timestamp_unit=timestamp_unit)
+        if not isinstance(x, numpy.ma.MaskedArray):
+            return x
+        if x.dtype.kind == "i":
+            return pandas.arrays.IntegerArray(x.data, x.mask)
+        if x.dtype.kind == "b":
+            return pandas.arrays.BooleanArray(x.data, x.mask)
+        if x.dtype.kind == "M":
+            return pandas.DatetimeIndex(x.filled(numpy.datetime64("NaT")))
+        return x.filled(numpy.nan)
+
+
+class DictionaryColumn(Column):
+    """Dictionary-encoded column for repeated, hashable values."""
+
+    def __init__(self, name, type_=None):
+        super(DictionaryColumn, self).__init__(name, type_)
+        self.codes = array("i")  # -1 marks a null
+        self.categories = []
+        self.index = {}
+
+    def extend(self, values):
+        index, categories, codes = self.index, self.categories, []
+        for v in values:
+            if v is None:
+                codes.append(-1)
+                continue
+            code = index.get(v)
+            if code is None:
+                code = index[v] = len(categories)
+                categories.append(v)
+            codes.append(code)
+        self.codes.extend(array("i", codes))
+        self.length += len(codes)
+
+    def to_list(self):
+        categories = self.categories + [None]
+        return [categories[c] for c in self.codes]
+
+    def to_numpy(self, timestamp_unit=None):
+        if numpy is None:
+            raise CortexError("Module import error: numpy")
+        categories = numpy.empty(len(self.categories) + 1, dtype=object)
+        categories[:-1] = self.categories  # code -1 selects the trailing None
+        return categories[numpy.frombuffer(self.codes, dtype=numpy.int32)]
+
+    def to_pandas(self, timestamp_unit=None):
+        if pandas is None:
+            raise CortexError("Module import error: pandas")
+        return pandas.Categorical.from_codes(
+            numpy.frombuffer(self.codes, dtype=numpy.int32).copy(),
+            categories=self.categories,
+        )
+
+
+class ObjectColumn(Column):
+    """Column of arbitrary Python objects."""
+
+    def __init__(self, name, type_=None, values=None):
+        super(ObjectColumn, self).__init__(name, type_)
+        self.values = values or []
+        self.length = len(self.values)
+
+    def extend(self, values):
+        self.values.extend(values)
+        self.length += len(values)
+
+    def to_list(self):
+        return list(self.values)
+
+    def to_numpy(self, timestamp_unit=None):
+        if numpy is None:
+            raise CortexError("Module import error: numpy")
+        x = numpy.empty(self.length, dtype=object)
+        x[:] = self.values
+        return x
+
+
+def make_column(name, type_=None, sample=None):
+    """Create a column buffer for a schema field.
+
+    Args:
+        name (str): Field name.
+        type_ (str): Field type as reported by the page schema. Defaults to `None` (infer from `sample`).
+        sample: First non-null value, used when `type_` is missing or unknown.
+
+    Returns:
+        Column: Column buffer.
+
+    """
+    t = (type_ or "").lower()
+    if t in INTEGER_TYPES or t in TIMESTAMP_TYPES:
+        return NumericColumn(name, type_, "q")
+    if t in FLOAT_TYPES:
+        return NumericColumn(name, type_, "d")
+    if t in BOOLEAN_TYPES:
+        return NumericColumn(name, type_, "b")
+    if t in STRING_TYPES:
+        return DictionaryColumn(name, type_)
+    if isinstance(sample, bool):
+        return NumericColumn(name, type_, "b")
+    if isinstance(sample, int):
+        return NumericColumn(name, type_, "q")
+    if isinstance(sample, float):
+        return NumericColumn(name, type_, "d")
+    if isinstance(sample, str):
+        return DictionaryColumn(name, type_)
+    return ObjectColumn(name, type_)
+
+
+class ColumnarResult(object):
+    """Column buffers accumulated from `valuesArray` result pages."""
+
+    def __init__(self):
+        self.columns = []
+        self.rows = 0
+
+    def __len__(self):
+        return self.rows
+
+    def __repr__(self):
+        return "{}(rows={!r}, columns={!r})".format(
+            self.__class__.__name__, self.rows, self.names
+        )
+
+    def __getitem__(self, name):
+        for c in self.columns:
+            if c.name == name:
+                return c
+        raise KeyError(name)
+
+    @property
+    def names(self):
+        """list: Column names in schema order."""
+        return [c.name for c in self.columns]
+
+    @classmethod
+    def from_pages(cls, pages):
+        """Build a result from an iterable of pages.
+
+        Args:
+            pages (iterable): `Response` objects or decoded page payloads.
+
+        Returns:
+            ColumnarResult: Accumulated columns.
+
+        """
+        result = cls()
+        for p in pages:
+            result.append_page(p if isinstance(p, dict) else p.json())
+        return result
+
+    def append_page(self, payload):
+        """Append the rows of one decoded `valuesArray` page.
+
+        :::info
+        The page is transposed with `zip()` and each column is extended
+        in bulk. A column whose values stop fitting its typed buffer is
+        converted to an [ObjectColumn](#objectcolumn).
+        :::
+
+        Args:
+            payload (dict): Decoded `jobResults` response.
+
+        Raises:
+            CortexError: If the page is not in `valuesArray` format.
+
+        """
+        if payload.get("resultFormat", "valuesArray") != "valuesArray":
+            raise CortexError(
+                "Columnar results require resultFormat=valuesArray, got %s"
+                % payload.get("resultFormat")
+            )
+        data = (payload.get("page") or {}).get("result", {}).get("data") or []
+        if not data:
+            return
+        values = list(zip(*data))
+        if not self.columns:
+            fields = (payload.get("schema") or {}).get("fields") or []
+            for i, v in enumerate(values):
+                f = fields[i] if i < len(fields) else {}
+                sample = next((x for x in v if x is not None), None)
+                self.columns.append(
+                    make_column(f.get("name", "col%d" % i), f.get("type"), sample)
+                )
+        for i, v in enumerate(values[: len(self.columns)]):
+            try:
+                self.columns[i].extend(v)
+            except (TypeError, OverflowError):
+                c = self.columns[i]
+                self.columns[i] = ObjectColumn(c.name, c.type, c.to_list())
+                self.columns[i].extend(v)
+        self.rows += len(data)
+
+    def to_numpy(self, timestamp_unit=None):
+        """Return columns as NumPy arrays.
+
+        :::info
+        Numeric columns are copied from their buffers in bulk and
+        nullable ones become masked arrays. Dictionary columns are
+        expanded with a single take on their categories.
+        :::
+
+        Args:
+            timestamp_unit (str): Convert timestamp fields to `datetime64` with this unit, e.g. `us`. Defaults to `None` (keep integers).
+
+        Returns:
+            dict: Column name to NumPy array.
+
+        Raises:
+            CortexError: If NumPy is not installed.
+
+        """
+        return dict(
+            (c.name, c.to_numpy(timestamp_unit=timestamp_unit)) for c in self.columns
+        )
+
+    def to_pandas(self, timestamp_unit=None):
+        """Return columns as a pandas `DataFrame`.
+
+        :::info
+        Dictionary-encoded strings become `Categorical` columns built
+        from their codes, and nullable integers use pandas' nullable
+        integer arrays.
+        :::
+
+        Args:
+            timestamp_unit (str): Convert timestamp fields to `datetime64` with this unit, e.g. `us`. Defaults to `None` (keep integers).
+
+        Returns:
+            pandas.DataFrame: Result set.
+
+        Raises:
+            CortexError: If NumPy or pandas is not installed.
+
+        """
+        if pandas is None or numpy is None:
+            raise CortexError("Module import error: pandas")
+        return pandas.DataFrame(
+            dict(
+                (c.name, c.to_pandas(timestamp_unit=timestamp_unit))
+                for c in self.columns
+            ),
+            columns=self.names,
+        )
+
+    def to_pydict(self):
+        """Return columns as lists of Python objects.
+
+        Returns:
+            dict: Column name to list.
+
+        """
+        return dict((c.name, c.to_list()) for c in self.columns)
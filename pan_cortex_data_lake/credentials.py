@@ -522,7 +522,10 @@ class Credentials(object):
             PartialCredentialsError: If one or more required credentials are missing.
 
         """
-        if not self.token_lock.locked():
+        if self.token_lock.locked():
+            with self.token_lock:  # another thread is refreshing; use its token
+                return self.access_token_
+        else:
             with self.token_lock:
                 if access_token == self.access_token or access_token is None:
                     if self.developer_token is not None and not any(
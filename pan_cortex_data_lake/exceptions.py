@@ -24,6 +24,19 @@ class CortexError(Exception):
         self.message = message
 
 
+class DeadlineExceededError(CortexError):
+    """A query job did not finish before its wall-clock deadline."""
+
+    def __init__(self, inst):
+        """Convert exception instance to string.
+
+        Args:
+            inst (class): Exception instance.
+
+        """
+        CortexError.__init__(self, "{}".format(inst))
+
+
 class HTTPError(CortexError):
     """A pancloud HTTP error occurred."""
 
@@ -37,6 +50,25 @@ class HTTPError(CortexError):
         CortexError.__init__(self, "{}".format(inst))
 
 
+class CircuitOpenError(HTTPError):
+    """Requests to a host are short-circuited while its breaker is open."""
+
+    def __init__(self, host, retry_in=None):
+        """Capture the host and the time left before a probe is allowed.
+
+        Args:
+            host (str): Host (`netloc`) whose circuit is open.
+            retry_in (float): Seconds until the breaker half-opens. Defaults to `None`.
+
+        """
+        message = "Circuit open for {}".format(host)
+        if retry_in is not None:
+            message += " (retry in {:.1f}s)".format(retry_in)
+        HTTPError.__init__(self, message)
+        self.host = host
+        self.retry_in = retry_in
+
+
 class PartialCredentialsError(CortexError):
     """The required credentials were not supplied."""
 
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+"""
+:::info
+Bounded-memory export of query results to NDJSON or CSV files, with
+optional gzip or zstd compression and size-based file rolling. Rows are
+serialized and written on a background thread, so network and disk I/O
+overlap.
+:::
+
+Examples:
+
+```python
+from pan_cortex_data_lake import QueryService
+
+qs = QueryService(credentials=c)
+job_id = qs.create_query(query_params={"query": sql}).json()["jobId"]
+paths = qs.export_job(
+    job_id=job_id,
+    path="traffic-{index:04d}.ndjson.gz",
+    compression="gzip",
+    max_bytes=256 * 1024 * 1024,
+)
+```
+
+"""
+
+from __future__ import absolute_import
+
+import csv
+import gzip
+import io
+import json
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .exceptions import CortexError
+
+_END = object()
+
+
+class Exporter(object):
+    """Write rows to rolling, optionally compressed NDJSON or CSV files."""
+
+    def __init__(
+        self,
+        path,
+        format="ndjson",
+        compression=None,
+        max_bytes=None,
+        fields=None,
+        batch_size=1000,
+        queue_size=8,
+    ):
+        """
+
+        :::info
+        Rows passed to [write()](#write) are grouped in batches of
+        `batch_size` and handed to the writer thread through a queue of
+        at most `queue_size` batches, so memory use stays constant and
+        producers block when the disk falls behind. When `max_bytes` is
+        set, a new file is started once the current one reaches about
+        that size on disk (as flushed by the compressor); `path` must
+        then contain an `{index}` placeholder.
+        :::
+
+        Args:
+            path (str): Output path, optionally a template with `{index}`, e.g. `out-{index:04d}.csv.gz`.
+            format (str): `ndjson` or `csv`. Defaults to `ndjson`.
+            compression (str): `gzip`, `zstd` or `None`. Defaults to `None`.
+            max_bytes (int): Roll to a new file after this many bytes on disk. Defaults to `None`.
+            fields (list): CSV column names. Defaults to the keys of the first `dict` row.
+            batch_size (int): Rows per batch handed to the writer thread. Defaults to `1000`.
+            queue_size (int): Max batches queued for the writer thread. Defaults to `8`.
+
+        Raises:
+            CortexError: If an option is invalid or the compression library is missing.
+
+        """
+        if format not in ("ndjson", "csv"):
+            raise CortexError("Unsupported export format: %s" % format)
+        if compression not in (None, "gzip", "zstd"):
+            raise CortexError("Unsupported compression: %s" % compression)
+        if compression == "zstd" and zstandard is None:
+            raise CortexError("Module import error: zstandard")
+        if max_bytes and "{index" not in path:
+            raise CortexError("path must contain an {index} placeholder to roll files")
+        self.path = path
+        self.format = format
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.fields = fields
+        self.batch_size = batch_size
+        self.paths = []
+        self.rows = 0
+        self._batch = []
+        self._queue = queue.Queue(maxsize=max(queue_size, 1))
+        self._error = None
+        self._raw = self._stream = self._csv = None
+        self._thread = threading.Thread(target=self._run, name="cdl-export")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __repr__(self):
+        return "{}(path={!r}, format={!r}, compression={!r}, max_bytes={!r})".format(
+            self.__class__.__name__,
+            self.path,
+            self.format,
+            self.compression,
+            self.max_bytes,
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, row):
+        """Queue one row for writing.
+
+        Args:
+            row (dict or list): Result row.
+
+        Raises:
+            CortexError: If the writer thread failed.
+
+        """
+        self._batch.append(row)
+        self.rows += 1
+        if len(self._batch) >= self.batch_size:
+            self._put(self._batch)
+            self._batch = []
+
+    def write_all(self, rows):
+        """Queue every row of an iterable.
+
+        Args:
+            rows (iterable): Result rows.
+
+        Returns:
+            int: Number of rows queued.
+
+        """
+        n = 0
+        for row in rows:
+            self.write(row)
+            n += 1
+        return n
+
+    def flush(self):
+        """Hand the pending partial batch to the writer thread."""
+        if self._batch:
+            self._put(self._batch)
+            self._batch = []
+
+    def close(self):
+        """Flush pending rows, wait for the writer thread and close the file.
+
+        Returns:
+            list: Paths of the files written.
+
+        Raises:
+            CortexError: If the writer thread failed.
+
+        """
+        if self._thread.is_alive():
+            if self._error is None:
+                self.flush()
+            self._queue.put(_END)
+            self._thread.join()
+        if self._error is not None:
+            raise CortexError("Export failed: %s" % self._error)
+        return self.paths
+
+    def _put(self, item):
+        if self._error is not None:
+            raise CortexError("Export failed: %s" % self._error)
+        self._queue.put(item)
+
+    def _run(self):
+        try:
+            while True:
+                batch = self._queue.get()
+                if batch is _END:
+                    break
+                self._write_batch(batch)
+        except Exception as e:
+            self._error = e
+            while self._queue.get() is not _END:  # unblock producers
+                pass
+        finally:
+            self._close_file()
+
+    def _open(self):
+        path = self.path.format(index=len(self.paths))
+        self._raw = open(path, "wb")
+        if self.compression == "gzip":
+            binary = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        elif self.compression == "zstd":
+            binary = zstandard.ZstdCompressor().stream_writer(self._raw)
+        else:
+            binary = self._raw
+        self._stream = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+        self.paths.append(path)
+        if self.format == "csv":
+            self._csv = csv.writer(self._stream)
+            if self.fields:
+                self._csv.writerow(self.fields)
+
+    def _close_file(self):
+        if self._stream is not None:
+            self._stream.close()  # closes the compressor, then the raw file
+            if not self._raw.closed:
+                self._raw.close()
+        self._raw = self._stream = self._csv = None
+
+    def _write_batch(self, batch):
+        if self.format == "csv" and self.fields is None and isinstance(batch[0], dict):
+            self.fields = list(batch[0])
+        for row in batch:
+            if self._stream is None:
+                self._open()
+            if self.format == "ndjson":
+                self._stream.write(json.dumps(row, separators=(",", ":")))
+                self._stream.write("\n")
+            else:
+                if isinstance(row, dict):
+                    row = [row.get(f) for f in self.fields]
+                self._csv.writerow(
+                    [json.dumps(v) if isinstance(v, (dict, list)) else v for v in row]
+                )
+            if self.max_bytes and self._raw.tell() >= self.max_bytes:
+                self._close_file()
+        if self._stream is not None:
+            self._stream.flush()
@@ -2,30 +2,212 @@
 
 from __future__ import absolute_import
 
+import json
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
 import requests
 from requests.adapters import HTTPAdapter
+from requests.utils import stream_decode_response_unicode
+from urllib3.util.request import ACCEPT_ENCODING
 
-# support ujson in place of standard json library
 try:
-    import ujson
+    import zstandard
+except ImportError:
+    zstandard = None
 
-    requests.models.complexjson = ujson
-    logger.debug("Monkey patched requests with ujson")
+try:
+    from urllib.parse import urlparse
 except ImportError:
-    pass
+    from urlparse import urlparse
 
 from .exceptions import (
     UnexpectedKwargsError,
     RequiredKwargsError,
+    CircuitOpenError,
     HTTPError,
     CortexError,
 )
 from . import __version__
-from .utils import ApiStats
+from .breaker import CircuitBreaker
+from .metrics import endpoint_name
+from .timing import RequestTiming, TimedHTTPAdapter, connect_timer
+from .ratelimit import RateLimiter, retry_after
+from .transport import HTTP2Adapter
+from .utils import ApiStats, json_decoder
+
+# urllib3 decodes what it advertises; zstd is decoded here when it cannot
+URLLIB3_ZSTD = "zstd" in ACCEPT_ENCODING
+ACCEPT_ENCODINGS = [e.strip() for e in ACCEPT_ENCODING.split(",")]
+if not URLLIB3_ZSTD and zstandard is not None:
+    ACCEPT_ENCODINGS.append("zstd")
+
+
+# environment variables read by Session.merge_environment_settings()
+ENVIRON_SETTINGS = tuple(
+    k
+    for name in ("http_proxy", "https_proxy", "all_proxy", "no_proxy")
+    for k in (name, name.upper())
+) + ("REQUESTS_CA_BUNDLE", "CURL_CA_BUNDLE")
+
+
+def _session_state(session):
+    """Return the session settings an [Endpoint](#endpoint) is built from."""
+    return (
+        list(session.headers.items()),
+        dict(session.params or {}),
+        dict(session.proxies or {}),
+        session.auth,
+        session.verify,
+        session.cert,
+        session.stream,
+        session.trust_env,
+        [os.environ.get(k) for k in ENVIRON_SETTINGS] if session.trust_env else None,
+    )
+
+
+def _zstd_chunks(chunks):
+    """Incrementally decompress a `zstd`-encoded byte stream."""
+    d = zstandard.ZstdDecompressor().decompressobj()
+    for chunk in chunks:
+        data = d.decompress(chunk)
+        if data:
+            yield data
+
+
+def _wire_bytes(r, default):
+    """Return the number of body bytes read from the network."""
+    tell = getattr(r.raw, "tell", None)
+    try:
+        return tell() if tell is not None else default
+    except (OSError, ValueError):
+        return default
+
+
+class Response(requests.Response):
+    """`requests.Response` that decodes its JSON body at most once."""
+
+    _timing = None  # RequestTiming, when the client has timing hooks
+
+    @classmethod
+    def from_payload(cls, payload, status_code=200, url=None):
+        """Build a response served locally rather than over the network.
+
+        Args:
+            payload: JSON-serializable body.
+            status_code (int): HTTP status code. Defaults to `200`.
+            url (str): Request URL. Defaults to `None`.
+
+        Returns:
+            Response: Response whose `json()` returns a copy of `payload`.
+
+        """
+        r = cls()
+        r.status_code = status_code
+        r.reason = "OK"
+        r.url = url
+        r.encoding = "utf-8"
+        r.headers["Content-Type"] = "application/json"
+        r._content = json.dumps(payload).encode("utf-8")
+        r._payload = json.loads(r._content.decode("utf-8"))  # not shared with the caller
+        return r
+
+    def copy(self):
+        """Return a copy of a fully read response for another consumer.
+
+        Returns:
+            Response: Response sharing the body bytes but not the decoded payload or headers.
+
+        """
+        r = self.__class__.__new__(self.__class__)
+        r.__dict__.update(self.__dict__)
+        r.__dict__.pop("_payload", None)
+        r.headers = self.headers.copy()
+        return r
+
+    def json(self, **kwargs):
+        """Return the decoded JSON body, decoding it on first access.
+
+        Args:
+            **kwargs: Optional arguments forwarded to `requests.Response.json()`, which bypasses the cache.
+
+        Returns:
+            Decoded JSON payload.
+
+        Raises:
+            ValueError: If the body is not valid JSON.
+
+        """
+        if kwargs:
+            return super(Response, self).json(**kwargs)
+        try:
+            return self._payload
+        except AttributeError:
+            pass
+        content = self.content
+        if self._timing is None:
+            self._payload = self._decoder(content)
+            return self._payload
+        started = time.monotonic()
+        self._payload = self._decoder(content)
+        self._timing.record("decode", time.monotonic() - started)
+        return self._payload
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        """Iterate over the response body, decompressing it as it streams.
+
+        :::info
+        Bodies that urllib3 cannot decode itself (`zstd` on older
+        versions) are decompressed chunk by chunk, and the client's
+        `wire_bytes`/`decoded_bytes` counters are updated once the body
+        has been read. `content` and `json()` are built on this method.
+        :::
+
+        Args:
+            chunk_size (int): Number of bytes read from the network per chunk.
+            decode_unicode (bool): Decode chunks to `str` using the response encoding.
+
+        Returns:
+            generator: Body chunks.
+
+        """
+        if self._content_consumed:
+            return super(Response, self).iter_content(chunk_size, decode_unicode)
+        chunks = super(Response, self).iter_content(chunk_size)
+        if getattr(self, "_zstd", False):
+            chunks = _zstd_chunks(chunks)
+        chunks = self._counted(chunks)
+        if decode_unicode:
+            chunks = stream_decode_response_unicode(chunks, self)
+        return chunks
+
+    def _counted(self, chunks):
+        decoded, download, timing = 0, 0.0, self._timing
+        try:
+            if timing is None:
+                for chunk in chunks:
+                    decoded += len(chunk)
+                    yield chunk
+            else:  # time reading chunks, not the consumer
+                mark = time.monotonic()
+                for chunk in chunks:
+                    download += time.monotonic() - mark
+                    decoded += len(chunk)
+                    yield chunk
+                    mark = time.monotonic()
+                download += time.monotonic() - mark
+        finally:
+            stats = getattr(self, "_stats", None)
+            if stats is not None:
+                stats.incr("decoded_bytes", decoded)
+                stats.incr("wire_bytes", _wire_bytes(self, decoded))
+            if timing is not None:
+                timing.record("download", download)
 
 
 class HTTPClient(object):
@@ -42,16 +224,35 @@ class HTTPClient(object):
         to persist certain attributes such as `cert`, `headers`,
         `proxies`, etc. `HTTPAdapter` is implemented to enable more
         granular performance and reliability tuning.
+
+        An `HTTPClient` may be shared by any number of threads once
+        constructed. Requests only read the session's headers, cookies
+        and settings (per-request overrides are merged into copies), the
+        connection pool hands each thread its own connection, token
+        refreshes are serialized by the [Credentials](credentials.md#credentials)
+        lock, and `stats` counters are sharded per thread so they never
+        lose updates. Changing `session` attributes, mounting adapters or
+        replacing `credentials` while requests are in flight is not
+        supported. A [Response](#response) is not locked: read it from
+        one thread at a time. Coalesced `QueryService` calls hand every
+        waiting thread its own copy.
         :::
 
         Parameters:
             auto_refresh (bool): Perform token refresh prior to request if `access_token` is `None` or expired. Defaults to `True`.
             auto_retry (bool): Retry last failed HTTP request following a token refresh. Defaults to `True`.
+            compression (bool): Ask for compressed responses (`gzip`, `deflate`, and `br`/`zstd` when `brotli`/`zstandard` is installed). Defaults to `True`.
+            circuit_breaker (CircuitBreaker or bool): Per-host [CircuitBreaker](breaker.md#circuitbreaker) that fails requests fast with [CircuitOpenError](exceptions.md#circuitopenerror) while a host is unhealthy. `True` uses the defaults. Defaults to `None`.
             credentials (Credentials): [Credentials](credentials.md#credentials) object. Defaults to `None`.
             enforce_json (bool): Require properly-formatted JSON or raise [CortexError](exceptions.md#cortexerror). Defaults to `False`.
             force_trace (bool): If `True`, forces trace and forces `x-request-id` to be returned in the response headers. Defaults to `False`.
+            http2 (bool): Send requests over HTTP/2 with the [HTTP2Adapter](transport.md#http2adapter), multiplexing concurrent requests over one connection per host. Requires `httpx` and `h2`. Defaults to `False`.
+            json_decoder (str or callable): `json`, `ujson`, `orjson`, `auto` or a callable used to decode response bodies. Defaults to `auto` (fastest installed).
             port (int): TCP port to append to URL. Defaults to `443`.
+            rate_limit (RateLimiter or dict): [RateLimiter](ratelimit.md#ratelimiter), or its `rates` mapping, applied to every request. Throttled (`429`) requests wait for `Retry-After` and are re-sent. Defaults to `None`.
             raise_for_status (bool): If `True`, raises [HTTPError](exceptions.md#httperror) if status_code not in 2XX. Defaults to `False`.
+            retry_policy (RetryPolicy): [RetryPolicy](policies.md#retrypolicy) applied to idempotent requests that fail with a connection error or retryable status. Defaults to `None`.
+            timing_hooks (list): Callables invoked as `hook(phase, seconds, timing)` with the duration of each request phase; see [timing](timing.md). Defaults to `None` (requests are not timed).
             url (str): URL to send API requests to - gets combined with `port` and `endpoint` parameter. Defaults to `None`.
 
         Args:
@@ -77,25 +278,61 @@ class HTTPClient(object):
             for x in ["pool_connections", "pool_maxsize", "pool_block", "max_retries"]:
                 if x in kwargs:
                     _kwargs[x] = kwargs.pop(x)
-            self.adapter = HTTPAdapter(**_kwargs)
+            self.http2 = kwargs.pop("http2", False)
+            self.timing_hooks = list(kwargs.pop("timing_hooks", None) or [])
+            if self.http2:
+                self.adapter = HTTP2Adapter(trust_env=self.session.trust_env, **_kwargs)
+            elif self.timing_hooks:
+                self.adapter = TimedHTTPAdapter(**_kwargs)
+            else:
+                self.adapter = HTTPAdapter(**_kwargs)
             self.session.mount("https://", self.adapter)
             self.session.mount("http://", self.adapter)
 
             # Non-Requests key-word arguments
             self.auto_refresh = kwargs.pop("auto_refresh", True)
+            self.compression = kwargs.pop("compression", True)
+            if not self.compression:
+                self.session.headers["Accept-Encoding"] = "identity"
+            self.circuit_breaker = kwargs.pop("circuit_breaker", None)
+            if self.circuit_breaker is True:
+                self.circuit_breaker = CircuitBreaker()
             self.credentials = kwargs.pop("credentials", None)
             self.enforce_json = kwargs.pop("enforce_json", False)
             self.force_trace = kwargs.pop("force_trace", False)
             if self.force_trace is True:
                 self.session.headers.update({"x-envoy-force-trace": ""})
+            self.json_decoder = json_decoder(kwargs.pop("json_decoder", "auto"))
             self.port = kwargs.pop("port", 443)
+            self.rate_limit = kwargs.pop("rate_limit", None)
+            if isinstance(self.rate_limit, dict):
+                self.rate_limit = RateLimiter(self.rate_limit)
             self.raise_for_status = kwargs.pop("raise_for_status", False)
+            self.retry_policy = kwargs.pop("retry_policy", None)
             self.url = kwargs.pop("url", "https://api.us.cdl.paloaltonetworks.com")
 
             if len(kwargs) > 0:  # Handle invalid kwargs
                 raise UnexpectedKwargsError(kwargs)
 
-            self.stats = ApiStats({"transactions": 0})
+            self.stats = ApiStats(
+                {
+                    "transactions": 0,
+                    "wire_bytes": 0,
+                    "decoded_bytes": 0,
+                    "sent_bytes": 0,
+                    "request_errors": 0,
+                    "status_codes": {},
+                }
+            )
+            self.max_endpoints = 256
+            self._endpoints = OrderedDict()  # (method, path) -> Endpoint
+            self._endpoints_lock = threading.Lock()
+            if self.rate_limit is not None:
+                self.stats.update({"throttled": 0, "rate_limit_wait": 0})
+            if self.retry_policy is not None:
+                self.stats.update({"retries": 0, "retry_sleep": 0})
+            if self.circuit_breaker is not None:
+                self.stats.update({"circuit_rejected": 0, "circuits": {}})
 
     def __repr__(self):
         for k in self.kwargs.get("headers", {}):
@@ -149,12 +386,87 @@ class HTTPClient(object):
         self.session.headers.update(
             {
                 "Accept": "application/json",
+                "Accept-Encoding": ", ".join(ACCEPT_ENCODINGS),
                 "User-Agent": "%s/%s" % ("cortex-data-lake-python", __version__),
             }
         )
         logger.debug("Default headers applied: %r" % self.session.headers)
 
-    def _send_request(self, enforce_json, method, raise_for_status, url, **kwargs):
+    def _request_once(self, method, url, prepared=None, timing=None, **kwargs):
+        """Send a single HTTP request through the circuit breaker, if any.
+
+        :::info
+        Each attempt is recorded in `stats`: its latency (until the
+        response headers for streamed requests) in the
+        `stats.histograms("latency")[endpoint_name]` histogram, its status code in
+        `status_codes`, and its request body size in `sent_bytes`.
+        Attempts that fail without a response count as `request_errors`.
+        :::
+
+        Raises:
+            CircuitOpenError: If the circuit of the URL's host is open.
+
+        """
+        started = time.monotonic()
+        if timing is not None:
+            connect = connect_timer()
+        try:
+            if self.circuit_breaker is not None:
+                if prepared is not None:
+                    r = self._guarded(url, self.session.send, prepared, **kwargs)
+                else:
+                    r = self._guarded(url, self.session.request, method, url, **kwargs)
+            elif prepared is not None:
+                r = self.session.send(prepared, **kwargs)
+            else:
+                r = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self.stats.incr("request_errors")
+            raise
+        elapsed = time.monotonic() - started
+        self.stats.histogram("latency", endpoint_name(method, url)).observe(elapsed)
+        if timing is not None:
+            headers = r.elapsed.total_seconds()  # send until headers parsed
+            if not self.http2:  # httpx connects inside its own pool
+                timing.record("connect", connect.connect)
+            timing.record("ttfb", max(0.0, headers - connect.connect))
+            if r._content_consumed:
+                timing.record("download", max(0.0, elapsed - headers))
+        self.stats.incr("status_codes", label=r.status_code)
+        body = getattr(r.request, "body", None)
+        if body:
+            self.stats.incr("sent_bytes", len(body))
+        return r
+
+    def _guarded(self, url, send, *args, **kwargs):
+        breaker = self.circuit_breaker
+        host = urlparse(url).netloc
+        try:
+            breaker.before(host)
+        except CircuitOpenError:
+            self.stats.incr("circuit_rejected")
+            raise
+        status, started = None, time.monotonic()
+        try:
+            r = send(*args, **kwargs)
+            status = r.status_code
+            return r
+        finally:
+            state = breaker.record(host, status, time.monotonic() - started)
+            if self.stats.circuits.get(host) != state:
+                logger.debug("Circuit for %s is %s" % (host, state))
+                self.stats.circuits[host] = state
+
+    def _send_request(
+        self,
+        enforce_json,
+        method,
+        raise_for_status,
+        url,
+        prepared=None,
+        timing=None,
+        **kwargs
+    ):
         """Send HTTP request.
 
         Args:
@@ -162,13 +474,76 @@ class HTTPClient(object):
              method (str): HTTP method.
              raise_for_status (bool): If `True`, raises [HTTPError](exceptions.md#httperror) if status_code not in 2XX. Defaults to `False`.
              url (str): Request URL.
+             prepared (requests.PreparedRequest): Send this request as-is with `Session.send()`. Defaults to `None`.
+             timing (RequestTiming): Phase timings to fill in and report. Defaults to `None`.
              **kwargs (dict): Re-packed key-word arguments.
 
          Returns:
-            requests.Response: [Response()](https://docs.python-requests.org/en/latest/api/#requests.Response) object
+            Response: [Response()](#response) object
 
         """
-        r = self.session.request(method, url, **kwargs)
+        bucket = None
+        if self.rate_limit is not None:
+            bucket = self.rate_limit.bucket(method, url)
+        retry = self.retry_policy
+        if retry is not None:
+            body = kwargs.get("json")
+            if prepared is not None:
+                body = getattr(prepared, "_json", None)
+            if not retry.idempotent(method, body):
+                retry = None
+        throttles = retries = 0
+        delay = None
+        while True:
+            if bucket is not None:
+                self.stats.incr("rate_limit_wait", bucket.acquire())
+            try:
+                r = self._request_once(method, url, prepared, timing, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if retry is None or retries >= retry.max_retries:
+                    raise
+                error = e
+            else:
+                error = None
+                if bucket is not None:
+                    if r.status_code != 429:
+                        bucket.success()
+                    else:
+                        self.stats.incr("throttled")
+                        bucket.throttle(retry_after(r))
+                        if throttles < self.rate_limit.max_retries:
+                            throttles += 1
+                            r.close()
+                            logger.debug("Throttled, retrying: %s %s" % (method, url))
+                            continue
+                if retry is None or retries >= retry.max_retries:
+                    break
+                if not retry.retry_status(r.status_code):
+                    break
+                r.close()
+            delay = retry.delay(delay)
+            retries += 1
+            self.stats.incr("retries")
+            self.stats.incr("retry_sleep", delay)
+            logger.debug(
+                "Retrying %s %s in %.3fs after %s"
+                % (method, url, delay, error or r.status_code)
+            )
+            time.sleep(delay)
+        r.__class__ = Response
+        r._decoder = self.json_decoder
+        r._stats = self.stats
+        encoding = r.headers.get("Content-Encoding", "").lower()
+        r._zstd = not URLLIB3_ZSTD and zstandard is not None and encoding == "zstd"
+        if r._content_consumed:  # not streamed: body already read as-is
+            wire = _wire_bytes(r, len(r._content or b""))
+            if r._zstd and r._content:
+                r._content = b"".join(_zstd_chunks([r._content]))
+            self.stats.incr("wire_bytes", wire)
+            self.stats.incr("decoded_bytes", len(r._content or b""))
+        if timing is not None:
+            r._timing = timing
+            timing.ready(r)
         if raise_for_status:
             r.raise_for_status()
         if enforce_json:
@@ -177,7 +552,7 @@ class HTTPClient(object):
                     r.json()
                 except ValueError as e:
                     raise CortexError("Invalid JSON: {}".format(e))
-        self.stats.transactions += 1
+        self.stats.incr("transactions")
         return r
 
     def request(self, **kwargs):
@@ -203,6 +578,7 @@ class HTTPClient(object):
             requests.Response: Requests [Response()](https://docs.python-requests.org/en/latest/api/#requests.Response) object
 
         Raises:
+            CircuitOpenError: If a `circuit_breaker` is set and the circuit of the request's host is open.
             HTTPError: If `raise_for_status = True` and non-2XX HTTP status returned or `enforce_json = True` and failure to decode JSON
             response or `HTTPError` raised by requests.
             RequiredKwargsError: If `method` kwarg not included in `request()`.
@@ -228,12 +604,18 @@ class HTTPClient(object):
         enforce_json = kwargs.pop("enforce_json", self.enforce_json)
         raise_for_status = kwargs.pop("raise_for_status", self.raise_for_status)
         url = "{}:{}{}".format(url, self.port, endpoint)
+        timing = None
+        if self.timing_hooks:
+            timing = RequestTiming(self.timing_hooks, kwargs.get("method"), url)
 
         if credentials:
             logger.debug("Applying method-level credentials")
+            started = time.monotonic()
             self._apply_credentials(
                 auto_refresh=auto_refresh, credentials=credentials, headers=headers
             )
+            if timing is not None:
+                timing.record("credential", time.monotonic() - started)
 
         k = {  # Re-pack kwargs to dictionary
             "params": params,
@@ -262,7 +644,148 @@ class HTTPClient(object):
 
         # Prepare and send the Request() and return Response()
         try:
-            r = self._send_request(enforce_json, method, raise_for_status, url, **k)
+            r = self._send_request(
+                enforce_json, method, raise_for_status, url, timing=timing, **k
+            )
             return r
         except requests.RequestException as e:
             raise HTTPError(e)
+
+    def endpoint(self, method, path):
+        """Return a prepared [Endpoint](#endpoint) for `method` and `path`.
+
+        :::info
+        Endpoints are cached per `(method, path)`, so repeated calls are
+        cheap and the same object may be shared by many threads. A cached
+        endpoint is rebuilt when the session headers, params, proxies,
+        auth or TLS settings, or the proxy/CA environment variables, have
+        changed since it was prepared.
+        :::
+
+        Args:
+            method (str): HTTP method.
+            path (str): URI path, optionally a template such as `/query/v2/jobResults/{job_id}`.
+
+        Returns:
+            Endpoint: Prepared endpoint bound to this client.
+
+        """
+        key = (method.upper(), path)
+        state = _session_state(self.session)
+        with self._endpoints_lock:
+            e = self._endpoints.get(key)
+            if e is not None and e.state == state:
+                self._endpoints.move_to_end(key)
+                return e
+        e = Endpoint(self, method, path, state)
+        with self._endpoints_lock:
+            self._endpoints[key] = e
+            while len(self._endpoints) > self.max_endpoints:
+                self._endpoints.popitem(last=False)
+        return e
+
+
+class Endpoint(object):
+    """Precompiled request template for one method and URI path."""
+
+    def __init__(self, client, method, path, state=None):
+        """
+
+        :::info
+        The URL prefix, merged session headers, authentication, proxy and
+        TLS settings are resolved once, when the endpoint is created. Each
+        call then only copies the prepared request, fills in the path and
+        query parameters and body, applies credentials and sends it with
+        `Session.send()`, bypassing the per-call merging done by
+        [request()](#request). Later changes to session settings or to
+        proxy/CA environment variables are not seen by an existing
+        endpoint; [HTTPClient.endpoint()](#endpoint) returns a new one.
+        :::
+
+        Args:
+            client (HTTPClient): Client whose session, settings and policies are used.
+            method (str): HTTP method.
+            path (str): URI path, optionally with `str.format()` placeholders.
+            state (tuple): Session settings the endpoint is built from, for cache validation. Defaults to the current ones.
+
+        """
+        session = client.session
+        self.state = state if state is not None else _session_state(session)
+        self.client = client
+        self.method = method.upper()
+        self.path = path
+        self.prefix = "{}:{}".format(client.url, client.port)
+        self._templated = "{" in path
+        template = session.prepare_request(requests.Request(self.method, self.prefix))
+        template.headers.pop("Cookie", None)  # re-applied per call
+        self._template = template
+        self._params = dict(session.params or {})
+        self._send_kwargs = session.merge_environment_settings(
+            self.prefix, session.proxies, session.stream, session.verify, session.cert
+        )
+
+    def __repr__(self):
+        return "{}(method={!r}, path={!r})".format(
+            self.__class__.__name__, self.method, self.path
+        )
+
+    def __call__(
+        self, params=None, json=None, enforce_json=None, stream=None, timeout=None, **path
+    ):
+        """Send a request to this endpoint.
+
+        Args:
+            params (dict): Query parameters.
+            json: JSON-serializable request body. Defaults to `None`.
+            enforce_json (bool): Override the client's `enforce_json`.
+            stream (bool): Override the session's `stream`.
+            timeout (float or tuple): Request timeout. Defaults to `None`.
+            **path: Values of the path template placeholders.
+
+        Returns:
+            Response: [Response()](#response) object.
+
+        Raises:
+            HTTPError: If the request fails; see [request()](#request).
+
+        """
+        client = self.client
+        p = self._template.copy()
+        url = self.prefix + (self.path.format(**path) if self._templated else self.path)
+        if self._params:
+            params = dict(self._params, **(params or {}))
+        p.prepare_url(url, params)
+        if json is not None:
+            p.prepare_body(None, None, json)
+            p._json = json
+        if client.session.cookies:
+            p.prepare_cookies(client.session.cookies)
+        timing = None
+        if client.timing_hooks:
+            timing = RequestTiming(client.timing_hooks, self.method, p.url)
+        if client.credentials:
+            started = time.monotonic()
+            client._apply_credentials(
+                auto_refresh=client.auto_refresh,
+                credentials=client.credentials,
+                headers=p.headers,
+            )
+            if timing is not None:
+                timing.record("credential", time.monotonic() - started)
+        kwargs = self._send_kwargs
+        if stream is not None or timeout is not None:
+            kwargs = dict(kwargs, timeout=timeout)
+            if stream is not None:
+                kwargs["stream"] = stream
+        try:
+            return client._send_request(
+                client.enforce_json if enforce_json is None else enforce_json,
+                self.method,
+                client.raise_for_status,
+                p.url,
+                prepared=p,
+                timing=timing,
+                **kwargs
+            )
+        except requests.RequestException as e:
+            raise HTTPError(e)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+"""
+:::info
+OpenMetrics export of [HTTPClient](httpclient.md#httpclient) and
+[QueryService](query.md#queryservice) stats. Every numeric stat becomes
+a counter, per-endpoint request latency becomes a histogram, response
+status codes are labeled counters, and the `get_job_results` row rate
+is exported as a gauge. [serve()](#serve) exposes the text on a local
+HTTP port for a Prometheus-compatible scraper.
+:::
+
+Examples:
+
+```python
+from pan_cortex_data_lake import QueryService
+from pan_cortex_data_lake.metrics import openmetrics, serve
+
+qs = QueryService(credentials=c)
+server = serve(qs.stats, port=9464)  # curl http://127.0.0.1:9464/metrics
+...
+print(qs.stats.histograms("latency")["get_job_results"].quantile(0.99))
+print(openmetrics(qs.stats))
+```
+
+"""
+
+from __future__ import absolute_import
+
+import re
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+_NAME = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def endpoint_name(method, url):
+    """Name the API operation a request belongs to.
+
+    :::info
+    Names are bounded in number (job IDs never appear in them), so they
+    are safe to use as metric labels.
+    :::
+
+    Args:
+        method (str): HTTP method.
+        url (str): Request URL.
+
+    Returns:
+        str: `create_query`, `list_jobs`, `get_job`, `cancel_job`, `get_job_results`, `token` or `other`.
+
+    """
+    path = urlparse(url).path.rstrip("/")
+    method = method.upper()
+    if path.startswith("/query/v2/jobResults"):
+        return "get_job_results"
+    if path == "/query/v2/jobs":
+        return "create_query" if method == "POST" else "list_jobs"
+    if path.startswith("/query/v2/jobs/"):
+        return "cancel_job" if method == "DELETE" else "get_job"
+    if path.startswith("/api/oauth2/"):
+        return "token"
+    return "other"
+
+
+def rows_per_second(stats):
+    """Return the result row throughput of `get_job_results`.
+
+    Args:
+        stats (ApiStats): Client or service stats.
+
+    Returns:
+        float: Rows received per second spent fetching and decoding result pages, or `0.0` if none were.
+
+    """
+    seconds = stats.get("results_seconds") or 0
+    if not seconds:
+        return 0.0
+    return (stats.get("records") or 0) / float(seconds)
+
+
+def _escape(value):
+    return (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    )
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def openmetrics(stats, prefix="cdl"):
+    """Render stats in the OpenMetrics text format.
+
+    Args:
+        stats (ApiStats): Client or service stats.
+        prefix (str): Metric name prefix. Defaults to `cdl`.
+
+    Returns:
+        str: OpenMetrics exposition, terminated by `# EOF`.
+
+    """
+    lines = []
+    for key, value in sorted(stats.items()):
+        name = "%s_%s" % (prefix, _NAME.sub("_", key))
+        if isinstance(value, bool) or value is None:
+            continue
+        if isinstance(value, (int, float)):
+            lines.append("# TYPE %s counter" % name)
+            lines.append("%s_total %s" % (name, _number(value)))
+        elif key == "status_codes":
+            name = "%s_responses" % prefix
+            lines.append("# TYPE %s counter" % name)
+            for code, n in sorted(value.items(), key=lambda x: str(x[0])):
+                lines.append('%s_total{code="%s"} %s' % (name, _escape(code), n))
+    histograms = getattr(stats, "histograms", None)
+    for key, value in sorted((histograms() if histograms else {}).items()):
+        name = "%s_%s_seconds" % (prefix, _NAME.sub("_", key))
+        lines.append("# TYPE %s histogram" % name)
+        lines.append("# UNIT %s seconds" % name)
+        for label, h in sorted(value.items(), key=lambda x: str(x[0])):
+            label = 'endpoint="%s"' % _escape(label)
+            for le, n in h.cumulative():
+                lines.append(
+                    '%s_bucket{%s,le="%s"} %d' % (name, label, _number(le), n)
+                )
+            lines.append("%s_count{%s} %d" % (name, label, h.count))
+            lines.append("%s_sum{%s} %s" % (name, label, _number(h.sum)))
+    if "records" in stats:
+        name = "%s_rows_per_second" % prefix
+        lines.append("# TYPE %s gauge" % name)
+        lines.append("%s %s" % (name, _number(rows_per_second(stats))))
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def serve(stats, host="127.0.0.1", port=9464, prefix="cdl"):
+    """Serve [openmetrics()](#openmetrics) over HTTP on a background thread.
+
+    Args:
+        stats (ApiStats): Client or service stats.
+        host (str): Address to bind. Defaults to `127.0.0.1`.
+        port (int): TCP port to bind, `0` for any free port. Defaults to `9464`.
+        prefix (str): Metric name prefix. Defaults to `cdl`.
+
+    Returns:
+        HTTPServer: Running server; call `shutdown()` to stop it. The bound port is `server.server_port`.
+
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = openmetrics(stats, prefix).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer((host, port), Handler)
+    t = threading.Thread(target=server.serve_forever, name="cdl-metrics")
+    t.daemon = True
+    t.start()
+    return server
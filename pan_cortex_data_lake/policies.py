@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+"""
+:::info
+Pluggable policies that control how the SDK waits on the Query Service
+and retries failed requests.
+:::
+
+Examples:
+
+```python
+from pan_cortex_data_lake import QueryService
+from pan_cortex_data_lake.policies import AdaptiveWait, RetryPolicy
+
+qs = QueryService(
+    wait_policy=AdaptiveWait(ceiling=5), retry_policy=RetryPolicy(max_retries=5)
+)
+```
+
+"""
+
+from __future__ import absolute_import
+
+import random
+
+
+class WaitPolicy(object):
+    """Base class for job completion wait strategies.
+
+    :::info
+    A wait policy is consulted by
+    [iter_job_results()](query.md#iter_job_results) while a job is
+    `PENDING` or `RUNNING`. `attempt` is the number of not-ready
+    responses received so far for the job, so a single policy instance
+    is stateless and may be shared by any number of jobs and threads.
+    :::
+
+    """
+
+    def max_wait(self, attempt):
+        """Server-side long-poll to request, in ms.
+
+        Args:
+            attempt (int): Number of not-ready responses received so far.
+
+        Returns:
+            int: `maxWait` query parameter or `None` to omit it.
+
+        """
+        return None
+
+    def delay(self, attempt):
+        """Client-side sleep after a not-ready response, in seconds.
+
+        Args:
+            attempt (int): Number of not-ready responses received so far, starting at `0`.
+
+        Returns:
+            float: Seconds to sleep before polling again.
+
+        """
+        return 0
+
+
+class FixedWait(WaitPolicy):
+    """Sleep a fixed interval between polls (legacy behavior)."""
+
+    def __init__(self, interval=1):
+        """
+
+        Args:
+            interval (float): Seconds to sleep between polls. Defaults to `1`.
+
+        """
+        self.interval = interval
+
+    def __repr__(self):
+        return "{}(interval={!r})".format(self.__class__.__name__, self.interval)
+
+    def delay(self, attempt):
+        return self.interval
+
+
+class AdaptiveWait(WaitPolicy):
+    """Long-poll first, then back off exponentially with jitter."""
+
+    def __init__(
+        self, max_wait=2000, long_polls=3, base=0.5, factor=2, ceiling=10, jitter=True
+    ):
+        """
+
+        :::info
+        Every poll asks the server to hold the request for up to
+        `max_wait` ms, so short queries return as soon as they finish.
+        The first `long_polls` not-ready responses are re-polled
+        immediately; after that the client sleeps `base * factor ** n`
+        seconds, capped at `ceiling`, before polling again.
+        :::
+
+        Args:
+            max_wait (int): Server-side `maxWait` in ms. Max 2000. Defaults to `2000`.
+            long_polls (int): Not-ready responses to re-poll without sleeping. Defaults to `3`.
+            base (float): First backoff delay in seconds. Defaults to `0.5`.
+            factor (float): Backoff multiplier. Defaults to `2`.
+            ceiling (float): Maximum backoff delay in seconds. Defaults to `10`.
+            jitter (bool): Randomize each delay between 50% and 100% of its value. Defaults to `True`.
+
+        """
+        self.max_wait_ = max_wait
+        self.long_polls = long_polls
+        self.base = base
+        self.factor = factor
+        self.ceiling = ceiling
+        self.jitter = jitter
+
+    def __repr__(self):
+        return "{}({})".format(
+            self.__class__.__name__,
+            ", ".join(
+                "%s=%r" % x
+                for x in [
+                    ("max_wait", self.max_wait_),
+                    ("long_polls", self.long_polls),
+                    ("base", self.base),
+                    ("factor", self.factor),
+                    ("ceiling", self.ceiling),
+                    ("jitter", self.jitter),
+                ]
+            ),
+        )
+
+    def max_wait(self, attempt):
+        return self.max_wait_
+
+    def delay(self, attempt):
+        n = attempt - self.long_polls
+        if n < 0:
+            return 0
+        d = min(self.ceiling, self.base * self.factor ** min(n, 32))
+        if self.jitter:
+            d = d / 2 + random.uniform(0, d / 2)
+        return d
+
+
+class RetryPolicy(object):
+    """Retry idempotent requests on server and connection errors."""
+
+    def __init__(
+        self,
+        max_retries=3,
+        base=0.1,
+        ceiling=10,
+        statuses=(500, 502, 503, 504),
+        methods=("GET", "HEAD"),
+    ):
+        """
+
+        :::info
+        Only requests that are safe to repeat are retried: `methods`
+        (by default the `GET`s behind `get_job()`, `get_job_results()`
+        and `list_jobs()`) and `create_query()` submissions that carry a
+        client-supplied `jobId`, which the service de-duplicates. Delays
+        use decorrelated jitter: each is drawn uniformly between `base`
+        and three times the previous delay, capped at `ceiling`.
+        :::
+
+        Args:
+            max_retries (int): Max retries per request. Defaults to `3`.
+            base (float): Minimum delay in seconds. Defaults to `0.1`.
+            ceiling (float): Maximum delay in seconds. Defaults to `10`.
+            statuses (tuple): HTTP status codes that are retried. Defaults to `(500, 502, 503, 504)`.
+            methods (tuple): HTTP methods that are always retried. Defaults to `("GET", "HEAD")`.
+
+        """
+        self.max_retries = max_retries
+        self.base = base
+        self.ceiling = ceiling
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(m.upper() for m in methods)
+
+    def __repr__(self):
+        return "{}(max_retries={!r}, base={!r}, ceiling={!r})".format(
+            self.__class__.__name__, self.max_retries, self.base, self.ceiling
+        )
+
+    def idempotent(self, method, json=None):
+        """Tell whether a request may be sent more than once.
+
+        Args:
+            method (str): HTTP method.
+            json (dict): JSON request body. Defaults to `None`.
+
+        Returns:
+            bool: `True` for `methods` and for bodies carrying a `jobId`.
+
+        """
+        if method.upper() in self.methods:
+            return True
+        return method.upper() == "POST" and bool((json or {}).get("jobId"))
+
+    def retry_status(self, status_code):
+        """Tell whether a response status is worth retrying.
+
+        Args:
+            status_code (int): HTTP status code.
+
+        Returns:
+            bool: `True` if `status_code` is in `statuses`.
+
+        """
+        return status_code in self.statuses
+
+    def delay(self, previous=None):
+        """Return the next backoff delay.
+
+        Args:
+            previous (float): Previous delay, or `None` before the first retry.
+
+        Returns:
+            float: Seconds to sleep before retrying.
+
+        """
+        upper = 3 * (previous or self.base)
+        return min(self.ceiling, random.uniform(self.base, max(upper, self.base)))
@@ -16,13 +16,238 @@ Examples:
 """
 
 from __future__ import absolute_import
+import json
 import logging
+import threading
 import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-from .exceptions import CortexError, HTTPError
-from .httpclient import HTTPClient
+from .cache import ResultCache, convert_page
+from .checkpoint import Checkpoint
+from .columnar import ColumnarResult
+from .exceptions import CortexError, DeadlineExceededError, HTTPError
+from .export import Exporter
+from .httpclient import HTTPClient, Response
+from .policies import AdaptiveWait, RetryPolicy
+from .sharding import format_timestamp, time_shards
+from .utils import JSONStream, SingleFlight, merge, prefetch
 from . import __version__
 
+# allowance for clock skew when bounding job listings by local submit times
+SUBMIT_TIME_SLACK = 300000  # ms
+
+_FAST_KWARGS = frozenset(
+    ["method", "url", "endpoint", "params", "json", "enforce_json", "stream", "timeout"]
+)
+
+# iter_job_results() arguments that run_many() does not pass to create_query()
+_RESULTS_KWARGS = frozenset(
+    [
+        "max_wait",
+        "offset",
+        "page_cursor",
+        "page_number",
+        "page_size",
+        "result_format",
+        "params",
+        "prefetch",
+        "reorder_buffer",
+        "deadline",
+        "checkpoint",
+        "resume_from",
+        "wait_policy",
+        "workers",
+    ]
+)
+
+
+class QueryRun(object):
+    """Outcome of one query submitted by [run_many()](#run_many)."""
+
+    def __init__(self, index, query_params):
+        """
+
+        Args:
+            index (int): Position of the query in the submitted sequence.
+            query_params (dict): Query parameters.
+
+        """
+        self.index = index
+        self.query_params = query_params
+        self.job_id = None
+        self.state = None
+        self.pages = []
+        self.rows = 0
+        self.error = None
+        self.cancelled = False
+        self.timing = {}
+
+    def __repr__(self):
+        return "{}(index={!r}, job_id={!r}, state={!r}, rows={!r}, timing={!r})".format(
+            self.__class__.__name__,
+            self.index,
+            self.job_id,
+            self.state,
+            self.rows,
+            self.timing,
+        )
+
+    @property
+    def ok(self):
+        """bool: `True` if the job completed successfully."""
+        return self.state == "DONE"
+
+
+class QueryJob(object):
+    """Managed query job that is cancelled when abandoned."""
+
+    def __init__(self, service, query_params=None, job_id=None, deadline=None, **kwargs):
+        """
+
+        :::info
+        Use as a context manager via [QueryService.job()](#job). The job
+        is cancelled with [cancel_job()](#cancel_job) unless it was fully
+        drained: when a [records()](#records) or [pages()](#pages)
+        generator is closed early, when a row limit is reached, when the
+        deadline passes or when the `with` block exits, including on an
+        exception. The deadline is enforced while the job is pending or
+        running, by bounding each poll and sleep, and whenever a row or
+        page is received. The submission is never coalesced with another
+        (unless `coalesce=True` is passed), so each handle owns its job.
+        :::
+
+        Args:
+            service (QueryService): Query Service used to submit, drain and cancel the job.
+            query_params (dict): Query parameters passed to `create_query()`.
+            job_id (str): Manage an already submitted job instead of creating one.
+            deadline (float): Seconds after submission after which the job is cancelled. Defaults to `None`.
+            **kwargs: Supported [create_query()](#create_query) parameters.
+
+        """
+        self.service = service
+        self.query_params = query_params
+        self.job_id = job_id
+        self.deadline = deadline
+        self.kwargs = kwargs
+        self.started = None
+        self.finished = False
+        self.cancelled = False
+
+    def __repr__(self):
+        return "{}(job_id={!r}, finished={!r}, cancelled={!r})".format(
+            self.__class__.__name__, self.job_id, self.finished, self.cancelled
+        )
+
+    def __enter__(self):
+        self.submit()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cancel()
+
+    def submit(self):
+        """Create the job, unless a `job_id` was given.
+
+        Returns:
+            str: Job ID.
+
+        """
+        if self.job_id is None:
+            self.kwargs.setdefault("raise_for_status", True)
+            self.kwargs.setdefault("coalesce", False)  # the job may be cancelled
+            r = self.service.create_query(query_params=self.query_params, **self.kwargs)
+            self.job_id = r.json()["jobId"]
+        self.started = time.time()
+        return self.job_id
+
+    def _check_deadline(self):
+        if self.deadline is not None and time.time() - self.started > self.deadline:
+            self.cancel()
+            raise DeadlineExceededError(
+                "Job %s exceeded its %ss deadline" % (self.job_id, self.deadline)
+            )
+
+    def cancel(self):
+        """Cancel the job unless it finished or was already cancelled.
+
+        Returns:
+            bool: `True` if a cancellation was sent.
+
+        """
+        if self.finished or self.cancelled or self.job_id is None:
+            return False
+        self.cancelled = True
+        try:
+            self.service.cancel_job(job_id=self.job_id)
+        except CortexError as e:
+            self.service._debug("Failed to cancel job %s: %s", self.job_id, e)
+        return True
+
+    close = cancel
+
+    def records(self, limit=None, **kwargs):
+        """Yield result rows, cancelling the job on early exit.
+
+        Args:
+            limit (int): Stop and cancel the job after this many rows. Defaults to `None`.
+            **kwargs: Supported [iter_records()](#iter_records) parameters.
+
+        Yields:
+            dict or list: One result row.
+
+        Raises:
+            DeadlineExceededError: If the deadline passes before the job is drained.
+
+        """
+        if self.started is None:
+            self.submit()
+        if self.deadline is not None:
+            kwargs.setdefault("deadline", self.started + self.deadline)
+        rows = self.service.iter_records(job_id=self.job_id, **kwargs)
+        n = 0
+        try:
+            if limit is not None and limit <= 0:
+                return
+            for row in rows:
+                self._check_deadline()
+                yield row
+                n += 1
+                if limit is not None and n >= limit:
+                    return
+            self.finished = True
+        finally:
+            rows.close()
+            self.cancel()
+
+    def pages(self, **kwargs):
+        """Yield result pages, cancelling the job on early exit.
+
+        Args:
+            **kwargs: Supported [iter_job_results()](#iter_job_results) parameters.
+
+        Yields:
+            requests.Response: Requests [Response()](https://docs.python-requests.org/en/latest/api/#requests.Response) object.
+
+        Raises:
+            DeadlineExceededError: If the deadline passes before the job is drained.
+
+        """
+        if self.started is None:
+            self.submit()
+        if self.deadline is not None:
+            kwargs.setdefault("deadline", self.started + self.deadline)
+        pages = self.service.iter_job_results(job_id=self.job_id, **kwargs)
+        try:
+            for r in pages:
+                self._check_deadline()
+                yield r
+            self.finished = True
+        finally:
+            pages.close()
+            self.cancel()
+
 
 class QueryService(object):
     """A Cortex™ Query Service instance."""
@@ -30,9 +255,19 @@ class QueryService(object):
     def __init__(self, **kwargs):
         """
 
+        :::info
+        A `QueryService` is thread-safe: one instance, and its
+        [HTTPClient](httpclient.md#httpclient), may be shared by a thread
+        pool submitting queries and draining results concurrently.
+        `stats` is shared with the client and aggregates every thread.
+        :::
+
         Parameters:
+            cache (ResultCache or bool): Serve repeated `create_query()` calls from a local [ResultCache](cache.md#resultcache). `True` uses a default in-memory cache. Defaults to `None`.
+            coalesce (bool): Share one HTTP request between identical concurrent `create_query()`, `get_job()` and `get_job_results()` calls. Defaults to `False`.
             session (HTTPClient): [HTTPClient](httpclient.md#httpclient) object. Defaults to `None`.
             url (str): URL to send API requests to. Later combined with `port` and `endpoint` parameter.
+            wait_policy (WaitPolicy): [WaitPolicy](policies.md#waitpolicy) used while a job is pending or running. Defaults to [AdaptiveWait()](policies.md#adaptivewait).
 
         Args:
             **kwargs: Supported [HTTPClient](httpclient.md#httpclient) parameters.
@@ -40,7 +275,15 @@ class QueryService(object):
         """
         self.kwargs = kwargs.copy()  # used for __repr__
         self.session = kwargs.pop("session", None)
+        self.cache = kwargs.pop("cache", None)
+        if self.cache is True:
+            self.cache = ResultCache()
+        self.wait_policy = kwargs.pop("wait_policy", None) or AdaptiveWait()
+        self._flights = SingleFlight() if kwargs.pop("coalesce", False) else None
         self._httpclient = self.session or HTTPClient(**kwargs)
+        self._cache_jobs = OrderedDict()  # jobId -> cache key, awaiting results
+        self._cached_jobs = OrderedDict()  # local jobId -> cached pages
+        self._submit_times = OrderedDict()  # jobId -> (earliest, latest) submitTime
         self._httpclient.stats.update(
             {
                 "cancel_job": 0,
@@ -49,6 +292,13 @@ class QueryService(object):
                 "list_jobs": 0,
                 "get_job_results": 0,
                 "records": 0,
+                "results_seconds": 0,
+                "polls": 0,
+                "poll_sleep": 0,
+                "job_waits": OrderedDict(),  # last 1024 jobs
+                "cache_hits": 0,
+                "cache_misses": 0,
+                "coalesced": 0,
             }
         )
         self.stats = self._httpclient.stats
@@ -87,11 +337,13 @@ class QueryService(object):
 
 
         """
+        if self._cached_jobs.pop(job_id, None) is not None:
+            return Response.from_payload({"jobId": job_id, "state": "CANCELLED"})
         endpoint = "/query/v2/jobs/{}".format(job_id)
         r = self._httpclient.request(
             method="DELETE", url=self.url, endpoint=endpoint, **kwargs
         )
-        self.stats.cancel_job += 1
+        self.stats.incr("cancel_job")
         return r
 
     def create_query(self, job_id=None, query_params=None, **kwargs):
@@ -106,12 +358,29 @@ class QueryService(object):
         Args:
             job_id (str): Specifies the ID of the query job. (optional)
             query_params (dict): Query parameters.
+            coalesce (bool): Allow sharing the submission, and so the `jobId`, with identical concurrent calls when the service coalesces requests. Pass `False` when the caller may cancel the job. Defaults to `True`.
             **kwargs: Supported [HTTPClient.request()](httpclient.md#request) parameters.
 
         Returns:
             requests.Response: Requests [Response()](https://docs.python-requests.org/en/latest/api/#requests.Response) object.
+            On a cache hit, a locally built `201` response with a `jobId` that
+            [iter_job_results()](#iter_job_results) and [iter_records()](#iter_records) serve from the cache.
 
         """
+        coalesce = kwargs.pop("coalesce", True)
+        key = None
+        if self.cache is not None and job_id is None and query_params:
+            key = self.cache.key(query_params)
+            pages = self.cache.get(key)
+            if pages is not None:
+                self.stats.incr("cache_hits")
+                job_id = "cache-%s" % uuid.uuid4().hex
+                self._remember(self._cached_jobs, job_id, pages)
+                return Response.from_payload(
+                    {"jobId": job_id, "uri": "/query/v2/jobs/%s" % job_id}, 201
+                )
+            self.stats.incr("cache_misses")
+
         json = kwargs.pop("json", {})
         for name, value in [("jobId", job_id), ("params", query_params)]:
             if value is not None:
@@ -123,12 +392,86 @@ class QueryService(object):
             }
         )
         endpoint = "/query/v2/jobs"
-        r = self._httpclient.request(
-            method="POST", url=self.url, json=json, endpoint=endpoint, **kwargs
+        started = int(time.time() * 1000)
+        r, _ = self._send(
+            "create_query",
+            flight=[job_id, ResultCache.key(query_params or {}), kwargs],
+            coalesce=coalesce,
+            method="POST",
+            url=self.url,
+            json=json,
+            endpoint=endpoint,
+            **kwargs
         )
-        self.stats.create_query += 1
+        if r.ok:
+            try:
+                created = r.json()["jobId"]
+            except (KeyError, TypeError, ValueError):
+                created = None
+            if created is not None:
+                self._remember(
+                    self._submit_times,
+                    created,
+                    (
+                        started - SUBMIT_TIME_SLACK,
+                        int(time.time() * 1000) + SUBMIT_TIME_SLACK,
+                    ),
+                )
+                if key is not None:
+                    self._remember(self._cache_jobs, created, key)
         return r
 
+    def export_job(
+        self,
+        job_id=None,
+        path=None,
+        format="ndjson",
+        compression=None,
+        max_bytes=None,
+        fields=None,
+        **kwargs
+    ):
+        """Stream a job's rows to NDJSON or CSV files.
+
+        :::info
+        Rows come from [iter_records()](#iter_records) and are written by
+        an [Exporter](export.md#exporter) on a background thread, so memory
+        use does not depend on the size of the result set.
+        :::
+
+        Args:
+            job_id (str): Specifies the ID of the query job.
+            path (str): Output path, optionally a template with `{index}` for rolled files.
+            format (str): `ndjson` or `csv`. Defaults to `ndjson`.
+            compression (str): `gzip`, `zstd` or `None`. Defaults to `None`.
+            max_bytes (int): Roll to a new file after about this many bytes on disk. Defaults to `None`.
+            fields (list): CSV column names. Defaults to the keys of the first row.
+            **kwargs: Supported [iter_records()](#iter_records) parameters.
+
+        Returns:
+            list: Paths of the files written.
+
+        Raises:
+            CortexError: If the job fails or the files cannot be written.
+
+        """
+        exporter = Exporter(
+            path,
+            format=format,
+            compression=compression,
+            max_bytes=max_bytes,
+            fields=fields,
+        )
+        try:
+            exporter.write_all(self.iter_records(job_id=job_id, **kwargs))
+        except BaseException:
+            try:
+                exporter.close()
+            except Exception as e:  # keep the original error
+                self._debug("Failed to close export %s: %s", path, e)
+            raise
+        return exporter.close()
+
     def get_job(self, job_id=None, **kwargs):
         """Get specific job matching criteria.
 
@@ -141,11 +484,16 @@ class QueryService(object):
             requests.Response: Requests [Response()](https://docs.python-requests.org/en/latest/api/#requests.Response) object.
 
         """
-        endpoint = "/query/v2/jobs/{}".format(job_id)
-        r = self._httpclient.request(
-            method="GET", url=self.url, endpoint=endpoint, **kwargs
+        if job_id in self._cached_jobs:
+            return Response.from_payload({"jobId": job_id, "state": "DONE"})
+        r, _ = self._send(
+            "get_job",
+            method="GET",
+            url=self.url,
+            endpoint="/query/v2/jobs/{job_id}",
+            path={"job_id": job_id},
+            **kwargs
         )
-        self.stats.get_job += 1
         return r
 
     def get_job_results(
@@ -173,8 +521,13 @@ class QueryService(object):
 
         Returns:
             requests.Response: Requests [Response()](https://docs.python-requests.org/en/latest/api/#requests.Response) object.
+            For a cache-hit `jobId`, a locally built page of the cached results.
 
         """
+        if job_id in self._cached_jobs:
+            return self._cached_results(
+                job_id, offset, page_cursor, page_number, page_size, result_format
+            )
         params = kwargs.pop("params", {})
         for name, value in [
             ("maxWait", max_wait),
@@ -186,18 +539,48 @@ class QueryService(object):
         ]:
             if value is not None:
                 params.update({name: value})
-        endpoint = "/query/v2/jobResults/{}".format(job_id)
-        r = self._httpclient.request(
-            method="GET", url=self.url, params=params, endpoint=endpoint, **kwargs
+        started = time.monotonic()
+        r, shared = self._send(
+            "get_job_results",
+            method="GET",
+            url=self.url,
+            params=params,
+            endpoint="/query/v2/jobResults/{job_id}",
+            path={"job_id": job_id},
+            **kwargs
         )
-        self.stats.get_job_results += 1
 
-        rows = r.json().get("rowsInPage")
-        if rows is not None:
-            self.stats.records += rows
+        if not shared and not kwargs.get("stream", self._httpclient.session.stream):
+            rows = r.json().get("rowsInPage")
+            if rows is not None:
+                self.stats.incr("records", rows)
+                self.stats.incr("results_seconds", time.monotonic() - started)
 
         return r
 
+    def get_job_columns(self, job_id=None, **kwargs):
+        """Retrieve all results of a job as typed column buffers.
+
+        Args:
+            job_id (str): Specifies the ID of the query job.
+            **kwargs: Supported [iter_job_results()](#iter_job_results) parameters, e.g. `workers` or `prefetch`.
+
+        Returns:
+            ColumnarResult: [ColumnarResult](columnar.md#columnarresult) object.
+
+        Raises:
+            CortexError: If the job fails.
+
+        """
+        kwargs["result_format"] = "valuesArray"
+        result = ColumnarResult()
+        for r in self.iter_job_results(job_id=job_id, **kwargs):
+            r_json = r.json()
+            if r_json["state"] == "FAILED":
+                raise CortexError("Job failed: %s" % r.text)
+            result.append_page(r_json)
+        return result
+
     def iter_job_results(
         self,
         job_id=None,
@@ -211,6 +594,12 @@ class QueryService(object):
     ):
         """Retrieve results iteratively in a non-greedy manner using scroll token.
 
+        :::info
+        Checkpoints record a page only once the caller asks for the next
+        one, so delivery is at-least-once: a consumer that stops partway
+        through a page gets that whole page again on resume.
+        :::
+
         Args:
             job_id (str): Specifies the ID of the query job.
             max_wait (int): How long to wait in ms for a job to complete. Max 2000.
@@ -218,15 +607,105 @@ class QueryService(object):
             page_cursor (str): Token/handle that can be used to fetch more data.
             page_number (int): Return the nth page from the result set as specified by this parameter.
             page_size (int): If specified, limits the size of a batch of results to the specified value. If un-specified, backend picks a size that may provide best performance.
+            prefetch (int): Fetch up to this many pages ahead on a background thread while the caller processes the current page. Defaults to `None`.
             result_format (str): valuesArray or valuesJson.
+            reorder_buffer (int): Max pages fetched ahead of the caller in parallel mode. Defaults to `2 * workers`.
+            deadline (float): `time.time()` by which the job must leave `PENDING`/`RUNNING`; polling stops there with `DeadlineExceededError`. Defaults to `None`.
+            checkpoint (str or Checkpoint): Persist the `jobId` and next `pageCursor`/offset here once the caller moves past each page. Defaults to `None`.
+            resume_from (str, Checkpoint or dict): Continue from a checkpoint; `job_id` may be omitted when it holds state. Checkpointing continues to the same file unless `checkpoint` is given.
+            wait_policy (WaitPolicy): Override the instance [WaitPolicy](policies.md#waitpolicy).
+            workers (int): Fetch the remaining pages of a `DONE` job in parallel, by `offset`, using this many threads. Offsets step by the size of the first page; if a later page comes back short, the rest is fetched sequentially. Defaults to `None` (walk `pageCursor` sequentially).
             **kwargs: Supported [HTTPClient.request()](httpclient.md#request) parameters.
 
         Returns:
             requests.Response: Requests [Response()](https://docs.python-requests.org/en/latest/api/#requests.Response) object.
 
+        Raises:
+            CortexError: If `resume_from` holds no state and no `job_id` is given, or is for another job.
+
         """
+        prefetch_ = kwargs.pop("prefetch", None)
+        checkpoint = Checkpoint.coerce(kwargs.pop("checkpoint", None))
+        resume_from = kwargs.pop("resume_from", None)
+        if resume_from is not None:
+            if isinstance(resume_from, dict):
+                state = resume_from
+            else:
+                resume_from = Checkpoint.coerce(resume_from)
+                state = resume_from.load()
+                checkpoint = checkpoint or resume_from
+            if not state or "jobId" not in state:
+                if job_id is None:
+                    raise CortexError(
+                        "Cannot resume: no checkpoint state at %s and no job_id"
+                        % (resume_from,)
+                    )
+            else:
+                if job_id is None:
+                    job_id = state["jobId"]
+                elif job_id != state["jobId"]:
+                    raise CortexError(
+                        "Checkpoint is for job %s, not %s" % (state["jobId"], job_id)
+                    )
+                if state.get("done"):
+                    return
+                if state.get("pageCursor") is not None:
+                    page_cursor = state["pageCursor"]
+                else:
+                    offset = state["offset"]
+                    kwargs["workers"] = kwargs.get("workers") or 1
+                page_number = None
+                if checkpoint is not None:
+                    checkpoint.state = state
+        if job_id in self._cached_jobs:
+            pages = self._iter_cached_pages(job_id, result_format)
+        else:
+            pages = self._iter_job_results(
+                job_id=job_id,
+                max_wait=max_wait,
+                offset=offset,
+                page_cursor=page_cursor,
+                page_number=page_number,
+                page_size=page_size,
+                result_format=result_format,
+                **kwargs
+            )
+            key = self._cache_jobs.get(job_id)
+            if key is not None and not any(
+                [offset, page_cursor, page_number, kwargs.get("params")]
+            ):
+                pages = self._cache_pages(job_id, key, pages)
+        if prefetch_:
+            pages = prefetch(pages, prefetch_)
+        start = offset or 0
+        try:
+            for p in pages:
+                yield p
+                if checkpoint is not None:
+                    p_json = p.json()
+                    if p_json.get("state") == "DONE":
+                        checkpoint.advance(job_id, p_json, start)
+        finally:
+            pages.close()
+
+    def _iter_job_results(
+        self,
+        job_id=None,
+        max_wait=None,
+        offset=None,
+        page_cursor=None,
+        page_number=None,
+        page_size=None,
+        result_format=None,
+        **kwargs
+    ):
+        """Walk a job's pages; see [iter_job_results()](#iter_job_results)."""
         params = kwargs.pop("params", {})
         enforce_json = kwargs.pop("enforce_json", True)
+        reorder_buffer = kwargs.pop("reorder_buffer", None)
+        wait_policy = kwargs.pop("wait_policy", None) or self.wait_policy
+        workers = kwargs.pop("workers", None)
+        deadline = kwargs.pop("deadline", None)
         for name, value in [
             ("maxWait", max_wait),
             ("offset", offset),
@@ -238,28 +717,609 @@ class QueryService(object):
             if value is not None:
                 params.update({name: value})
 
+        long_poll = "maxWait" not in params
+        waiting, polls, sleep, started = True, 0, 0, time.time()
         while True:
+            left = self._time_left(job_id, deadline) if waiting else None
+            if waiting and long_poll:
+                params.pop("maxWait", None)
+                max_wait = wait_policy.max_wait(polls)
+                if max_wait is not None:
+                    if left is not None:
+                        max_wait = min(max_wait, int(left * 1000))
+                    params["maxWait"] = max_wait
             r = self.get_job_results(
                 job_id=job_id, params=params, enforce_json=enforce_json, **kwargs
             )
             r_json = r.json()
+            if r_json["state"] in ("RUNNING", "PENDING"):
+                d = wait_policy.delay(polls)
+                polls += 1
+                if d and deadline is not None:
+                    d = min(d, max(deadline - time.time(), 0))
+                if d:
+                    time.sleep(d)
+                    sleep += d
+                continue
+            if waiting:
+                self._record_wait(job_id, polls, sleep, time.time() - started)
+                waiting = False
+                if long_poll:
+                    params.pop("maxWait", None)
             if r_json["state"] == "DONE":
                 page_cursor = r_json["page"].get("pageCursor")
-                if page_cursor is not None:
+                if workers and "pageCursor" not in params:
+                    for p in self._iter_pages_parallel(
+                        job_id,
+                        r,
+                        params,
+                        workers,
+                        reorder_buffer or 2 * workers,
+                        enforce_json=enforce_json,
+                        **kwargs
+                    ):
+                        yield p
+                    break
+                elif page_cursor is not None:
                     params["pageCursor"] = page_cursor
                     yield r
                 else:
                     yield r
                     break
-            elif r_json["state"] in ("RUNNING", "PENDING"):
-                time.sleep(1)
-                continue
             elif r_json["state"] == "FAILED":
                 yield r
                 break
             else:
                 raise CortexError("Bad state: %s" % r_json["state"])
 
+    def iter_sharded(
+        self,
+        sql,
+        start,
+        end,
+        shards=None,
+        shard_size=None,
+        ordered=True,
+        max_concurrency=4,
+        max_retries=2,
+        buffer=4,
+        **kwargs
+    ):
+        """Run a query as parallel time-range shards and stream merged rows.
+
+        :::info
+        `sql` is a template with `{start}` and `{end}` placeholders that
+        are filled with each shard's UTC bounds, e.g.
+        `... WHERE time_generated >= TIMESTAMP('{start}') AND time_generated < TIMESTAMP('{end}')`.
+        Up to `max_concurrency` shard jobs run at once, each drained on
+        its own thread. With `ordered=True`, rows are yielded shard by
+        shard in time order (ordering within a shard is up to the SQL);
+        otherwise rows are yielded as soon as any shard produces them. A
+        failed shard is retried on its own after a jittered backoff from
+        the client's `retry_policy` (or a default
+        [RetryPolicy](policies.md#retrypolicy)), resuming from its last page
+        where possible, without rerunning the others. When the generator is
+        closed early or a shard fails for good, the jobs of the other
+        shards are cancelled with [cancel_job()](#cancel_job).
+        :::
+
+        Args:
+            sql (str): Query template with `{start}` and `{end}` placeholders.
+            start (datetime or float): Range start (inclusive); epoch seconds or `datetime`.
+            end (datetime or float): Range end (exclusive); epoch seconds or `datetime`.
+            shards (int): Number of equally sized shards. Defaults to `max_concurrency`.
+            shard_size (timedelta or float): Shard length; takes precedence over `shards`.
+            ordered (bool): Yield rows in shard (time) order. Defaults to `True`.
+            max_concurrency (int): Max shard jobs in flight. Defaults to `4`.
+            max_retries (int): Retries per shard. Defaults to `2`.
+            buffer (int): Pages buffered ahead of the caller per running shard when `ordered`; otherwise the size of the queue all shards feed. Defaults to `4`.
+            time_format (callable): Formats shard bounds for the template. Defaults to [format_timestamp()](sharding.md#format_timestamp).
+            **kwargs: Supported [iter_job_results()](#iter_job_results) parameters, e.g. `result_format` or `page_size`.
+
+        Yields:
+            dict or list: One result row; a `list` of values for `valuesArray`.
+
+        Raises:
+            CortexError: If a shard still fails after `max_retries` retries.
+
+        """
+        time_format = kwargs.pop("time_format", format_timestamp)
+        kwargs.setdefault("raise_for_status", True)
+        if shards is None and shard_size is None:
+            shards = max_concurrency
+        jobs, lock, stop = set(), threading.Lock(), threading.Event()
+        sources = (
+            self._iter_shard(
+                {
+                    "query": sql.format(
+                        start=time_format(shard.start), end=time_format(shard.end)
+                    )
+                },
+                max_retries,
+                kwargs,
+                (jobs, lock, stop),
+            )
+            for shard in time_shards(start, end, shards=shards, shard_size=shard_size)
+        )
+
+        running = deque()
+        try:
+            if not ordered:
+                running.append(merge(sources, size=buffer, workers=max_concurrency))
+                for data in running[0]:
+                    for row in data:
+                        yield row
+                return
+            for source in sources:
+                running.append(prefetch(source, buffer))
+                if len(running) < max_concurrency:
+                    continue
+                for data in running[0]:
+                    for row in data:
+                        yield row
+                running.popleft().close()
+            while running:
+                for data in running[0]:
+                    for row in data:
+                        yield row
+                running.popleft().close()
+        finally:
+            stop.set()
+            self._cancel_shards(jobs, lock)  # before joining threads polling them
+            for pages in running:
+                pages.close()
+
+    def _iter_shard(self, query_params, max_retries, kwargs, shared):
+        """Yield the `data` of each page of one shard, retrying on failure."""
+        jobs, lock, stop = shared
+        policy = self._httpclient.retry_policy or RetryPolicy()
+        attempt, job_id, cursor, delay = 0, None, None, None
+        while True:
+            try:
+                if job_id is None:
+                    cursor = None
+                    q = self.create_query(
+                        query_params=query_params,
+                        raise_for_status=kwargs["raise_for_status"],
+                        coalesce=False,  # the job may be cancelled
+                    )
+                    job_id = q.json()["jobId"]
+                    with lock:
+                        jobs.add(job_id)
+                    if stop.is_set():  # closed while submitting
+                        self._cancel_shards(jobs, lock)
+                        return
+                for r in self.iter_job_results(
+                    job_id=job_id, page_cursor=cursor, **dict(kwargs)
+                ):
+                    r_json = r.json()
+                    if r_json["state"] == "FAILED":
+                        with lock:
+                            jobs.discard(job_id)
+                        job_id = None
+                        raise CortexError("Job failed: %s" % r.text)
+                    cursor = r_json["page"].get("pageCursor")
+                    yield r_json["page"]["result"]["data"]
+                with lock:
+                    jobs.discard(job_id)
+                return
+            except CortexError as e:
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+                delay = policy.delay(delay)
+                self._debug(
+                    "Retrying shard %r (%d) in %.2fs: %s", query_params, attempt, delay, e
+                )
+                if stop.wait(delay):
+                    return
+
+    def _cancel_shards(self, jobs, lock):
+        """Cancel the shard jobs still running for [iter_sharded()](#iter_sharded)."""
+        with lock:
+            pending = list(jobs)
+            jobs.clear()
+        for job_id in pending:
+            try:
+                self.cancel_job(job_id=job_id)
+            except CortexError as e:
+                self._debug("Failed to cancel shard job %s: %s", job_id, e)
+
+    def iter_records(
+        self, job_id=None, max_wait=None, page_size=None, result_format=None, **kwargs
+    ):
+        """Retrieve results row by row, parsing each page incrementally.
+
+        :::info
+        Pages are requested with `stream=True` and their `data` array is
+        decoded one row at a time as bytes arrive, so peak memory is about
+        one row rather than one page and the first row is available before
+        the page has finished downloading.
+        :::
+
+        Args:
+            job_id (str): Specifies the ID of the query job.
+            max_wait (int): How long to wait in ms for a job to complete. Max 2000.
+            page_size (int): If specified, limits the size of a batch of results to the specified value.
+            result_format (str): valuesArray or valuesDictionary.
+            chunk_size (int): Bytes read from the socket at a time. Defaults to `65536`.
+            deadline (float): `time.time()` by which the job must leave `PENDING`/`RUNNING`; polling stops there with `DeadlineExceededError`. Defaults to `None`.
+            wait_policy (WaitPolicy): Override the instance [WaitPolicy](policies.md#waitpolicy).
+            **kwargs: Supported [HTTPClient.request()](httpclient.md#request) parameters.
+
+        Yields:
+            dict or list: One result row; a `list` of values for `valuesArray`.
+
+        Raises:
+            CortexError: If the job fails, reaches an unexpected state or a page is not valid JSON.
+            DeadlineExceededError: If `deadline` passes while the job is pending or running.
+
+        """
+        if job_id in self._cached_jobs:
+            for r in self._iter_cached_pages(job_id, result_format):
+                for row in r.json().get("page", {}).get("result", {}).get("data") or ():
+                    yield row
+            return
+
+        key = self._cache_jobs.get(job_id)
+        stored = [] if key is not None and not kwargs.get("params") else None
+        cached_rows = 0
+        params = kwargs.pop("params", {})
+        chunk_size = kwargs.pop("chunk_size", 65536)
+        wait_policy = kwargs.pop("wait_policy", None) or self.wait_policy
+        deadline = kwargs.pop("deadline", None)
+        kwargs.update({"enforce_json": False, "stream": True})
+        for name, value in [
+            ("maxWait", max_wait),
+            ("pageSize", page_size),
+            ("resultFormat", result_format),
+        ]:
+            if value is not None:
+                params.update({name: value})
+
+        long_poll = "maxWait" not in params
+        waiting, polls, sleep, started = True, 0, 0, time.time()
+        while True:
+            left = self._time_left(job_id, deadline) if waiting else None
+            if waiting and long_poll:
+                params.pop("maxWait", None)
+                max_wait = wait_policy.max_wait(polls)
+                if max_wait is not None:
+                    if left is not None:
+                        max_wait = min(max_wait, int(left * 1000))
+                    params["maxWait"] = max_wait
+            mark = time.monotonic()
+            r = self.get_job_results(job_id=job_id, params=params, **kwargs)
+            doc = JSONStream(
+                r.iter_content(chunk_size), decoder=self._httpclient.json_decoder
+            )
+            rows, data, busy = 0, [], 0.0
+            try:
+                for row in doc.items("page", "result", "data"):
+                    busy += time.monotonic() - mark  # excludes time spent by caller
+                    rows += 1
+                    if stored is not None:
+                        data.append(row)
+                    yield row
+                    mark = time.monotonic()
+                busy += time.monotonic() - mark
+            except ValueError as e:
+                raise CortexError("Invalid JSON: {}".format(e))
+            finally:
+                self.stats.incr("records", rows)
+                self.stats.incr("results_seconds", busy)
+                r.close()
+
+            state = doc.fields.get("state")
+            if state in ("RUNNING", "PENDING"):
+                d = wait_policy.delay(polls)
+                polls += 1
+                if d and deadline is not None:
+                    d = min(d, max(deadline - time.time(), 0))
+                if d:
+                    time.sleep(d)
+                    sleep += d
+                continue
+            if waiting:
+                self._record_wait(job_id, polls, sleep, time.time() - started)
+                waiting = False
+                if long_poll:
+                    params.pop("maxWait", None)
+            if state == "DONE":
+                page_cursor = doc.fields.get("page", {}).get("pageCursor")
+                if stored is not None:
+                    page = dict(doc.fields.get("page", {}), result={"data": data})
+                    stored.append(dict(doc.fields, page=page))
+                    cached_rows += rows
+                    max_rows = self.cache.max_rows
+                    if max_rows is not None and cached_rows > max_rows:
+                        stored = None
+                if page_cursor is None:
+                    if stored is not None and self.cache.put(key, stored):
+                        self._cache_jobs.pop(job_id, None)
+                    break
+                params["pageCursor"] = page_cursor
+            elif state == "FAILED":
+                raise CortexError("Job failed: %s" % doc.fields)
+            else:
+                raise CortexError("Bad state: %s" % state)
+
+    @staticmethod
+    def _time_left(job_id, deadline):
+        """Return seconds left before `deadline`, raising once it has passed."""
+        if deadline is None:
+            return None
+        left = deadline - time.time()
+        if left <= 0:
+            raise DeadlineExceededError(
+                "Job %s did not finish before its deadline" % job_id
+            )
+        return left
+
+    @staticmethod
+    def _remember(mapping, key, value, maxlen=1024):
+        """Insert into a bounded, insertion-ordered mapping."""
+        mapping[key] = value
+        while len(mapping) > maxlen:
+            try:
+                mapping.popitem(last=False)
+            except KeyError:  # emptied by a concurrent caller
+                break
+
+    def _iter_cached_pages(self, job_id, result_format=None):
+        """Yield locally cached pages of a cache-hit job as responses."""
+        for page in self._cached_jobs[job_id]:
+            yield Response.from_payload(convert_page(page, result_format))
+
+    def _cached_results(
+        self,
+        job_id,
+        offset=None,
+        page_cursor=None,
+        page_number=None,
+        page_size=None,
+        result_format=None,
+    ):
+        """Serve one page of a cache-hit job the way `get_job_results()` would."""
+        pages = self._cached_jobs[job_id]
+        if page_cursor is None and offset is None and page_number is None:
+            payload = pages[0]
+        elif page_cursor is not None:
+            cursors = [p.get("page", {}).get("pageCursor") for p in pages]
+            if page_cursor not in cursors[:-1]:
+                raise CortexError("Unknown pageCursor for job %s" % job_id)
+            payload = pages[cursors.index(page_cursor) + 1]
+        else:
+            rows = [
+                row
+                for p in pages
+                for row in p.get("page", {}).get("result", {}).get("data") or ()
+            ]
+            size = page_size or pages[0].get("rowsInPage") or len(rows) or 1
+            start = offset if offset is not None else page_number * size
+            data = rows[start:start + size]
+            payload = dict(
+                pages[0], rowsInPage=len(data), page={"result": {"data": data}}
+            )
+        payload = dict(convert_page(payload, result_format), jobId=job_id)
+        return Response.from_payload(payload)
+
+    def _cache_pages(self, job_id, key, pages):
+        """Pass pages through, storing them in the cache once fully drained."""
+        stored, rows = [], 0
+        for r in pages:
+            payload = r.json()
+            if stored is not None:
+                rows += payload.get("rowsInPage") or 0
+                if payload.get("state") != "DONE" or (
+                    self.cache.max_rows is not None and rows > self.cache.max_rows
+                ):
+                    stored = None
+                else:
+                    stored.append(payload)
+            yield r
+        if stored and self.cache.put(key, stored):
+            self._cache_jobs.pop(job_id, None)
+
+    def _iter_pages_parallel(self, job_id, first, params, workers, window, **kwargs):
+        """Yield `first`, then the rest of a `DONE` job's pages in order.
+
+        :::info
+        Pages are requested by `offset` and `pageSize` from a thread
+        pool. At most `window` pages are fetched ahead of the caller, so
+        memory stays bounded while pages are still returned in order.
+        :::
+
+        Args:
+            job_id (str): Specifies the ID of the query job.
+            first (requests.Response): First page of the job.
+            params (dict): Request parameters used for `first`.
+            workers (int): Number of fetch threads.
+            window (int): Max number of pages in flight or buffered.
+            **kwargs: Supported [HTTPClient.request()](httpclient.md#request) parameters.
+
+        Yields:
+            requests.Response: Requests [Response()](https://docs.python-requests.org/en/latest/api/#requests.Response) object.
+
+        """
+        r_json = first.json()
+        yield first
+        total, size = r_json.get("rowsInJob"), r_json.get("rowsInPage")
+        if not total or not size:
+            return
+        if "pageNumber" in params:
+            start = int(params["pageNumber"]) * params.get("pageSize", size)
+        else:
+            start = int(params.get("offset", 0))
+        # stride by what the server returned; it may cap pageSize
+        params = dict(params, pageSize=size)
+        params.pop("pageNumber", None)
+
+        def fetch(offset):
+            return self.get_job_results(
+                job_id=job_id, params=dict(params, offset=offset), **kwargs
+            )
+
+        offsets = iter(range(start + size, total, size))
+        pending = deque()  # (offset, future)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    while len(pending) < max(window, 1):
+                        offset = next(offsets, None)
+                        if offset is None:
+                            break
+                        pending.append((offset, pool.submit(fetch, offset)))
+                    if not pending:
+                        return
+                    offset, future = pending.popleft()
+                    r = future.result()
+                    rows = r.json().get("rowsInPage") or 0
+                    if rows == min(size, total - offset):
+                        yield r
+                        continue
+                    # page does not cover its range: continue sequentially
+                    self._debug(
+                        "Page at offset %d has %d rows, expected %d; "
+                        "continuing sequentially",
+                        offset,
+                        rows,
+                        min(size, total - offset),
+                    )
+                    for _, f in pending:
+                        f.cancel()
+                    pending.clear()
+                    while True:
+                        if not rows:
+                            raise CortexError(
+                                "Empty result page at offset %d of %d rows"
+                                % (offset, total)
+                            )
+                        yield r
+                        offset += rows
+                        if offset >= total:
+                            return
+                        r = fetch(offset)
+                        rows = r.json().get("rowsInPage") or 0
+            finally:
+                for _, f in pending:
+                    f.cancel()
+
+    def _send(self, stat, flight=None, coalesce=True, **kwargs):
+        """Send a request and count it in `stats[stat]`.
+
+        :::info
+        With coalescing enabled, concurrent calls with the same `flight`
+        identity (by default, the request arguments) share one HTTP
+        request, and each waiter gets its own copy of the response.
+        Streamed responses are never shared.
+        :::
+
+        Args:
+            stat (str): Stats counter of the calling method.
+            flight (object): JSON-serializable request identity. Defaults to `None` (use `kwargs`).
+            coalesce (bool): Allow sharing this request. Defaults to `True`.
+            **kwargs: Supported [_request()](#_request) parameters.
+
+        Returns:
+            tuple: `(response, shared)` where `shared` is `True` if another caller sent the request.
+
+        """
+        stream = kwargs.get("stream", self._httpclient.session.stream)
+        if self._flights is None or not coalesce or stream:
+            r, shared = self._request(**kwargs), False
+        else:
+            key = json.dumps(
+                kwargs if flight is None else flight, sort_keys=True, default=repr
+            )
+            r, shared = self._flights.do(key, self._request, **kwargs)
+        if shared:
+            r = r.copy()
+            self.stats.incr("coalesced")
+        else:
+            self.stats.incr(stat)
+        return r, shared
+
+    def _request(self, path=None, **kwargs):
+        """Send a request, through a prepared endpoint when possible.
+
+        :::info
+        Calls that only set the method, endpoint, query parameters, JSON
+        body and `enforce_json`/`stream`/`timeout` use the client's cached
+        [Endpoint](httpclient.md#endpoint) for the endpoint template, so
+        polling and paging skip the per-call setup of
+        [HTTPClient.request()](httpclient.md#request).
+        :::
+
+        Args:
+            path (dict): Values of the placeholders in `endpoint`. Defaults to `None`.
+            **kwargs: Supported [HTTPClient.request()](httpclient.md#request) parameters.
+
+        Returns:
+            requests.Response: Requests [Response()](https://docs.python-requests.org/en/latest/api/#requests.Response) object.
+
+        """
+        if kwargs.get("url") == self._httpclient.url and _FAST_KWARGS.issuperset(
+            kwargs
+        ):
+            endpoint = self._httpclient.endpoint(
+                kwargs.pop("method"), kwargs.pop("endpoint", "")
+            )
+            del kwargs["url"]
+            kwargs.update(path or {})
+            return endpoint(**kwargs)
+        if path:
+            kwargs["endpoint"] = kwargs["endpoint"].format(**path)
+        return self._httpclient.request(**kwargs)
+
+    def _record_wait(self, job_id, polls, sleep, wait):
+        """Record SDK-side wait accounting for a job.
+
+        `polls` and `poll_sleep` are totals; per-job entries of
+        `job_waits` are kept for the most recent 1024 jobs only.
+
+        Args:
+            job_id (str): Specifies the ID of the query job.
+            polls (int): Number of not-ready responses received.
+            sleep (float): Seconds slept client-side between polls.
+            wait (float): Seconds elapsed until the job left the running state.
+
+        """
+        self.stats.incr("polls", polls)
+        self.stats.incr("poll_sleep", sleep)
+        self._remember(
+            self.stats.job_waits,
+            job_id,
+            {"polls": polls, "sleep": sleep, "wait": wait},
+        )
+
+    def job(self, query_params=None, job_id=None, deadline=None, **kwargs):
+        """Return a managed job handle that cancels the job when abandoned.
+
+        Examples:
+
+        ```python
+        with qs.job("SELECT * FROM `1234.firewall.traffic`", deadline=60) as job:
+            for row in job.records(limit=1000):
+                print(row)
+        ```
+
+        Args:
+            query_params (dict or str): Query parameters or SQL string.
+            job_id (str): Manage an already submitted job instead of creating one.
+            deadline (float): Seconds after submission after which the job is cancelled. Defaults to `None`.
+            **kwargs: Supported [create_query()](#create_query) parameters.
+
+        Returns:
+            QueryJob: [QueryJob](#queryjob) context manager.
+
+        """
+        if query_params is not None and not isinstance(query_params, dict):
+            query_params = {"query": query_params}
+        return QueryJob(
+            self, query_params=query_params, job_id=job_id, deadline=deadline, **kwargs
+        )
+
     def list_jobs(
         self,
         max_jobs=None,
@@ -297,5 +1357,270 @@ class QueryService(object):
         r = self._httpclient.request(
             method="GET", url=self.url, params=params, endpoint=endpoint, **kwargs
         )
-        self.stats.list_jobs += 1
+        self.stats.incr("list_jobs")
         return r
+
+    def iter_jobs(
+        self,
+        created_after=None,
+        max_jobs=None,
+        page_size=100,
+        state=None,
+        job_type=None,
+        tenant_id=None,
+        created_before=None,
+        **kwargs
+    ):
+        """Iterate over jobs matching criteria, paging through [list_jobs()](#list_jobs).
+
+        :::info
+        Pages are requested with a `createdAfter` cursor one millisecond
+        before the newest `submitTime` seen so far, since several jobs may
+        share that millisecond across a page boundary; jobs already seen
+        at the cursor are skipped. Jobs within a page need not be sorted.
+        Iteration stops on a short or empty page, once the listing has
+        passed `created_before`, or once `max_jobs` jobs have been yielded.
+        :::
+
+        Args:
+            created_after (int): List jobs created after this unix epoch UTC datetime.
+            max_jobs (int): Max number of jobs to yield. Defaults to `None` (all).
+            page_size (int): Max new jobs per `list_jobs` request. Defaults to `100`.
+            state (str): Job state, e.g. 'RUNNING', 'PENDING', 'FAILED', 'DONE'.
+            job_type (str): Query type hint.
+            tenant_id (str): Tenant ID.
+            created_before (int): Only yield jobs created at or before this `submitTime`, and stop listing past it. Defaults to `None`.
+            **kwargs: Supported [HTTPClient.request()](httpclient.md#request) parameters.
+
+        Yields:
+            dict: Job descriptor as returned by the API.
+
+        """
+        cursor, at_cursor, count = None, set(), 0
+        while True:
+            limit = page_size + len(at_cursor)  # jobs at the cursor come back
+            if max_jobs is not None:
+                limit = min(limit, max_jobs - count + len(at_cursor))
+            jobs = self.list_jobs(
+                max_jobs=limit,
+                created_after=created_after if cursor is None else cursor - 1,
+                state=state,
+                job_type=job_type,
+                tenant_id=tenant_id,
+                **dict(kwargs)
+            ).json()
+            newest = cursor
+            for job in jobs:
+                submitted = job.get("submitTime")
+                if submitted is not None and (newest is None or submitted > newest):
+                    newest = submitted
+            seen, at_cursor = at_cursor, set(at_cursor) if newest == cursor else set()
+            for job in jobs:
+                submitted = job.get("submitTime")
+                if submitted == newest:
+                    at_cursor.add(job["jobId"])
+                if job["jobId"] in seen:
+                    continue
+                bounded = created_before is not None and submitted is not None
+                if bounded and submitted > created_before:
+                    continue
+                yield job
+                count += 1
+                if max_jobs is not None and count >= max_jobs:
+                    return
+            if len(jobs) < limit or newest is None:
+                return
+            if created_before is not None and newest > created_before:
+                return
+            cursor = newest
+
+    def poll_jobs(
+        self,
+        job_ids,
+        created_after=None,
+        state=None,
+        fallback=True,
+        page_size=100,
+        **kwargs
+    ):
+        """Refresh the state of many jobs with as few requests as possible.
+
+        :::info
+        Jobs are collected from [iter_jobs()](#iter_jobs), so a poll cycle
+        over hundreds of jobs costs a handful of `list_jobs` calls instead
+        of one `get_job` call per job. The listing is bounded by the submit
+        times of the requested jobs, as recorded by
+        [create_query()](#create_query) and by earlier polls: it starts
+        just before the oldest one and stops as soon as every job has been
+        seen or the listing has passed the newest one. Jobs whose submit
+        time is unknown are only listed when `created_after` is given.
+        Jobs that were not listed, e.g. because they are not in `state`,
+        are fetched individually with [get_job()](#get_job) when `fallback`
+        is set.
+        :::
+
+        Args:
+            job_ids (iterable): IDs of the jobs to refresh.
+            created_after (int): Only list jobs created after this unix epoch UTC datetime. Defaults to just before the oldest known submit time.
+            state (str): Only list jobs in this state.
+            fallback (bool): Call `get_job()` for jobs missing from the listing. Defaults to `True`.
+            page_size (int): Max jobs per `list_jobs` request. Defaults to `100`.
+            **kwargs: Supported [HTTPClient.request()](httpclient.md#request) parameters.
+
+        Returns:
+            dict: Job ID to job descriptor; jobs not found are omitted.
+
+        """
+        wanted = set(job_ids)
+        found = {}
+        known = [self._submit_times.get(job_id) for job_id in wanted]
+        known = [t for t in known if t is not None]
+        newest = None
+        if known and len(known) == len(wanted):
+            newest = max(latest for _, latest in known)
+        if created_after is None and known:
+            created_after = min(earliest for earliest, _ in known) - 1
+        if wanted and created_after is not None:
+            for job in self.iter_jobs(
+                created_after=created_after,
+                page_size=page_size,
+                state=state,
+                created_before=newest,
+                **dict(kwargs)
+            ):
+                if job["jobId"] in wanted:
+                    found[job["jobId"]] = job
+                    if len(found) == len(wanted):
+                        break
+        if fallback:
+            for job_id in wanted.difference(found):
+                r = self.get_job(job_id=job_id, **dict(kwargs))
+                if r.status_code == 200:
+                    found[job_id] = r.json()
+        for job_id, job in found.items():
+            submitted = job.get("submitTime")
+            if submitted is not None:
+                self._remember(self._submit_times, job_id, (submitted, submitted))
+        return found
+
+    def run_many(self, queries, max_concurrency=8, drain=False, **kwargs):
+        """Run many queries with bounded concurrency.
+
+        :::info
+        Each query is submitted with [create_query()](#create_query), waited
+        on and drained with [iter_job_results()](#iter_job_results) on a
+        pool of `max_concurrency` threads, so at most that many jobs are in
+        flight at once. Results are yielded in completion order. Every
+        query gets its own job, even with coalescing enabled, so that
+        cancelling one never affects another.
+
+        Closing the generator early returns without waiting for in-flight
+        queries: their jobs are cancelled with [cancel_job()](#cancel_job)
+        and their threads stop at the next page.
+
+        With `drain=True` every decoded page of every query is kept in
+        `QueryRun.pages`, so memory grows with the total size of all
+        results; leave it off to only count rows.
+        :::
+
+        Args:
+            queries (iterable): Query parameter dicts or SQL strings.
+            max_concurrency (int): Max number of jobs in flight. Defaults to `8`.
+            drain (bool): Collect decoded result pages in `QueryRun.pages`. Defaults to `False`.
+            **kwargs: Supported [iter_job_results()](#iter_job_results) parameters, e.g. `result_format` or `page_size`. [HTTPClient.request()](httpclient.md#request) parameters such as `timeout` also apply to [create_query()](#create_query), and `json` only to it.
+
+        Yields:
+            QueryRun: [QueryRun](#queryrun) with job state, pages, row count, error and timings (`submit`, `wait`, `drain`, `total` in seconds).
+
+        """
+        queries = iter(queries)
+        pending = set()
+        runs = {}  # future -> QueryRun
+        stop = threading.Event()
+        lock = threading.Lock()
+
+        def cancel(run):
+            with lock:
+                if run.job_id is None or run.cancelled:
+                    return
+                run.cancelled = True
+            try:
+                self.cancel_job(job_id=run.job_id)
+            except CortexError as e:
+                self._debug("Failed to cancel job %s: %s", run.job_id, e)
+
+        pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        try:
+            for index, q in enumerate(queries):
+                if not isinstance(q, dict):
+                    q = {"query": q}
+                run = QueryRun(index, q)
+                f = pool.submit(self._run_one, run, drain, kwargs, stop, cancel)
+                runs[f] = run
+                pending.add(f)
+                if len(pending) >= 2 * max_concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        runs.pop(f)
+                        yield f.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    runs.pop(f)
+                    yield f.result()
+        finally:
+            stop.set()
+            for f in pending:
+                if not f.cancel() and not f.done():
+                    cancel(runs[f])
+            pool.shutdown(wait=False)
+
+    def _run_one(self, run, drain, kwargs, stop, cancel):
+        """Submit, wait on and drain one query for [run_many()](#run_many)."""
+        started = time.time()
+        submit_kwargs = dict(
+            (k, v) for k, v in kwargs.items() if k not in _RESULTS_KWARGS
+        )
+        try:
+            q = self.create_query(
+                query_params=run.query_params, coalesce=False, **submit_kwargs
+            )
+            run.timing["submit"] = time.time() - started
+            if not q.ok:
+                run.state, run.error = "ERROR", q.text
+                return run
+            run.job_id = q.json()["jobId"]
+            if stop.is_set():  # closed while submitting
+                cancel(run)
+                return run
+            drained, complete = None, False
+            pages = self.iter_job_results(
+                job_id=run.job_id,
+                **dict((k, v) for k, v in kwargs.items() if k != "json")
+            )
+            try:
+                for r in pages:
+                    if stop.is_set():
+                        break
+                    if drained is None:
+                        drained = time.time()
+                    r_json = r.json()
+                    run.state = r_json["state"]
+                    run.rows += r_json.get("rowsInPage") or 0
+                    if drain:
+                        run.pages.append(r_json)
+                    if run.state == "FAILED":
+                        run.error = r.text
+                else:
+                    complete = True
+            finally:
+                pages.close()
+                if not complete:
+                    cancel(run)
+            drained = drained or time.time()
+            run.timing["wait"] = drained - started - run.timing["submit"]
+            run.timing["drain"] = time.time() - drained
+        except Exception as e:  # one failed query must not end the others
+            run.state, run.error = "ERROR", getattr(e, "message", None) or repr(e)
+        run.timing["total"] = time.time() - started
+        return run
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+"""
+:::info
+Client-side rate limiting for [HTTPClient](httpclient.md#httpclient).
+Requests are classified into endpoint groups (query submission, job
+status, result fetching and OAuth token requests), each drawing from its
+own token bucket. A `429 Too Many Requests` response pauses its group
+for the server's `Retry-After` and lowers the group's rate, which then
+recovers gradually while requests succeed.
+:::
+
+Examples:
+
+```python
+from pan_cortex_data_lake import QueryService
+from pan_cortex_data_lake.ratelimit import RateLimiter
+
+limiter = RateLimiter({"submit": 2, "results": 20, "jobs": 10, "token": 1})
+qs = QueryService(credentials=c, rate_limit=limiter)
+```
+
+"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+from .exceptions import CortexError
+
+GROUPS = ("submit", "jobs", "results", "token")
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket with additive-increase/multiplicative-decrease."""
+
+    def __init__(self, rate, burst=None, min_rate=None, decrease=0.5, increase=None):
+        """
+
+        :::info
+        Tokens accrue at `rate` per second up to `burst`. Each throttled
+        response multiplies the current rate by `decrease` (not below
+        `min_rate`) and each successful response adds `increase` back,
+        up to the configured `rate`.
+        :::
+
+        Args:
+            rate (float): Requests per second.
+            burst (int): Bucket capacity. Defaults to `max(1, rate)`.
+            min_rate (float): Lowest rate reached by throttling. Defaults to `rate / 16`.
+            decrease (float): Rate multiplier applied on throttling. Defaults to `0.5`.
+            increase (float): Rate added back per successful request. Defaults to `rate / 100`.
+
+        """
+        if rate <= 0:
+            raise CortexError("rate must be positive")
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = burst or max(1.0, self.max_rate)
+        self.min_rate = min_rate or self.max_rate / 16
+        self.decrease = decrease
+        self.increase = increase or self.max_rate / 100
+        self.tokens = float(self.burst)
+        self.blocked_until = 0.0
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "{}(rate={!r}, burst={!r}, current_rate={!r})".format(
+            self.__class__.__name__, self.max_rate, self.burst, self.rate
+        )
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def acquire(self):
+        """Take one token, sleeping until it is available.
+
+        Returns:
+            float: Seconds spent waiting.
+
+        """
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return now - started
+                delay = max(
+                    self.blocked_until - now, (1 - self.tokens) / self.rate, 0.001
+                )
+            time.sleep(delay)
+
+    def success(self):
+        """Record a request that was not throttled."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def throttle(self, retry_after=None):
+        """Record a `429` response.
+
+        Args:
+            retry_after (float): Seconds the server asked to wait. Defaults to `None`.
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+
+class RateLimiter(object):
+    """Per-endpoint-group token buckets shared by one or more clients."""
+
+    def __init__(self, rates=None, default=None, max_retries=3, **kwargs):
+        """
+
+        Args:
+            rates (dict): Group name (`submit`, `jobs`, `results` or `token`) to requests per second or [TokenBucket](#tokenbucket).
+            default (float): Rate of groups missing from `rates`. Defaults to `None` (unlimited).
+            max_retries (int): Times a throttled request is re-sent after waiting. Defaults to `3`.
+            **kwargs: [TokenBucket](#tokenbucket) parameters applied to buckets built from numbers.
+
+        Raises:
+            CortexError: If a group name is unknown.
+
+        """
+        self.buckets = {}
+        self.max_retries = max_retries
+        rates = dict(rates or {})
+        for group in GROUPS:
+            rate = rates.pop(group, default)
+            if isinstance(rate, TokenBucket):
+                self.buckets[group] = rate
+            elif rate is not None:
+                self.buckets[group] = TokenBucket(rate, **kwargs)
+        if rates:
+            raise CortexError("Unknown rate limit group(s): %s" % ", ".join(rates))
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, self.buckets)
+
+    @staticmethod
+    def group(method, url):
+        """Classify a request into an endpoint group.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL.
+
+        Returns:
+            str: `submit`, `jobs`, `results` or `token`.
+
+        """
+        path = urlparse(url).path
+        if path.startswith("/api/oauth2/"):
+            return "token"
+        if path.startswith("/query/v2/jobResults"):
+            return "results"
+        if method.upper() == "POST" and path.rstrip("/") == "/query/v2/jobs":
+            return "submit"
+        return "jobs"
+
+    def bucket(self, method, url):
+        """Return the bucket governing a request, or `None` if unlimited.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL.
+
+        Returns:
+            TokenBucket: Bucket of the request's endpoint group.
+
+        """
+        return self.buckets.get(self.group(method, url))
+
+
+def retry_after(response, default=1.0):
+    """Parse a response's `Retry-After` header.
+
+    Args:
+        response (requests.Response): Throttled response.
+        default (float): Seconds to use if the header is missing or invalid. Defaults to `1.0`.
+
+    Returns:
+        float: Seconds to wait.
+
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    return max(0.0, when.timestamp() - time.time())
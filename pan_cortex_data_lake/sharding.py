@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+:::info
+Helpers for splitting a query over a time range into sub-range shards.
+See [QueryService.iter_sharded()](query.md#iter_sharded).
+:::
+
+"""
+
+from __future__ import absolute_import
+
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from .exceptions import CortexError
+
+TimeShard = namedtuple("TimeShard", ["index", "start", "end"])
+
+
+def to_datetime(value):
+    """Convert epoch seconds or a naive/aware `datetime` to an aware UTC `datetime`.
+
+    Args:
+        value (datetime or float): Point in time; naive datetimes are taken as UTC.
+
+    Returns:
+        datetime: Timezone-aware UTC datetime.
+
+    """
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+def format_timestamp(value):
+    """Format a shard boundary for SQL, e.g. `2021-03-01 00:00:00`.
+
+    Args:
+        value (datetime): Aware UTC datetime.
+
+    Returns:
+        str: `YYYY-MM-DD HH:MM:SS[.ffffff]` in UTC.
+
+    """
+    if value.microsecond:
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def time_shards(start, end, shards=None, shard_size=None):
+    """Split `[start, end)` into consecutive, non-overlapping shards.
+
+    Args:
+        start (datetime or float): Range start (inclusive).
+        end (datetime or float): Range end (exclusive).
+        shards (int): Number of equally sized shards.
+        shard_size (timedelta or float): Shard length; takes precedence over `shards`.
+
+    Returns:
+        list: [TimeShard](#timeshard) tuples in time order.
+
+    Raises:
+        CortexError: If the range is empty or neither `shards` nor `shard_size` is valid.
+
+    """
+    start, end = to_datetime(start), to_datetime(end)
+    if end <= start:
+        raise CortexError("Empty time range: %s - %s" % (start, end))
+    if shard_size is not None:
+        if not isinstance(shard_size, timedelta):
+            shard_size = timedelta(seconds=shard_size)
+        if shard_size <= timedelta(0):
+            raise CortexError("shard_size must be positive")
+        bounds = [start]
+        while bounds[-1] + shard_size < end:
+            bounds.append(bounds[-1] + shard_size)
+    elif shards and shards > 0:
+        bounds = [start + (end - start) * i / shards for i in range(shards)]
+    else:
+        raise CortexError("Either shards or shard_size is required")
+    bounds.append(end)
+    return [TimeShard(i, bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+"""
+:::info
+Per-phase request timing for [HTTPClient](httpclient.md#httpclient).
+Hooks registered with the client's `timing_hooks` parameter are called
+as each phase of a request completes, with the phase name, its duration
+in seconds and a [RequestTiming](#requesttiming) carrying the request's
+method, URL, status code and `x-request-id`. Phases are:
+
+- `credential`: applying credentials, including any token refresh.
+- `connect`: opening TCP and TLS connections (`0` on a reused connection).
+- `ttfb`: sending the request and waiting for the response headers.
+- `download`: reading the response body.
+- `decode`: decoding the JSON body, on first access to `json()`.
+
+Phases are reported once the response headers have arrived, so the
+`x-request-id` is known; `download` of a streamed body and `decode` are
+reported when they happen. Durations are summed over retried attempts.
+When no hook is registered, requests are not timed at all.
+:::
+
+Examples:
+
+```python
+from pan_cortex_data_lake import QueryService
+
+def slow(phase, seconds, timing):
+    if seconds > 1:
+        print(timing.request_id, timing.url, phase, seconds)
+
+qs = QueryService(credentials=c, force_trace=True, timing_hooks=[slow])
+```
+
+"""
+
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+PHASES = ("credential", "connect", "ttfb", "download", "decode")
+
+_local = threading.local()  # connect time of the current thread's request
+
+
+class RequestTiming(object):
+    """Phase durations of one logical request."""
+
+    def __init__(self, hooks, method, url):
+        """
+
+        Args:
+            hooks (list): Callables invoked as `hook(phase, seconds, timing)`.
+            method (str): HTTP method.
+            url (str): Request URL.
+
+        """
+        self.hooks = hooks
+        self.method = method
+        self.url = url
+        self.request_id = None
+        self.status_code = None
+        self.phases = {}
+        self._ready = False
+
+    def __repr__(self):
+        return "{}(method={!r}, url={!r}, request_id={!r}, phases={!r})".format(
+            self.__class__.__name__,
+            self.method,
+            self.url,
+            self.request_id,
+            self.phases,
+        )
+
+    def record(self, phase, seconds):
+        """Add time to a phase, reporting it if the response has arrived.
+
+        Args:
+            phase (str): Phase name.
+            seconds (float): Duration.
+
+        """
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        if self._ready:
+            self._report(phase, seconds)
+
+    def ready(self, response):
+        """Report the phases recorded so far for a received response.
+
+        Args:
+            response (requests.Response): Final response of the request.
+
+        """
+        self.request_id = response.headers.get("x-request-id")
+        self.status_code = response.status_code
+        self._ready = True
+        for phase in PHASES:
+            if phase in self.phases:
+                self._report(phase, self.phases[phase])
+
+    def _report(self, phase, seconds):
+        for hook in self.hooks:
+            try:
+                hook(phase, seconds, self)
+            except Exception:
+                logger.exception("Timing hook %r failed" % hook)
+
+
+def connect_timer():
+    """Reset and return the current thread's connect time accumulator."""
+    _local.connect = 0.0
+    return _local
+
+
+class _TimedConnect(object):
+    def connect(self):
+        started = time.monotonic()
+        try:
+            super(_TimedConnect, self).connect()
+        finally:
+            _local.connect = getattr(_local, "connect", 0.0) + (
+                time.monotonic() - started
+            )
+
+
+class TimedHTTPConnection(_TimedConnect, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnect, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+_POOLS = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """`HTTPAdapter` whose connections record how long they take to open."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(TimedHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _POOLS
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super(TimedHTTPAdapter, self).proxy_manager_for(
+            proxy, **proxy_kwargs
+        )
+        manager.pool_classes_by_scheme = _POOLS
+        return manager
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+"""
+:::info
+HTTP/2 transport for [HTTPClient](httpclient.md#httpclient). The
+[HTTP2Adapter](#http2adapter) plugs into `requests` like the default
+`HTTPAdapter` but sends requests through an `httpx` client with HTTP/2
+enabled, so concurrent page fetches and job polls are multiplexed over a
+single connection per host instead of one TCP+TLS connection each.
+Requires the optional `httpx` and `h2` libraries
+(`pip install pan-cortex-data-lake[http2]`).
+:::
+
+Examples:
+
+```python
+from pan_cortex_data_lake import QueryService
+
+qs = QueryService(credentials=c, http2=True)
+pages = qs.iter_job_results(job_id=job_id, workers=8)
+```
+
+"""
+
+from __future__ import absolute_import
+
+import os
+import ssl
+import threading
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, select_proxy
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+from .exceptions import CortexError
+
+
+class _StreamReader(object):
+    """File-like view of an `httpx` byte iterator, used as `Response.raw`."""
+
+    def __init__(self, response):
+        self._response = response
+        self._chunks = response.iter_bytes()
+        self._buffer = b""
+
+    def read(self, amt=None, **kwargs):
+        while amt is None or len(self._buffer) < amt:
+            try:
+                self._buffer += next(self._chunks)
+            except StopIteration:
+                break
+        if amt is None:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def tell(self):
+        """Return the number of body bytes received on the wire so far."""
+        return self._response.num_bytes_downloaded
+
+    def close(self):
+        self._response.close()
+
+    def release_conn(self):
+        self.close()
+
+
+class HTTP2Adapter(BaseAdapter):
+    """`requests` transport adapter that sends requests over HTTP/2 via `httpx`."""
+
+    def __init__(
+        self,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        max_retries=0,
+        trust_env=True,
+        transport=None,
+    ):
+        """
+
+        :::info
+        One `httpx.Client` is kept per distinct `verify`/`cert`/proxy
+        setting and shared by all threads. `pool_maxsize` bounds the
+        number of concurrent streams' connections; HTTP/2 normally needs
+        only one per host. Requests are proxied like with `HTTPAdapter`:
+        the proxy is selected from the `proxies` passed by the session,
+        which include the environment's when `trust_env` is set. A custom
+        `transport` is used as is, without a proxy.
+        :::
+
+        Args:
+            pool_connections (int): Max keep-alive connections. Defaults to `10`.
+            pool_maxsize (int): Max connections. Defaults to `10`.
+            pool_block (bool): Accepted for `HTTPAdapter` compatibility; `httpx` always waits for a free connection.
+            max_retries (int): Connection retries. Defaults to `0`.
+            trust_env (bool): Read proxy and certificate settings from the environment. Defaults to `True`.
+            transport (httpx.BaseTransport): Custom `httpx` transport, e.g. for testing. Defaults to `None`.
+
+        Raises:
+            CortexError: If `httpx` or `h2` is not installed.
+
+        """
+        super(HTTP2Adapter, self).__init__()
+        if httpx is None:
+            raise CortexError("Module import error: httpx")
+        if h2 is None and transport is None:
+            raise CortexError("Module import error: h2")
+        if not isinstance(max_retries, int):
+            max_retries = getattr(max_retries, "total", None) or 0
+        self.limits = httpx.Limits(
+            max_connections=pool_maxsize, max_keepalive_connections=pool_connections
+        )
+        self.max_retries = max_retries
+        self.trust_env = trust_env
+        self.transport = transport
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, verify, cert, proxy=None):
+        key = (verify, cert if not isinstance(cert, list) else tuple(cert), proxy)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                kwargs = {"http2": True, "limits": self.limits}
+                if self.transport is not None:
+                    kwargs["transport"] = self.transport
+                else:
+                    if isinstance(verify, str):  # CA bundle file or directory
+                        if os.path.isdir(verify):
+                            verify = ssl.create_default_context(capath=verify)
+                        else:
+                            verify = ssl.create_default_context(cafile=verify)
+                    try:
+                        kwargs["transport"] = httpx.HTTPTransport(
+                            http2=True,
+                            verify=verify,
+                            cert=cert,
+                            limits=self.limits,
+                            trust_env=self.trust_env,
+                            retries=self.max_retries,
+                            proxy=proxy,
+                        )
+                    except ImportError as e:  # SOCKS proxy without socksio
+                        raise CortexError("Module import error: %s" % e)
+                # proxies were resolved by the session, environment included
+                client = self._clients[key] = httpx.Client(trust_env=False, **kwargs)
+            return client
+
+    @staticmethod
+    def _timeout(timeout):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return httpx.Timeout(read, connect=connect)
+        return httpx.Timeout(timeout)
+
+    def send(
+        self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None
+    ):
+        """Send a `PreparedRequest` and return a `requests.Response`.
+
+        Raises:
+            requests.ConnectionError: If the connection fails.
+            requests.Timeout: If the request times out.
+
+        """
+        client = self._client(verify, cert, select_proxy(request.url, proxies or {}))
+        req = client.build_request(
+            request.method,
+            request.url,
+            headers=dict(request.headers),
+            content=request.body,
+            timeout=self._timeout(timeout),
+        )
+        try:
+            resp = client.send(req, stream=True)
+        except httpx.ConnectTimeout as e:
+            raise requests.ConnectTimeout(e, request=request)
+        except httpx.TimeoutException as e:
+            raise requests.ReadTimeout(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(e, request=request)
+
+        r = requests.Response()
+        r.status_code = resp.status_code
+        r.reason = resp.reason_phrase
+        r.headers = CaseInsensitiveDict(resp.headers.multi_items())
+        # httpx decodes the body; the header no longer describes it
+        r.headers.pop("Content-Encoding", None)
+        r.encoding = get_encoding_from_headers(r.headers)
+        r.url = request.url
+        r.request = request
+        r.connection = self
+        r.http_version = resp.http_version
+        r.raw = _StreamReader(resp)
+        if not stream:
+            try:
+                r._content = r.raw.read()
+                r._content_consumed = True
+            except httpx.TransportError as e:
+                raise requests.ConnectionError(e, request=request)
+            finally:
+                resp.close()
+        return r
+
+    def close(self):
+        """Close all `httpx` clients."""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
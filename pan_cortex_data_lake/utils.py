@@ -9,37 +9,728 @@ PAN CDL Python SDK utilities.
 
 from __future__ import absolute_import
 
+import bisect
+import codecs
+import json
 import logging  # noqa: F401
+import re
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from .exceptions import CortexError
+
+_END = object()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram(object):
+    """Fixed-bucket histogram with constant memory.
+
+    :::info
+    Observations are counted in the first bucket whose upper bound is
+    greater than or equal to the value, plus an overflow bucket.
+    Quantiles are estimated by linear interpolation inside a bucket, so
+    their precision is bounded by the bucket layout.
+    :::
+
+    """
+
+    def __init__(self, buckets=None):
+        """
+
+        Args:
+            buckets (tuple): Ascending bucket upper bounds. Defaults to `LATENCY_BUCKETS` (5ms to 60s).
+
+        """
+        self.buckets = tuple(sorted(buckets or LATENCY_BUCKETS))
+        self.counts = [0] * (len(self.buckets) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "{}(count={!r}, sum={:.6f}, p50={!r}, p99={!r})".format(
+            self.__class__.__name__,
+            self.count,
+            self.sum,
+            self.quantile(0.5),
+            self.quantile(0.99),
+        )
+
+    def observe(self, value):
+        """Record one value.
+
+        Args:
+            value (float): Observed value, e.g. seconds.
+
+        """
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative(self):
+        """Return cumulative bucket counts.
+
+        Returns:
+            list: `(upper_bound, count)` pairs, ending with `(float("inf"), count)`.
+
+        """
+        with self._lock:
+            counts = list(self.counts)
+        total, out = 0, []
+        for le, n in zip(self.buckets + (float("inf"),), counts):
+            total += n
+            out.append((le, total))
+        return out
+
+    def quantile(self, q):
+        """Estimate a quantile.
+
+        Args:
+            q (float): Quantile between `0` and `1`, e.g. `0.99`.
+
+        Returns:
+            float: Estimated value, or `None` if nothing was observed.
+
+        """
+        cumulative = self.cumulative()
+        count = cumulative[-1][1]
+        if not count:
+            return None
+        rank, lower, below = q * count, 0.0, 0
+        for le, total in cumulative:
+            if total >= rank and total > below:
+                if le == float("inf"):
+                    return lower  # beyond the last bound
+                return lower + (le - lower) * (rank - below) / (total - below)
+            lower, below = le, total
+        return lower
 
 
 class ApiStats(dict):
-    """Object for storing, updating and retrieving API stats."""
+    """Object for storing, updating and retrieving API stats.
 
-    def __init__(self, *args, **kwargs):
-        super(ApiStats, self).__init__(*args, **kwargs)
-        self.transactions = 0
-        for arg in args:
-            if isinstance(arg, dict):
-                for k, v in arg.items():
-                    self[k] = v
+    :::info
+    Counters are safe to update from many threads. [incr()](#incr) adds
+    to a shard owned by the calling thread, so concurrent requests never
+    contend for a lock or lose updates; reads add the shards together.
+    Shards of threads that have exited are folded back into the totals.
+    Reads are consistent per counter, not across counters: a snapshot
+    taken while requests are in flight may show `transactions` one
+    ahead of `records`, for instance.
+
+    Counters may carry a label (`incr("status_codes", label=200)`); a
+    labeled counter reads as a `dict` of label to total. Histograms
+    returned by [histogram()](#histogram) are kept beside the counters,
+    not in the `dict`, so the stats stay JSON-serializable; read them
+    with [histograms()](#histograms).
+    :::
 
-        if kwargs:
-            for k, v in kwargs.items():
-                self[k] = v
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ApiStats, self).__init__()
+        object.__setattr__(self, "_local", threading.local())
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_shards", [])  # [(thread, {key: delta})]
+        object.__setattr__(self, "_labeled", set())  # keys with (key, label) deltas
+        object.__setattr__(self, "_histograms", {})  # {key: {label: Histogram}}
+        self["transactions"] = 0
+        self.update(*args, **kwargs)
 
     def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
         return self.get(attr)
 
     def __setattr__(self, key, value):
         self.__setitem__(key, value)
 
-    def __setitem__(self, key, value):
-        super(ApiStats, self).__setitem__(key, value)
-        self.__dict__.update({key: value})
-
     def __delattr__(self, item):
         self.__delitem__(item)
 
+    def __getitem__(self, key):
+        with self._lock:
+            return self._total(key, super(ApiStats, self).__getitem__(key))
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key in self._labeled:
+                pending = self._total(key, {})
+                value = dict(
+                    (k, value.get(k, 0) - pending.get(k, 0))
+                    for k in set(value) | set(pending)
+                )
+            else:
+                pending = self._total(key, 0)
+                if pending:
+                    value -= pending  # stored base plus shards equals `value`
+            super(ApiStats, self).__setitem__(key, value)
+
     def __delitem__(self, key):
-        super(ApiStats, self).__delitem__(key)
-        del self.__dict__[key]
+        with self._lock:
+            super(ApiStats, self).__delitem__(key)
+            self._drop(key)
+
+    def __eq__(self, other):
+        return self.snapshot() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.snapshot())
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def __reduce__(self):
+        return (self.__class__, (self.snapshot(),))
+
+    def _total(self, key, value):
+        if key in self._labeled:
+            value = dict(value)
+            for _, shard in self._shards:
+                for k, delta in shard.copy().items():
+                    if k.__class__ is tuple and k[0] == key:
+                        value[k[1]] = value.get(k[1], 0) + delta
+            return value
+        for _, shard in self._shards:
+            delta = shard.get(key)
+            if delta:
+                value += delta
+        return value
+
+    def _drop(self, key):
+        self._labeled.discard(key)
+        for _, shard in self._shards:
+            shard.pop(key, None)
+            for k in [k for k in shard.copy() if k.__class__ is tuple and k[0] == key]:
+                shard.pop(k, None)
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            pass
+        shard = self._local.shard = {}
+        with self._lock:
+            live = []
+            for thread, s in self._shards:
+                if thread.is_alive():
+                    live.append((thread, s))
+                else:  # fold exited threads into the totals
+                    for k, v in s.items():
+                        if k.__class__ is tuple:
+                            d = dict.get(self, k[0])
+                            if isinstance(d, dict):
+                                d[k[1]] = d.get(k[1], 0) + v
+                        elif dict.__contains__(self, k):
+                            dict.__setitem__(self, k, dict.__getitem__(self, k) + v)
+            live.append((threading.current_thread(), shard))
+            self._shards[:] = live
+        return shard
+
+    def incr(self, key, n=1, label=None):
+        """Add `n` to a counter without locking.
+
+        Args:
+            key (str): Counter name, created at `0` (or `{}` if labeled) if missing.
+            n (int or float): Amount to add. Defaults to `1`.
+            label (hashable): Label within the counter, e.g. a status code. Defaults to `None`.
+
+        """
+        shard = self._shard()
+        if label is not None:
+            if key not in self._labeled:
+                with self._lock:
+                    self._labeled.add(key)
+                    super(ApiStats, self).setdefault(key, {})
+            key = (key, label)
+            shard[key] = shard.get(key, 0) + n
+            return
+        shard[key] = shard.get(key, 0) + n
+        if not dict.__contains__(self, key):
+            with self._lock:
+                super(ApiStats, self).setdefault(key, 0)
+
+    def histogram(self, key, label, buckets=None):
+        """Return the histogram for `label` under `key`, creating it if needed.
+
+        Args:
+            key (str): Stat name, e.g. `latency`.
+            label (hashable): Histogram label, e.g. an endpoint name.
+            buckets (tuple): Bucket upper bounds of a new histogram. Defaults to `LATENCY_BUCKETS`.
+
+        Returns:
+            Histogram: [Histogram](#histogram) for `key` and `label`.
+
+        """
+        h = self._histograms.get(key, {}).get(label)
+        if h is None:
+            with self._lock:
+                d = self._histograms.setdefault(key, {})
+                h = d.get(label)
+                if h is None:
+                    h = d[label] = Histogram(buckets)
+        return h
+
+    def histograms(self, key=None):
+        """Return the histograms created by [histogram()](#histogram).
+
+        Args:
+            key (str): Stat name, e.g. `latency`. Defaults to `None` (every stat).
+
+        Returns:
+            dict: `{label: Histogram}` for `key`, or `{key: {label: Histogram}}` without one.
+
+        """
+        with self._lock:
+            if key is not None:
+                return dict(self._histograms.get(key, {}))
+            return dict((k, dict(d)) for k, d in self._histograms.items())
+
+    def snapshot(self):
+        """Return the current totals.
+
+        Returns:
+            dict: Plain `dict` of every stat.
+
+        """
+        with self._lock:
+            return dict(
+                (k, self._total(k, v)) for k, v in super(ApiStats, self).items()
+            )
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self.snapshot().keys()
+
+    def values(self):
+        return self.snapshot().values()
+
+    def items(self):
+        return self.snapshot().items()
+
+    def copy(self):
+        return self.snapshot()
+
+    def setdefault(self, key, default=None):
+        with self._lock:
+            return self._total(key, super(ApiStats, self).setdefault(key, default))
+
+    def update(self, *args, **kwargs):
+        for k, v in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def pop(self, key, *default):
+        with self._lock:
+            if not dict.__contains__(self, key):
+                return super(ApiStats, self).pop(key, *default)
+            value = self._total(key, super(ApiStats, self).pop(key))
+            self._drop(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            super(ApiStats, self).clear()
+            self._labeled.clear()
+            self._histograms.clear()
+            for _, shard in self._shards:
+                shard.clear()
+
+
+def _json_loads(content):
+    """Decode `bytes` or `str` with `json.loads()`, which takes `bytes` only from 3.6."""
+    if isinstance(content, bytes):
+        content = content.decode("utf-8")
+    return json.loads(content)
+
+
+def json_decoder(decoder="auto"):
+    """Resolve a JSON decoder.
+
+    Args:
+        decoder (str or callable): `json`, `ujson`, `orjson`, `auto` (fastest installed) or a callable accepting `bytes`. Defaults to `auto`.
+
+    Returns:
+        callable: Function decoding `bytes` to Python objects.
+
+    Raises:
+        CortexError: If the decoder is unknown or its library is not installed.
+
+    """
+    if callable(decoder):
+        return decoder
+    if decoder in (None, "auto"):
+        for name in ("orjson", "ujson"):
+            try:
+                return json_decoder(name)
+            except CortexError:
+                continue
+        return _json_loads
+    if decoder == "json":
+        return _json_loads
+    if decoder in ("orjson", "ujson"):
+        try:
+            module = __import__(decoder)
+        except ImportError as e:
+            raise CortexError("Module import error: %s: %s" % (decoder, e))
+        return module.loads
+    raise CortexError("Unsupported JSON decoder: %s" % decoder)
+
+
+class JSONStream(object):
+    """Incremental parser for a JSON object holding one large array."""
+
+    _whitespace = " \t\n\r"
+    _token = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*("?)|[\[\]{}]', re.S)
+    _scalar_end = re.compile(r"[\s,\]}]")
+
+    def __init__(self, chunks, encoding="utf-8", decoder=None):
+        """Parse a JSON document from an iterable of `bytes` chunks.
+
+        :::info
+        Only the elements of the array found at a given key path are
+        materialized one at a time; every other member met along the way
+        is decoded in full and stored in `fields`. Peak memory is
+        therefore about one array element plus one chunk.
+        :::
+
+        Args:
+            chunks (iterable): `bytes` or `str` chunks, e.g. `Response.iter_content()`.
+            encoding (str): Encoding of `bytes` chunks. Defaults to `utf-8`.
+            decoder (callable): Decoder for array elements, as returned by [json_decoder()](#json_decoder). Defaults to `None` (the standard library).
+
+        """
+        self.chunks = iter(chunks)
+        self.fields = {}
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._json = json.JSONDecoder()
+        self._loads = None if decoder in (json.loads, _json_loads) else decoder
+
+    def _fill(self):
+        if self._eof:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self._eof = True
+            text = self._decoder.decode(b"", final=True)
+        elif isinstance(chunk, bytes):
+            text = self._decoder.decode(chunk)
+        else:
+            text = chunk
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            while (
+                self._pos < len(self._buf) and self._buf[self._pos] in self._whitespace
+            ):
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def _expect(self, chars):
+        c = self._peek()
+        if c not in chars:
+            raise ValueError("Expecting one of %r, got %r" % (chars, c))
+        self._pos += 1
+        return c
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except ValueError:
+                if not self._fill():
+                    raise
+                continue
+            if end == len(self._buf) and self._fill():
+                continue  # a number may continue in the next chunk
+            self._pos = end
+            return value
+
+    def _end(self):
+        """Return where the value at the cursor ends, or `None` if it is not all buffered."""
+        buf, pos = self._buf, self._pos
+        if buf[pos] not in "[{\"":
+            m = self._scalar_end.search(buf, pos)
+            if m is not None:
+                return m.start()
+            return len(buf) if self._eof else None
+        depth = 0
+        for m in self._token.finditer(buf, pos):
+            token = m.group()
+            if token[0] == '"':
+                if not m.group(1):
+                    return None  # string continues in the next chunk
+                if depth == 0:
+                    return m.end()
+            elif token in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return m.end()
+        return None
+
+    def _element(self):
+        if self._loads is None:
+            return self._value()
+        self._peek()
+        while True:
+            end = self._end()
+            if end is None:
+                if not self._fill():
+                    raise ValueError("Unexpected end of JSON document")
+                continue
+            value = self._loads(self._buf[self._pos:end].encode("utf-8"))
+            self._pos = end
+            return value
+
+    def _array(self):
+        if self._peek() != "[":
+            for x in self._value() or ():
+                yield x
+            return
+        self._pos += 1
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._element()
+            if self._expect(",]") == "]":
+                return
+
+    def _object(self, path, fields):
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == path[0] and len(path) == 1:
+                for x in self._array():
+                    yield x
+            elif key == path[0] and self._peek() == "{":
+                for x in self._object(path[1:], fields.setdefault(key, {})):
+                    yield x
+            else:
+                fields[key] = self._value()
+            if self._expect(",}") == "}":
+                return
+
+    def items(self, *path):
+        """Yield the elements of the array at `path`.
+
+        Args:
+            *path (str): Keys leading to the array, e.g. `"page", "result", "data"`.
+
+        Yields:
+            Decoded array elements, in order.
+
+        Raises:
+            ValueError: If the document is not valid JSON.
+
+        """
+        return self._object(path, self.fields)
+
+
+class Prefetcher(object):
+    """Consume iterables on background threads through a bounded queue."""
+
+    def __init__(self, iterables, size=1, workers=1):
+        """Start `workers` threads draining `iterables` into a queue.
+
+        :::info
+        Each worker takes the next source from `iterables` and hands its
+        items over through a queue holding at most `size` items, so
+        producers block once the consumer falls behind. With one worker,
+        items arrive in order; with several, sources are drained
+        concurrently and their items interleave. Producers start as soon
+        as the object is created. [close()](#close) stops the producers
+        and closes each source once any item currently being produced is
+        finished. Exceptions raised by a source are re-raised to the
+        consumer.
+        :::
+
+        Args:
+            iterables (iterable): Sources to drain.
+            size (int): Max number of items buffered ahead of the consumer. Defaults to `1`.
+            workers (int): Number of producer threads. Defaults to `1`.
+
+        """
+        self._queue = queue.Queue(maxsize=max(size, 1))
+        self._stop = threading.Event()
+        self._sources = iter(iterables)
+        self._lock = threading.Lock()
+        self._running = workers
+        self._threads = []
+        for _ in range(workers):
+            t = threading.Thread(target=self._produce, name="cdl-prefetch")
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while self._running:
+            item, e = self._queue.get()
+            if item is _END:
+                self._running -= 1
+                if e is not None:
+                    self.close()
+                    raise e
+                continue
+            return item
+        raise StopIteration
+
+    next = __next__  # Python 2
+
+    def __del__(self):
+        self._stop.set()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            while not self._stop.is_set():
+                with self._lock:
+                    source = next(self._sources, _END)
+                if source is _END:
+                    break
+                try:
+                    for item in source:
+                        if not self._put((item, None)):
+                            break
+                finally:
+                    close = getattr(source, "close", None)
+                    if close is not None:
+                        close()
+        except Exception as e:
+            self._put((_END, e))
+        else:
+            self._put((_END, None))
+
+    def close(self):
+        """Stop the producers and wait for them to exit."""
+        self._stop.set()
+        for t in self._threads:
+            if t is not threading.current_thread():
+                t.join()
+        self._running = 0
+
+
+def prefetch(iterable, size=1):
+    """Consume `iterable` on a background thread, `size` items ahead.
+
+    Args:
+        iterable (iterable): Items to prefetch.
+        size (int): Max number of items buffered ahead of the consumer. Defaults to `1`.
+
+    Returns:
+        Prefetcher: [Prefetcher](#prefetcher) yielding the items of `iterable` in order.
+
+    """
+    return Prefetcher([iterable], size=size)
+
+
+def merge(iterables, size=1, workers=1):
+    """Drain several iterables concurrently, yielding items as they arrive.
+
+    Args:
+        iterables (iterable): Sources to drain.
+        size (int): Max number of items buffered ahead of the consumer. Defaults to `1`.
+        workers (int): Number of sources drained at once. Defaults to `1`.
+
+    Returns:
+        Prefetcher: [Prefetcher](#prefetcher) yielding items in arrival order.
+
+    """
+    return Prefetcher(iterables, size=size, workers=workers)
+
+
+class SingleFlight(object):
+    """Coalesce concurrent calls that share a key into a single execution.
+
+    :::info
+    The first caller for a key runs the function; callers arriving while
+    it is in flight block and receive the same result or exception. Once
+    the call completes the key is forgotten, so later calls run again.
+    :::
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` unless a call for `key` is in flight.
+
+        Args:
+            key (hashable): Identity of the call.
+            fn (callable): Function to run.
+            *args: Positional arguments for `fn`.
+            **kwargs: Keyword arguments for `fn`.
+
+        Returns:
+            tuple: `(result, shared)` where `shared` is `True` if the result came from another caller's call.
+
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event()}
+        if not leader:
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"], True
+        try:
+            call["result"] = fn(*args, **kwargs)
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+        return call["result"], False
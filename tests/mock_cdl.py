@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+"""In-memory Cortex Data Lake Query Service used by the test-suite."""
+
+import gzip
+import io
+import json
+import re
+import threading
+import time
+import uuid
+
+import requests
+import urllib3
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from urllib.parse import urlparse, parse_qsl
+except ImportError:
+    from urlparse import urlparse, parse_qsl
+
+SCHEMA = {
+    "fields": [
+        {"name": "seq", "type": "integer"},
+        {"name": "time_generated", "type": "timestamp"},
+        {"name": "app", "type": "string"},
+        {"name": "bytes", "type": "integer"},
+    ]
+}
+APPS = ["ssl", "dns", "web-browsing", "ntp", "ldap"]
+
+
+def make_row(i):
+    return {
+        "seq": i,
+        "time_generated": 1600000000 + i,
+        "app": APPS[i % len(APPS)],
+        "bytes": i * 10,
+    }
+
+
+class MockCDL(object):
+    """Minimal, thread-safe model of the `/query/v2` REST API."""
+
+    def __init__(
+        self,
+        rows=250,
+        page_size=100,
+        pending_polls=0,
+        latency=0,
+        encoding=None,
+        max_page_size=None,
+    ):
+        self.rows = rows
+        self.page_size = page_size
+        self.max_page_size = max_page_size  # server-side cap on pageSize
+        self.pending_polls = pending_polls
+        self.latency = latency
+        self.encoding = encoding  # Content-Encoding used when the client accepts it
+        self.faults = []  # (status, headers, path prefix) served before real answers
+        self.jobs = {}
+        self.requests = []
+        self.clock = 0  # submitTime of the last job, in ms
+        self.lock = threading.Lock()
+
+    def create_job(self, job_id=None, params=None, rows=None, pending_polls=None):
+        job_id = job_id or str(uuid.uuid4())
+        with self.lock:
+            self.clock = max(self.clock + 1, int(time.time() * 1000))
+            self.jobs[job_id] = {
+                "jobId": job_id,
+                "submitTime": self.clock,
+                "params": params or {},
+                "rows": self.rows if rows is None else rows,
+                "polls_left": (
+                    self.pending_polls if pending_polls is None else pending_polls
+                ),
+                "state": "RUNNING",
+            }
+        return job_id
+
+    def fail(self, status, times=1, headers=None, path=""):
+        """Answer the next `times` requests under `path` with `status`."""
+        with self.lock:
+            self.faults.extend([(status, headers or {}, path)] * times)
+
+    def _fault(self, path):
+        with self.lock:
+            for i, (status, headers, prefix) in enumerate(self.faults):
+                if path.startswith(prefix):
+                    del self.faults[i]
+                    return status, headers
+        return None
+
+    def _advance(self, job):
+        if job["state"] in ("RUNNING", "PENDING"):
+            if job["polls_left"] > 0:
+                job["polls_left"] -= 1
+            else:
+                job["state"] = "DONE"
+        return job["state"]
+
+    def handle(self, method, path, params, body):
+        """Return `(status_code, payload)` for a request."""
+        with self.lock:
+            self.requests.append((method, path, dict(params)))
+        if self.latency:
+            time.sleep(self.latency)
+        m = re.match(r"^/query/v2/jobs/?$", path)
+        if m and method == "POST":
+            job_id = self.create_job(body.get("jobId"), body.get("params"))
+            return 201, {"jobId": job_id, "uri": "/query/v2/jobs/" + job_id}
+        if m and method == "GET":
+            with self.lock:
+                after = int(params.get("createdAfter", 0))
+                jobs = [
+                    {"jobId": j["jobId"], "state": j["state"], "submitTime": t}
+                    for j in sorted(self.jobs.values(), key=lambda j: j["submitTime"])
+                    for t in [j["submitTime"]]
+                    if params.get("state") in (None, j["state"]) and t > after
+                ]
+            return 200, jobs[: int(params.get("maxJobs", len(jobs)))]
+        m = re.match(r"^/query/v2/jobs/([^/]+)$", path)
+        if m:
+            with self.lock:
+                job = self.jobs.get(m.group(1))
+                if job is None:
+                    return 404, {"errors": [{"message": "job not found"}]}
+                if method == "DELETE":
+                    job["state"] = "CANCELLED"
+                    return 200, {"jobId": job["jobId"], "state": job["state"]}
+                return 200, {
+                    "jobId": job["jobId"],
+                    "state": self._advance(job),
+                    "submitTime": job["submitTime"],
+                }
+        m = re.match(r"^/query/v2/jobResults/([^/]+)$", path)
+        if m and method == "GET":
+            with self.lock:
+                job = self.jobs.get(m.group(1))
+                if job is None:
+                    return 404, {"errors": [{"message": "job not found"}]}
+                state = self._advance(job)
+            return 200, self._results(job, state, params)
+        return 404, {"errors": [{"message": "not found"}]}
+
+    def _results(self, job, state, params):
+        payload = {"jobId": job["jobId"], "state": state}
+        if state != "DONE":
+            return payload
+        page_size = int(params.get("pageSize", self.page_size))
+        if self.max_page_size:
+            page_size = min(page_size, self.max_page_size)
+        if "pageCursor" in params:
+            start = int(params["pageCursor"])
+        elif "pageNumber" in params:
+            start = int(params["pageNumber"]) * page_size
+        else:
+            start = int(params.get("offset", 0))
+        end = min(start + page_size, job["rows"])
+        rows = [make_row(i) for i in range(start, end)]
+        if params.get("resultFormat") == "valuesArray":
+            names = [f["name"] for f in SCHEMA["fields"]]
+            data = [[row[n] for n in names] for row in rows]
+        else:
+            data = rows
+        page = {"result": {"data": data}}
+        if "pageNumber" not in params and "offset" not in params and end < job["rows"]:
+            page["pageCursor"] = str(end)
+        payload.update(
+            {
+                "rowsInJob": job["rows"],
+                "rowsInPage": len(rows),
+                "resultFormat": params.get("resultFormat", "valuesDictionary"),
+                "schema": SCHEMA,
+                "page": page,
+            }
+        )
+        return payload
+
+    def dispatch(self, method, url, body):
+        """Decode a raw request and return `(status_code, bytes, headers)`."""
+        parsed = urlparse(url)
+        headers = {"Content-Type": "application/json", "x-request-id": str(uuid.uuid4())}
+        fault = self._fault(parsed.path)
+        if fault is not None:
+            with self.lock:
+                self.requests.append((method, parsed.path, {}))
+            headers.update(fault[1])
+            payload = {"errors": [{"message": "injected fault"}]}
+            return fault[0], json.dumps(payload).encode("utf-8"), headers
+        params = dict(parse_qsl(parsed.query))
+        body = json.loads(body) if body else {}
+        status, payload = self.handle(method, parsed.path, params, body)
+        return status, json.dumps(payload).encode("utf-8"), headers
+
+
+def compress(content, encoding):
+    if encoding == "gzip":
+        return gzip.compress(content)
+    if encoding == "br":
+        import brotli
+
+        return brotli.compress(content)
+    if encoding == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor().compress(content)
+    raise ValueError(encoding)
+
+
+class MockAdapter(BaseAdapter):
+    """Requests transport adapter that answers from a `MockCDL`."""
+
+    def __init__(self, cdl):
+        super(MockAdapter, self).__init__()
+        self.cdl = cdl
+
+    def send(self, request, **kwargs):
+        status, content, headers = self.cdl.dispatch(
+            request.method, request.url, request.body
+        )
+        accepted = request.headers.get("Accept-Encoding", "")
+        if self.cdl.encoding and self.cdl.encoding in accepted:
+            content = compress(content, self.cdl.encoding)
+            headers["Content-Encoding"] = self.cdl.encoding
+        r = requests.Response()
+        r.status_code = status
+        r.reason = "OK" if status < 400 else "Error"
+        r.headers = CaseInsensitiveDict(headers)
+        r.raw = urllib3.HTTPResponse(
+            body=io.BytesIO(content),
+            headers=headers,
+            status=status,
+            preload_content=False,
+        )
+        r.url = request.url
+        r.request = request
+        r.encoding = "utf-8"
+        return r
+
+    def close(self):
+        pass
+
+
+def mount(client, cdl):
+    """Route all traffic of an `HTTPClient` to `cdl`."""
+    adapter = MockAdapter(cdl)
+    client.session.mount("https://", adapter)
+    client.session.mount("http://", adapter)
+    return adapter
+
+
+def httpx_transport(cdl):
+    """Return an `httpx.MockTransport` that answers from `cdl`."""
+    import httpx
+
+    def handler(request):
+        status, content, headers = cdl.dispatch(
+            request.method, str(request.url), request.content
+        )
+        return httpx.Response(status, content=content, headers=headers)
+
+    return httpx.MockTransport(handler)
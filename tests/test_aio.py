@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for asyncio QueryService and HTTPClient."""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+pytest.importorskip("httpx")
+
+from pan_cortex_data_lake import Credentials
+from pan_cortex_data_lake.aio import AsyncHTTPClient, AsyncQueryService
+from pan_cortex_data_lake.exceptions import (
+    RequiredKwargsError,
+    UnexpectedKwargsError,
+)
+
+from benchmarks.mock_server import make_jwt
+from tests.mock_cdl import MockCDL, httpx_transport
+
+MOCK = "http://cdl.mock"
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class TestAsyncHTTPClient:
+    def test_httpclient_unexpected_kwargs(self):
+        with pytest.raises(UnexpectedKwargsError):
+            AsyncHTTPClient(url=MOCK, foo="foo")
+
+    def test_request_unexpected_kwargs(self):
+        async def go():
+            async with AsyncHTTPClient(url=MOCK) as c:
+                await c.request(method="GET", foo="foo")
+
+        with pytest.raises(UnexpectedKwargsError):
+            run(go())
+
+    def test_http2(self):
+        pytest.importorskip("h2")
+
+        async def go():
+            async with AsyncHTTPClient(url=MOCK, http2=True) as c:
+                return c.session
+
+        assert run(go()).is_closed
+
+    def test_credentials_off_event_loop(self, tmp_path):
+        lookups = []
+
+        class StoreCredentials(Credentials):
+            def get_credentials(self):
+                lookups.append(threading.current_thread())
+                return super(StoreCredentials, self).get_credentials()
+
+        c = StoreCredentials(
+            access_token=make_jwt(time.time() + 3600),
+            storage_params={"dbfile": str(tmp_path / "credentials.json")},
+        )
+        cdl = MockCDL()
+
+        async def go():
+            async with AsyncHTTPClient(
+                url=MOCK, port=80, credentials=c, transport=httpx_transport(cdl)
+            ) as client:
+                counts = []
+                for _ in range(5):
+                    r = await client.request(method="GET", endpoint="/query/v2/jobs")
+                    assert r.request.headers["Authorization"].startswith("Bearer ")
+                    counts.append(len(lookups))
+                return threading.current_thread(), counts
+
+        loop_thread, counts = run(go())
+        assert lookups and loop_thread not in lookups
+        assert counts[0] == counts[-1]  # token reused until it expires
+
+    def test_credentials_rotated(self, tmp_path):
+        c = Credentials(
+            access_token=make_jwt(time.time() + 3600),
+            storage_params={"dbfile": str(tmp_path / "credentials.json")},
+        )
+        rotated = make_jwt(time.time() + 7200)
+        cdl = MockCDL()
+
+        async def go():
+            async with AsyncHTTPClient(
+                url=MOCK, port=80, credentials=c, transport=httpx_transport(cdl)
+            ) as client:
+                await client.request(method="GET", endpoint="/query/v2/jobs")
+                c.access_token = rotated
+                r = await client.request(method="GET", endpoint="/query/v2/jobs")
+                return r.request.headers["Authorization"]
+
+        assert run(go()) == "Bearer " + rotated
+
+    def test_credentials_single_lookup(self, tmp_path):
+        lookups = []
+
+        class SlowClient(AsyncHTTPClient):
+            @staticmethod
+            def _lookup_token(auto_refresh, credentials):
+                lookups.append(1)
+                time.sleep(0.05)
+                return AsyncHTTPClient._lookup_token(auto_refresh, credentials)
+
+        c = Credentials(
+            access_token=make_jwt(time.time() + 3600),
+            storage_params={"dbfile": str(tmp_path / "credentials.json")},
+        )
+        cdl = MockCDL()
+
+        async def go():
+            async with SlowClient(
+                url=MOCK, port=80, credentials=c, transport=httpx_transport(cdl)
+            ) as client:
+                await asyncio.gather(
+                    *[
+                        client.request(method="GET", endpoint="/query/v2/jobs")
+                        for _ in range(10)
+                    ]
+                )
+
+        run(go())
+        assert len(lookups) == 1
+
+    def test_required_method(self):
+        async def go():
+            async with AsyncHTTPClient(url=MOCK) as c:
+                await c.request(endpoint="/")
+
+        with pytest.raises(RequiredKwargsError):
+            run(go())
+
+
+class TestAsyncQueryService:
+    def test_iter_job_results(self):
+        cdl = MockCDL(rows=250, page_size=100)
+
+        async def go():
+            async with AsyncQueryService(
+                url=MOCK, port=80, transport=httpx_transport(cdl)
+            ) as qs:
+                q = await qs.create_query(query_params={"query": "SELECT 1"})
+                pages = []
+                async for p in qs.iter_job_results(job_id=q.json()["jobId"]):
+                    pages.append(p.json()["rowsInPage"])
+                return pages, qs.stats
+
+        pages, stats = run(go())
+        assert pages == [100, 100, 50]
+        assert stats.records == 250
+        assert stats.create_query == 1
+        assert stats.transactions == 4
+
+    def test_many_jobs_in_flight(self):
+        cdl = MockCDL(rows=10, page_size=10)
+
+        async def go():
+            async with AsyncQueryService(
+                url=MOCK, port=80, transport=httpx_transport(cdl)
+            ) as qs:
+                jobs = await asyncio.gather(
+                    *[qs.create_query(query_params={"query": "q"}) for _ in range(50)]
+                )
+                pages = await asyncio.gather(
+                    *[qs.get_job_results(job_id=j.json()["jobId"]) for j in jobs]
+                )
+                await qs.cancel_job(job_id=jobs[0].json()["jobId"])
+                return [p.json()["rowsInPage"] for p in pages]
+
+        assert run(go()) == [10] * 50
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Smoke tests for the benchmark suite and its mock server."""
+
+import os
+import sys
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake import Credentials, QueryService
+from pan_cortex_data_lake.policies import AdaptiveWait
+
+from benchmarks.mock_server import MockServer
+from benchmarks.throughput import SCENARIOS, run
+from tests.mock_cdl import MockCDL
+
+
+class TestMockServer:
+    def test_oauth_and_results(self):
+        cdl = MockCDL(rows=2500, page_size=1000, pending_polls=2, encoding="gzip")
+        with MockServer(cdl) as server:
+            credentials = Credentials(
+                client_id="bench",
+                client_secret="bench",
+                refresh_token="bench",
+                token_url=server.url,
+                port=server.port,
+                storage_params={"memory_storage": True},
+            )
+            qs = QueryService(
+                url=server.url,
+                port=server.port,
+                credentials=credentials,
+                wait_policy=AdaptiveWait(base=0.001, long_polls=0, jitter=False),
+            )
+            for name, scenario in SCENARIOS:
+                res = run(qs, server, scenario, repeat=1)
+                assert res["rows"] == 2500, name
+                assert res["rows_s"] > 0 and res["req_s"] > 0
+                assert res["ttfr_ms"] > 0 and res["peak_mib"] > 0
+            assert server.tokens == 1  # one RequestToken, reused afterwards
+            assert qs.stats.polls >= 2 * len(SCENARIOS)
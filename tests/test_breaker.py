@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the per-host circuit breaker."""
+
+import os
+import sys
+import time
+
+import pytest
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake.breaker import CircuitBreaker
+from pan_cortex_data_lake.exceptions import CircuitOpenError, HTTPError
+from pan_cortex_data_lake.query import QueryService
+
+from tests.mock_cdl import MockCDL, mount
+
+TARPIT = os.environ.get("TARPIT", "http://10.255.255.1")
+
+
+class TestCircuitBreaker:
+    def test_open_half_open_close(self):
+        b = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        b.before("a")
+        assert b.record("a", 503) == "closed"
+        b.before("a")
+        assert b.record("a", None) == "open"
+        with pytest.raises(CircuitOpenError) as e:
+            b.before("a")
+        assert e.value.host == "a" and 0 < e.value.retry_in <= 0.05
+        b.before("b")  # other hosts are unaffected
+        time.sleep(0.06)
+        b.before("a")
+        assert b.state("a") == "half_open"
+        with pytest.raises(CircuitOpenError):
+            b.before("a")  # single probe in flight
+        assert b.record("a", 200) == "closed"
+        assert b.states() == {"a": "closed", "b": "closed"}
+
+    def test_failed_probe_reopens(self):
+        b = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        b.record("a", 500)
+        time.sleep(0.02)
+        b.before("a")
+        assert b.record("a", 500) == "open"
+
+    def test_slow_calls(self):
+        b = CircuitBreaker(failure_threshold=2, slow_call=0.5)
+        b.record("a", 200, elapsed=1)
+        assert b.record("a", 200, elapsed=2) == "open"
+        b.reset("a")
+        assert b.state("a") == "closed"
+
+
+class TestHTTPClientBreaker:
+    def test_fail_fast(self):
+        cdl = MockCDL()
+        qs = QueryService(
+            url=TARPIT, circuit_breaker=CircuitBreaker(failure_threshold=3)
+        )
+        mount(qs._httpclient, cdl)
+        job_id = cdl.create_job()
+        cdl.fail(503, times=3)
+        for _ in range(3):
+            assert qs.get_job(job_id=job_id).status_code == 503
+        assert qs.stats.circuits == {"10.255.255.1:443": "open"}
+        sent = len(cdl.requests)
+        with pytest.raises(CircuitOpenError):
+            qs.get_job(job_id=job_id)
+        with pytest.raises(HTTPError):
+            qs.get_job(job_id=job_id)
+        assert len(cdl.requests) == sent
+        assert qs.stats.circuit_rejected == 2
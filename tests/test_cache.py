@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the local query result cache."""
+
+import os
+import sys
+import time
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake.cache import ResultCache, convert_page
+from pan_cortex_data_lake.query import QueryService
+
+from tests.mock_cdl import SCHEMA, MockCDL, mount
+
+TARPIT = os.environ.get("TARPIT", "http://10.255.255.1")
+
+
+def page(data, result_format="valuesDictionary"):
+    return {
+        "state": "DONE",
+        "resultFormat": result_format,
+        "schema": SCHEMA,
+        "page": {"result": {"data": data}},
+    }
+
+
+class TestResultCache:
+    def test_key(self):
+        a = ResultCache.key({"query": " SELECT 1 ", "dialect": "Csql"})
+        b = ResultCache.key({"dialect": "Csql", "query": "SELECT 1"})
+        assert a == b
+        assert a != ResultCache.key({"query": "SELECT 2"})
+
+    def test_lru_and_ttl(self):
+        c = ResultCache(max_entries=2, ttl=0.05)
+        c.put("a", [page([])])
+        c.put("b", [page([])])
+        c.get("a")
+        c.put("c", [page([])])
+        assert c.get("b") is None
+        assert c.get("a") is not None
+        time.sleep(0.06)
+        assert c.get("a") is None
+
+    def test_max_rows(self):
+        c = ResultCache(max_rows=1)
+        assert c.put("a", [page([{"seq": 1}, {"seq": 2}])]) is False
+        assert c.get("a") is None
+
+    def test_disk_tier(self, tmpdir):
+        d = str(tmpdir)
+        ResultCache(directory=d).put("a", [page([{"seq": 1}])])
+        c = ResultCache(directory=d)
+        assert c.get("a")[0]["page"]["result"]["data"] == [{"seq": 1}]
+        c.clear()
+        assert ResultCache(directory=d).get("a") is None
+
+    def test_disk_prune(self, tmpdir):
+        c = ResultCache(directory=str(tmpdir), max_entries=1, max_disk_entries=2)
+        for k in "abc":
+            c.put(k, [page([])])
+        assert len(os.listdir(str(tmpdir))) == 2
+
+    def test_convert_page(self):
+        p = page([{"seq": 1, "time_generated": 2, "app": "ssl", "bytes": 3}])
+        a = convert_page(p, "valuesArray")
+        assert a["page"]["result"]["data"] == [[1, 2, "ssl", 3]]
+        assert convert_page(a, "valuesDictionary")["page"]["result"]["data"] == (
+            p["page"]["result"]["data"]
+        )
+        assert convert_page(p) is p
+
+
+class TestQueryServiceCache:
+    def test_hit(self):
+        cdl = MockCDL(rows=250, page_size=100)
+        qs = QueryService(url=TARPIT, cache=True)
+        mount(qs._httpclient, cdl)
+        params = {"query": "SELECT * FROM t"}
+        job_id = qs.create_query(query_params=params).json()["jobId"]
+        first = [p.json()["rowsInPage"] for p in qs.iter_job_results(job_id=job_id)]
+        sent = len(cdl.requests)
+
+        q = qs.create_query(query_params=params)
+        assert q.status_code == 201
+        job_id = q.json()["jobId"]
+        assert qs.get_job(job_id=job_id).json()["state"] == "DONE"
+        assert [p.json()["rowsInPage"] for p in qs.iter_job_results(job_id=job_id)] == first
+        rows = list(qs.iter_records(job_id=job_id, result_format="valuesArray"))
+        assert rows[1] == [1, 1600000001, "dns", 10]
+        assert len(cdl.requests) == sent
+        assert qs.stats.cache_hits == 1
+        assert qs.stats.cache_misses == 1
+
+    def test_get_job_results_hit(self):
+        cdl = MockCDL(rows=250, page_size=100)
+        qs = QueryService(url=TARPIT, cache=True)
+        mount(qs._httpclient, cdl)
+        params = {"query": "SELECT * FROM t"}
+        job_id = qs.create_query(query_params=params).json()["jobId"]
+        list(qs.iter_job_results(job_id=job_id))
+        sent = len(cdl.requests)
+
+        job_id = qs.create_query(query_params=params).json()["jobId"]
+        first = qs.get_job_results(job_id=job_id).json()
+        assert first["jobId"] == job_id
+        assert [r["seq"] for r in first["page"]["result"]["data"]] == list(range(100))
+        nxt = qs.get_job_results(job_id=job_id, page_cursor=first["page"]["pageCursor"])
+        assert nxt.json()["page"]["result"]["data"][0]["seq"] == 100
+        r = qs.get_job_results(job_id=job_id, offset=240, result_format="valuesArray")
+        assert r.json()["rowsInPage"] == 10
+        assert r.json()["page"]["result"]["data"][0][0] == 240
+        assert len(cdl.requests) == sent
+
+    def test_hit_does_not_share_rows(self):
+        cdl = MockCDL(rows=5, page_size=100)
+        qs = QueryService(url=TARPIT, cache=True)
+        mount(qs._httpclient, cdl)
+        params = {"query": "SELECT * FROM t"}
+        job_id = qs.create_query(query_params=params).json()["jobId"]
+        list(qs.iter_job_results(job_id=job_id))
+
+        job_id = qs.create_query(query_params=params).json()["jobId"]
+        for row in qs.iter_records(job_id=job_id):
+            row["seq"] = -1
+        for p in qs.iter_job_results(job_id=job_id):
+            p.json()["page"]["result"]["data"].clear()
+        job_id = qs.create_query(query_params=params).json()["jobId"]
+        assert [r["seq"] for r in qs.iter_records(job_id=job_id)] == list(range(5))
+
+    def test_iter_records_fills_cache(self):
+        cdl = MockCDL(rows=250, page_size=100)
+        qs = QueryService(url=TARPIT, cache=ResultCache())
+        mount(qs._httpclient, cdl)
+        params = {"query": "SELECT * FROM t"}
+        job_id = qs.create_query(query_params=params).json()["jobId"]
+        assert len(list(qs.iter_records(job_id=job_id))) == 250
+        job_id = qs.create_query(query_params=params).json()["jobId"]
+        assert [r["seq"] for r in qs.iter_records(job_id=job_id)] == list(range(250))
+        assert qs.stats.cache_hits == 1
+
+    def test_partial_drain_not_cached(self):
+        cdl = MockCDL(rows=250, page_size=100)
+        qs = QueryService(url=TARPIT, cache=True)
+        mount(qs._httpclient, cdl)
+        params = {"query": "SELECT * FROM t"}
+        job_id = qs.create_query(query_params=params).json()["jobId"]
+        it = qs.iter_job_results(job_id=job_id)
+        next(it)
+        it.close()
+        qs.create_query(query_params=params)
+        assert qs.stats.cache_hits == 0
+        assert qs.stats.cache_misses == 2
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for resumable iteration checkpoints."""
+
+import json
+import os
+import sys
+
+import pytest
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake.checkpoint import Checkpoint
+from pan_cortex_data_lake.exceptions import CortexError
+from pan_cortex_data_lake.query import QueryService
+
+from tests.mock_cdl import MockCDL, mount
+
+TARPIT = os.environ.get("TARPIT", "http://10.255.255.1")
+
+
+def seqs(pages):
+    return [row["seq"] for p in pages for row in p.json()["page"]["result"]["data"]]
+
+
+def service(rows=250):
+    cdl = MockCDL(rows=rows, page_size=100)
+    qs = QueryService(url=TARPIT)
+    mount(qs._httpclient, cdl)
+    job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+    return qs, job_id
+
+
+class TestCheckpoint:
+    def test_save_load(self, tmpdir):
+        path = str(tmpdir.join("state.json"))
+        c = Checkpoint(path)
+        assert c.load() is None
+        c.save({"jobId": "a", "offset": 10})
+        assert Checkpoint(path).load() == {"jobId": "a", "offset": 10}
+        assert os.listdir(str(tmpdir)) == ["state.json"]
+        c.clear()
+        assert not os.path.exists(path)
+
+    def test_invalid(self, tmpdir):
+        tmpdir.join("state.json").write("{")
+        with pytest.raises(CortexError):
+            Checkpoint(str(tmpdir.join("state.json"))).load()
+
+    def test_resume_cursor(self, tmpdir):
+        path = str(tmpdir.join("state.json"))
+        qs, job_id = service()
+        it = qs.iter_job_results(job_id=job_id, checkpoint=path)
+        first = [next(it), next(it)]
+        it.close()  # second page was never acknowledged
+        with open(path) as f:
+            state = json.load(f)
+        assert state["jobId"] == job_id
+        assert state["pageCursor"] == "100"
+        assert state["offset"] == 100 and not state["done"]
+
+        rest = list(qs.iter_job_results(resume_from=path))
+        assert seqs(first[:1]) + seqs(rest) == list(range(250))
+        assert Checkpoint(path).load()["done"]
+        assert list(qs.iter_job_results(resume_from=path)) == []
+
+    def test_resume_mid_page(self, tmpdir):
+        path = str(tmpdir.join("state.json"))
+        qs, job_id = service()
+        seen = []
+        for p in qs.iter_job_results(job_id=job_id, checkpoint=path):
+            rows = seqs([p])
+            if rows[0] == 100:
+                seen.extend(rows[:30])  # consumer stops partway through page 2
+                break
+            seen.extend(rows)
+        rest = seqs(qs.iter_job_results(resume_from=path))
+        assert rest == list(range(100, 250))  # page 2 delivered again in full
+        assert sorted(set(seen + rest)) == list(range(250))
+
+    def test_resume_without_state(self, tmpdir):
+        qs, job_id = service()
+        path = str(tmpdir.join("state.json"))
+        with pytest.raises(CortexError):
+            next(qs.iter_job_results(resume_from=path))
+        with pytest.raises(CortexError):
+            next(qs.iter_job_results(resume_from={}))
+        pages = qs.iter_job_results(job_id=job_id, resume_from=path)
+        assert seqs(pages) == list(range(250))
+        assert Checkpoint(path).load()["done"]
+
+    def test_resume_offset(self, tmpdir):
+        qs, job_id = service()
+        state = {"jobId": job_id, "offset": 150, "pageCursor": None, "done": False}
+        assert seqs(qs.iter_job_results(resume_from=state)) == list(range(150, 250))
+
+    def test_job_mismatch(self, tmpdir):
+        qs, job_id = service()
+        with pytest.raises(CortexError):
+            next(qs.iter_job_results(job_id="other", resume_from={"jobId": job_id}))
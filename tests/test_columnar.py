@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for columnar result materialization."""
+
+import os
+import sys
+
+import pytest
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake.columnar import (
+    Column,
+    ColumnarResult,
+    DictionaryColumn,
+    NumericColumn,
+    ObjectColumn,
+)
+from pan_cortex_data_lake.exceptions import CortexError
+from pan_cortex_data_lake.query import QueryService
+
+from tests.mock_cdl import MockCDL, mount
+
+TARPIT = os.environ.get("TARPIT", "http://10.255.255.1")
+
+
+def page(data, fields=None):
+    return {
+        "resultFormat": "valuesArray",
+        "schema": {"fields": fields or []},
+        "page": {"result": {"data": data}},
+    }
+
+
+class TestColumnarResult:
+    def test_typed_columns(self):
+        fields = [
+            {"name": "n", "type": "integer"},
+            {"name": "x", "type": "double"},
+            {"name": "app", "type": "string"},
+            {"name": "ok", "type": "boolean"},
+            {"name": "tags", "type": "array"},
+        ]
+        result = ColumnarResult.from_pages(
+            [
+                page([[1, 0.5, "ssl", True, ["a"]], [2, 1.5, "dns", False, []]], fields),
+                page([[3, None, "ssl", None, None]], fields),
+            ]
+        )
+        assert len(result) == 3
+        assert isinstance(result["n"], NumericColumn)
+        assert isinstance(result["app"], DictionaryColumn)
+        assert isinstance(result["tags"], ObjectColumn)
+        assert result["app"].categories == ["ssl", "dns"]
+        assert result.to_pydict() == {
+            "n": [1, 2, 3],
+            "x": [0.5, 1.5, None],
+            "app": ["ssl", "dns", "ssl"],
+            "ok": [True, False, None],
+            "tags": [["a"], [], None],
+        }
+
+    def test_fallback_to_object(self):
+        fields = [{"name": "n", "type": "integer"}]
+        result = ColumnarResult.from_pages(
+            [page([[1], [2]], fields), page([["three"]], fields)]
+        )
+        assert isinstance(result["n"], ObjectColumn)
+        assert result["n"].to_list() == [1, 2, "three"]
+
+    def test_failed_extend_unchanged(self):
+        c = NumericColumn("n", "integer")
+        c.extend((1, None))
+        with pytest.raises(TypeError):
+            c.extend((None, "three"))
+        assert len(c) == 2 and len(c.validity) == 2
+        c.extend((None, 4))
+        assert c.to_list() == [1, None, None, 4]
+
+    def test_fallback_keeps_nulls(self):
+        fields = [{"name": "n", "type": "integer"}]
+        result = ColumnarResult.from_pages(
+            [page([[1], [None]], fields), page([[None], ["three"]], fields)]
+        )
+        assert result["n"].to_list() == [1, None, None, "three"]
+
+    def test_abstract_column(self):
+        with pytest.raises(TypeError):
+            Column("n")
+
+    def test_inferred_schema(self):
+        result = ColumnarResult.from_pages([page([[1, "a"], [2, "b"]])])
+        assert result.names == ["col0", "col1"]
+        assert isinstance(result["col0"], NumericColumn)
+
+    def test_wrong_format(self):
+        with pytest.raises(CortexError):
+            ColumnarResult().append_page({"resultFormat": "valuesDictionary"})
+
+    def test_to_numpy(self):
+        numpy = pytest.importorskip("numpy")
+        fields = [
+            {"name": "n", "type": "integer"},
+            {"name": "t", "type": "timestamp"},
+            {"name": "app", "type": "string"},
+        ]
+        result = ColumnarResult.from_pages(
+            [page([[1, 10, "ssl"], [None, 20, None]], fields)]
+        )
+        x = result.to_numpy(timestamp_unit="s")
+        assert x["n"].mask.tolist() == [False, True]
+        assert x["t"].dtype == numpy.dtype("datetime64[s]")
+        assert x["app"].tolist() == ["ssl", None]
+
+    def test_to_pandas(self):
+        pandas = pytest.importorskip("pandas")
+        fields = [{"name": "n", "type": "integer"}, {"name": "app", "type": "string"}]
+        df = ColumnarResult.from_pages(
+            [page([[1, "ssl"], [None, "dns"], [3, "ssl"]], fields)]
+        ).to_pandas()
+        assert isinstance(df["app"].dtype, pandas.CategoricalDtype)
+        assert df["n"].isna().tolist() == [False, True, False]
+        assert df["app"].tolist() == ["ssl", "dns", "ssl"]
+
+    def test_get_job_columns(self):
+        cdl = MockCDL(rows=250, page_size=100)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        result = qs.get_job_columns(job_id=job_id, workers=2)
+        assert len(result) == 250
+        assert result["seq"].to_list() == list(range(250))
+        assert len(result["app"].categories) == 5
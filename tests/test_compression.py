@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for compressed response transfer."""
+
+import os
+import sys
+
+import pytest
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake.httpclient import ACCEPT_ENCODINGS, HTTPClient
+from pan_cortex_data_lake.query import QueryService
+
+from tests.mock_cdl import MockCDL, mount
+
+TARPIT = os.environ.get("TARPIT", "http://10.255.255.1")
+MODULES = {"gzip": "gzip", "br": "brotli", "zstd": "zstandard"}
+
+
+def drain(encoding, **kwargs):
+    cdl = MockCDL(rows=1000, page_size=500, encoding=encoding)
+    qs = QueryService(url=TARPIT, **kwargs)
+    mount(qs._httpclient, cdl)
+    job_id = cdl.create_job()
+    rows = [
+        row["seq"]
+        for p in qs.iter_job_results(job_id=job_id)
+        for row in p.json()["page"]["result"]["data"]
+    ]
+    assert rows == list(range(1000))
+    return qs.stats
+
+
+class TestCompression:
+    def test_accept_encoding(self):
+        c = HTTPClient(url=TARPIT)
+        assert "gzip" in c.session.headers["Accept-Encoding"]
+        assert c.session.headers["Accept-Encoding"] == ", ".join(ACCEPT_ENCODINGS)
+        c = HTTPClient(url=TARPIT, compression=False)
+        assert c.session.headers["Accept-Encoding"] == "identity"
+
+    @pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+    def test_decode(self, encoding):
+        pytest.importorskip(MODULES[encoding])
+        if encoding not in ACCEPT_ENCODINGS:
+            pytest.skip("%s not negotiated" % encoding)
+        stats = drain(encoding)
+        assert stats.decoded_bytes > 3 * stats.wire_bytes > 0
+
+    def test_identity(self):
+        stats = drain("gzip", compression=False)
+        assert stats.decoded_bytes == stats.wire_bytes > 0
+
+    @pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+    def test_stream(self, encoding):
+        if encoding not in ACCEPT_ENCODINGS:
+            pytest.skip("%s not negotiated" % encoding)
+        cdl = MockCDL(rows=1000, page_size=500, encoding=encoding)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        job_id = cdl.create_job()
+        records = qs.iter_records(job_id=job_id, chunk_size=64)
+        assert [r["seq"] for r in records] == list(range(1000))
+        assert qs.stats.decoded_bytes > 3 * qs.stats.wire_bytes > 0
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for streaming exports."""
+
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+
+import pytest
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake.exceptions import CortexError
+from pan_cortex_data_lake.export import Exporter
+from pan_cortex_data_lake.query import QueryService
+
+from tests.mock_cdl import MockCDL, mount
+
+TARPIT = os.environ.get("TARPIT", "http://10.255.255.1")
+
+
+def read_ndjson(path, opener=open):
+    with opener(path, "rb") as f:
+        return [json.loads(line) for line in f.read().decode("utf-8").splitlines()]
+
+
+class TestExporter:
+    def test_ndjson(self, tmpdir):
+        path = str(tmpdir.join("out.ndjson"))
+        with Exporter(path, batch_size=7) as e:
+            e.write_all({"n": i, "tags": ["a"]} for i in range(100))
+        assert read_ndjson(path) == [{"n": i, "tags": ["a"]} for i in range(100)]
+        assert e.paths == [path]
+
+    def test_csv_gzip(self, tmpdir):
+        path = str(tmpdir.join("out.csv.gz"))
+        with Exporter(path, format="csv", compression="gzip") as e:
+            e.write_all({"n": i, "app": "ssl", "x": {"a": 1}} for i in range(10))
+        with gzip.open(path, "rt") as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == ["n", "app", "x"]
+        assert rows[3] == ["2", "ssl", '{"a": 1}']
+        assert len(rows) == 11
+
+    def test_zstd(self, tmpdir):
+        zstandard = pytest.importorskip("zstandard")
+        path = str(tmpdir.join("out.ndjson.zst"))
+        with Exporter(path, compression="zstd") as e:
+            e.write_all([1, 2, i] for i in range(50))
+        with open(path, "rb") as f:
+            data = zstandard.ZstdDecompressor().stream_reader(f).read()
+        assert len(data.splitlines()) == 50
+
+    def test_roll(self, tmpdir):
+        path = str(tmpdir.join("out-{index:03d}.ndjson"))
+        with Exporter(path, max_bytes=1000, batch_size=10) as e:
+            e.write_all({"n": i, "pad": "x" * 50} for i in range(200))
+        assert len(e.paths) > 1
+        rows = [r for p in e.paths for r in read_ndjson(p)]
+        assert [r["n"] for r in rows] == list(range(200))
+
+    def test_invalid(self, tmpdir):
+        with pytest.raises(CortexError):
+            Exporter(str(tmpdir.join("out")), format="xml")
+        with pytest.raises(CortexError):
+            Exporter(str(tmpdir.join("out")), max_bytes=10)
+
+    def test_writer_error(self, tmpdir):
+        e = Exporter(str(tmpdir.join("missing", "out.ndjson")), batch_size=1)
+        with pytest.raises(CortexError):
+            for i in range(100):
+                e.write({"n": i})
+            e.close()
+
+
+class TestExportJob:
+    def test_export_job(self, tmpdir):
+        cdl = MockCDL(rows=250, page_size=100)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        paths = qs.export_job(
+            job_id=job_id, path=str(tmpdir.join("out.ndjson.gz")), compression="gzip"
+        )
+        rows = read_ndjson(paths[0], gzip.open)
+        assert [r["seq"] for r in rows] == list(range(250))
+
+    def test_export_error_kept(self, tmpdir):
+        qs = QueryService(url=TARPIT)
+
+        def iter_records(**kwargs):
+            yield {"n": 1}
+            raise ValueError("boom")
+
+        qs.iter_records = iter_records
+        path = str(tmpdir.join("missing", "out.ndjson"))  # close() fails too
+        with pytest.raises(ValueError):
+            qs.export_job(job_id="x", path=path)
@@ -18,6 +18,8 @@ from pan_cortex_data_lake.exceptions import (
     CortexError,
 )
 
+from tests.mock_cdl import MockCDL, mount
+
 
 HTTPBIN = os.environ.get("HTTPBIN_URL", "http://httpbin.org")
 TARPIT = os.environ.get("TARPIT", "http://10.255.255.1")
@@ -66,3 +68,50 @@ class TestHTTPClient:
             HTTPClient(url=HTTPBIN, port=80, raise_for_status=True).request(
                 method="GET", endpoint="/status/400"
             )
+
+
+class TestEndpoint:
+    def test_matches_request(self):
+        cdl = MockCDL()
+        c = HTTPClient(url=TARPIT, headers={"X-Tenant": "t"}, params={"a": "1"})
+        mount(c, cdl)
+        job_id = cdl.create_job()
+        e = c.endpoint("GET", "/query/v2/jobs/{job_id}")
+        assert c.endpoint("get", "/query/v2/jobs/{job_id}") is e
+        r = e(job_id=job_id, params={"b": 2})
+        slow = c.request(
+            method="GET", endpoint="/query/v2/jobs/" + job_id, params={"a": "1", "b": 2}
+        )
+        assert r.json() == slow.json()
+        assert r.request.url == slow.request.url
+        assert r.request.headers == slow.request.headers
+        assert c.stats.transactions == 2
+
+    def test_json_body(self):
+        cdl = MockCDL()
+        c = HTTPClient(url=TARPIT)
+        mount(c, cdl)
+        r = c.endpoint("POST", "/query/v2/jobs")(json={"jobId": "abc"})
+        assert r.status_code == 201 and "abc" in cdl.jobs
+
+    def test_session_changes(self):
+        cdl = MockCDL()
+        c = HTTPClient(url=TARPIT, headers={"X-Tenant": "a"})
+        mount(c, cdl)
+        job_id = cdl.create_job()
+        e = c.endpoint("GET", "/query/v2/jobs/{job_id}")
+        assert e(job_id=job_id).request.headers["X-Tenant"] == "a"
+        assert c.endpoint("GET", "/query/v2/jobs/{job_id}") is e
+        c.session.headers["X-Tenant"] = "b"
+        c.session.params = {"a": "1"}
+        r = c.endpoint("GET", "/query/v2/jobs/{job_id}")(job_id=job_id)
+        assert r.request.headers["X-Tenant"] == "b"
+        assert r.request.url.endswith("?a=1")
+
+    def test_cache_bound(self):
+        c = HTTPClient(url=TARPIT)
+        c.max_endpoints = 2
+        first = c.endpoint("GET", "/a")
+        c.endpoint("GET", "/b")
+        c.endpoint("GET", "/c")
+        assert c.endpoint("GET", "/a") is not first
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for stats histograms and OpenMetrics export."""
+
+import json
+import os
+import sys
+
+import requests
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake.metrics import (
+    endpoint_name,
+    openmetrics,
+    rows_per_second,
+    serve,
+)
+from pan_cortex_data_lake.query import QueryService
+from pan_cortex_data_lake.utils import ApiStats, Histogram
+
+from tests.mock_cdl import MockCDL, mount
+
+TARPIT = os.environ.get("TARPIT", "http://10.255.255.1")
+
+
+class TestHistogram:
+    def test_buckets(self):
+        h = Histogram(buckets=(1, 2, 4))
+        for v in (0.5, 1, 1.5, 3, 10):
+            h.observe(v)
+        assert h.counts == [2, 1, 1, 1]
+        assert h.count == 5 and h.sum == 16
+        assert h.cumulative()[-1] == (float("inf"), 5)
+
+    def test_quantile(self):
+        h = Histogram(buckets=(0.1, 0.2))
+        assert h.quantile(0.5) is None
+        for _ in range(100):
+            h.observe(0.15)
+        assert abs(h.quantile(0.5) - 0.15) < 1e-9
+        assert h.quantile(0.99) <= 0.2
+
+
+class TestLabeledStats:
+    def test_labels(self):
+        stats = ApiStats()
+        stats.incr("status_codes", label=200)
+        stats.incr("status_codes", 2, label=503)
+        assert stats.status_codes == {200: 1, 503: 2}
+        stats.status_codes = {}
+        stats.incr("status_codes", label=200)
+        assert stats.status_codes == {200: 1, 503: 0}
+        h = stats.histogram("latency", "get_job")
+        assert stats.histograms("latency") == {"get_job": h}
+        assert stats.histograms() == {"latency": {"get_job": h}}
+        assert "latency" not in stats
+
+
+class TestMetrics:
+    def test_endpoint_name(self):
+        url = "https://api.us.cdl.paloaltonetworks.com:443"
+        assert endpoint_name("POST", url + "/query/v2/jobs") == "create_query"
+        assert endpoint_name("GET", url + "/query/v2/jobs?pageSize=1") == "list_jobs"
+        assert endpoint_name("GET", url + "/query/v2/jobs/abc") == "get_job"
+        assert endpoint_name("DELETE", url + "/query/v2/jobs/abc") == "cancel_job"
+        assert endpoint_name("GET", url + "/query/v2/jobResults/abc") == (
+            "get_job_results"
+        )
+        assert endpoint_name("POST", url + "/api/oauth2/RequestToken") == "token"
+
+    def drain(self, **kwargs):
+        cdl = MockCDL(rows=250, page_size=100)
+        qs = QueryService(url=TARPIT, **kwargs)
+        mount(qs._httpclient, cdl)
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        rows = list(qs.iter_records(job_id=job_id))
+        assert len(rows) == 250
+        return qs
+
+    def test_request_stats(self):
+        qs = self.drain()
+        assert qs.stats.status_codes == {201: 1, 200: 3}
+        latency = qs.stats.histograms("latency")
+        assert latency["get_job_results"].count == 3
+        assert latency["create_query"].count == 1
+        assert json.loads(json.dumps(qs.stats))["status_codes"] == {"201": 1, "200": 3}
+        assert qs.stats.sent_bytes > 0 and qs.stats.wire_bytes > 0
+        assert rows_per_second(qs.stats) > 0
+
+    def test_openmetrics(self):
+        qs = self.drain()
+        text = openmetrics(qs.stats)
+        assert text.endswith("# EOF\n")
+        assert "# TYPE cdl_transactions counter\ncdl_transactions_total 4\n" in text
+        assert 'cdl_responses_total{code="200"} 3' in text
+        assert (
+            'cdl_latency_seconds_bucket{endpoint="get_job_results",le="+Inf"} 3'
+            in text
+        )
+        assert 'cdl_latency_seconds_count{endpoint="create_query"} 1' in text
+        assert "# TYPE cdl_rows_per_second gauge" in text
+        assert "job_waits" not in text
+
+    def test_serve(self):
+        qs = self.drain()
+        server = serve(qs.stats, port=0)
+        try:
+            r = requests.get("http://127.0.0.1:%d/metrics" % server.server_port)
+            assert r.headers["Content-Type"].startswith("application/openmetrics-text")
+            assert "cdl_records_total 250" in r.text
+        finally:
+            server.shutdown()
+            server.server_close()
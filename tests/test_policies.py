@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for wait and retry policies."""
+
+import os
+import sys
+
+import pytest
+import requests
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake.exceptions import HTTPError
+from pan_cortex_data_lake.policies import (
+    AdaptiveWait,
+    FixedWait,
+    RetryPolicy,
+    WaitPolicy,
+)
+from pan_cortex_data_lake.query import QueryService
+
+from tests.mock_cdl import MockCDL, mount
+
+TARPIT = os.environ.get("TARPIT", "http://10.255.255.1")
+
+
+class TestWaitPolicies:
+    def test_fixed_wait(self):
+        p = FixedWait(interval=2)
+        assert p.max_wait(0) is None
+        assert [p.delay(n) for n in range(3)] == [2, 2, 2]
+
+    def test_adaptive_wait(self):
+        p = AdaptiveWait(long_polls=2, base=0.1, factor=2, ceiling=0.4, jitter=False)
+        assert p.max_wait(0) == 2000
+        assert [p.delay(n) for n in range(6)] == [0, 0, 0.1, 0.2, 0.4, 0.4]
+        assert p.delay(10 ** 6) == 0.4
+
+    def test_adaptive_wait_jitter(self):
+        p = AdaptiveWait(long_polls=0, base=1, ceiling=1)
+        for n in range(20):
+            assert 0.5 <= p.delay(n) <= 1
+
+    def test_base_policy(self):
+        assert WaitPolicy().max_wait(0) is None
+        assert WaitPolicy().delay(0) == 0
+
+
+class TestRetryPolicy:
+    def test_idempotent(self):
+        p = RetryPolicy()
+        assert p.idempotent("GET")
+        assert p.idempotent("get")
+        assert not p.idempotent("DELETE")
+        assert not p.idempotent("POST", {"params": {"query": "SELECT 1"}})
+        assert p.idempotent("POST", {"jobId": "abc", "params": {}})
+        assert p.retry_status(503) and not p.retry_status(404)
+
+    def test_delay(self):
+        p = RetryPolicy(base=0.1, ceiling=1)
+        d = None
+        for _ in range(50):
+            n = p.delay(d)
+            assert 0.1 <= n <= min(1, 3 * (d or 0.1))
+            d = n
+
+
+class TestRetries:
+    def service(self, **kwargs):
+        cdl = MockCDL()
+        qs = QueryService(
+            url=TARPIT, retry_policy=RetryPolicy(base=0.001, ceiling=0.01), **kwargs
+        )
+        mount(qs._httpclient, cdl)
+        return cdl, qs
+
+    def test_get_5xx(self):
+        cdl, qs = self.service()
+        job_id = cdl.create_job()
+        cdl.fail(503, times=2)
+        assert qs.get_job(job_id=job_id).status_code == 200
+        assert qs.stats.retries == 2 and qs.stats.retry_sleep > 0
+        cdl.fail(500, times=4)
+        assert qs.get_job(job_id=job_id).status_code == 500
+        assert qs.stats.retries == 5
+
+    def test_create_query(self):
+        cdl, qs = self.service()
+        cdl.fail(502)
+        assert qs.create_query(query_params={"query": "x"}).status_code == 502
+        assert qs.stats.retries == 0
+        cdl.fail(502)
+        r = qs.create_query(job_id="abc", query_params={"query": "x"})
+        assert r.status_code == 201 and qs.stats.retries == 1
+
+    def test_connection_error(self):
+        cdl, qs = self.service()
+        job_id = cdl.create_job()
+        adapter = qs._httpclient.session.get_adapter("http://")
+        send, calls = adapter.send, []
+
+        def flaky(request, **kwargs):
+            calls.append(request.method)
+            if len(calls) == 1:
+                raise requests.ConnectionError("reset")
+            return send(request, **kwargs)
+
+        adapter.send = flaky
+        assert qs.get_job(job_id=job_id).status_code == 200
+        assert calls == ["GET", "GET"]
+        del calls[:]
+        with pytest.raises(HTTPError):
+            qs.cancel_job(job_id=job_id)  # DELETE is not retried by default
+        assert calls == ["DELETE"]
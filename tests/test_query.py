@@ -3,8 +3,12 @@
 
 """Tests for LoggingService."""
 
+import json
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
@@ -13,7 +17,13 @@ sys.path[:0] = [os.path.join(curpath, os.pardir)]
 
 from pan_cortex_data_lake.query import QueryService
 from pan_cortex_data_lake.httpclient import HTTPClient
-from pan_cortex_data_lake.exceptions import UnexpectedKwargsError
+from pan_cortex_data_lake.exceptions import (
+    DeadlineExceededError,
+    UnexpectedKwargsError,
+)
+from pan_cortex_data_lake.policies import AdaptiveWait, FixedWait
+
+from tests.mock_cdl import MockCDL, mount
 
 
 HTTPBIN = os.environ.get("HTTPBIN_URL", "http://httpbin.org")
@@ -31,6 +41,7 @@ class TestQueryService:
         QueryService(url=TARPIT).get_job
         QueryService(url=TARPIT).get_job_results
         QueryService(url=TARPIT).iter_job_results
+        QueryService(url=TARPIT).iter_records
         QueryService(url=TARPIT).list_jobs
 
     def test_unexpected_kwargs(self):
@@ -40,3 +51,406 @@ class TestQueryService:
     def test_session(self):
         session = HTTPClient(url=TARPIT)
         QueryService(session=session)
+
+    def test_iter_job_results_long_poll(self):
+        cdl = MockCDL(rows=250, page_size=100, pending_polls=3)
+        qs = QueryService(
+            url=TARPIT,
+            wait_policy=AdaptiveWait(long_polls=1, base=0.01, jitter=False),
+        )
+        mount(qs._httpclient, cdl)
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        pages = [p.json()["rowsInPage"] for p in qs.iter_job_results(job_id=job_id)]
+        assert pages == [100, 100, 50]
+        waits = [p.get("maxWait") for _, path, p in cdl.requests if "jobResults" in path]
+        assert waits == ["2000"] * 4 + [None] * 2
+        assert qs.stats.polls == 3
+        assert qs.stats.job_waits[job_id]["polls"] == 3
+        assert abs(qs.stats.poll_sleep - 0.03) < 1e-9
+
+    def test_job_waits_bounded(self):
+        qs = QueryService(url=TARPIT)
+        for i in range(1100):
+            qs._record_wait("job-%d" % i, 1, 0.5, 1.0)
+        assert len(qs.stats.job_waits) == 1024
+        assert "job-0" not in qs.stats.job_waits and "job-1099" in qs.stats.job_waits
+        assert qs.stats.polls == 1100
+
+    def test_iter_job_results_parallel(self):
+        cdl = MockCDL(rows=1050, page_size=100)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        seqs = []
+        for p in qs.iter_job_results(job_id=job_id, workers=4, reorder_buffer=3):
+            seqs.extend(row["seq"] for row in p.json()["page"]["result"]["data"])
+        assert seqs == list(range(1050))
+        assert qs.stats.records == 1050
+        offsets = [p.get("offset") for _, path, p in cdl.requests if "jobResults" in path]
+        assert sorted(offsets[1:], key=int) == [str(x) for x in range(100, 1050, 100)]
+
+    def test_iter_job_results_parallel_capped_page_size(self):
+        cdl = MockCDL(rows=1000, page_size=100, max_page_size=100)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        seqs = []
+        for p in qs.iter_job_results(
+            job_id=job_id, params={"pageSize": 500}, workers=2
+        ):
+            seqs.extend(row["seq"] for row in p.json()["page"]["result"]["data"])
+        assert seqs == list(range(1000))
+
+    def test_iter_job_results_parallel_short_page(self):
+        cdl = MockCDL(rows=1000, page_size=100)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        it = qs.iter_job_results(job_id=job_id, workers=4)
+        seqs = [row["seq"] for row in next(it).json()["page"]["result"]["data"]]
+        cdl.max_page_size = 60  # later pages come back shorter than the stride
+        for p in it:
+            seqs.extend(row["seq"] for row in p.json()["page"]["result"]["data"])
+        assert seqs == list(range(1000))
+
+    def test_iter_job_results_parallel_close(self):
+        cdl = MockCDL(rows=10000, page_size=10)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        it = qs.iter_job_results(job_id=job_id, workers=2, reorder_buffer=4)
+        next(it)
+        next(it)
+        it.close()
+        assert qs.stats.get_job_results < 10
+
+    def test_iter_job_results_prefetch(self):
+        cdl = MockCDL(rows=1000, page_size=100)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        pages = [
+            p.json()["rowsInPage"] for p in qs.iter_job_results(job_id=job_id, prefetch=2)
+        ]
+        assert pages == [100] * 10
+
+        it = qs.iter_job_results(job_id=job_id, prefetch=2)
+        next(it)
+        it.close()
+        assert qs.stats.get_job_results <= 10 + 4
+
+    def test_iter_records(self):
+        cdl = MockCDL(rows=250, page_size=100, pending_polls=1)
+        qs = QueryService(url=TARPIT, wait_policy=AdaptiveWait(jitter=False))
+        mount(qs._httpclient, cdl)
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        rows = list(qs.iter_records(job_id=job_id, chunk_size=7))
+        assert [row["seq"] for row in rows] == list(range(250))
+        assert qs.stats.records == 250
+        rows = list(qs.iter_records(job_id=job_id, result_format="valuesArray"))
+        assert rows[3] == [3, 1600000003, "ntp", 30]
+
+    def test_decode_once(self):
+        decoded = []
+
+        def decoder(b):
+            decoded.append(b)
+            return json.loads(b)
+
+        cdl = MockCDL(rows=250, page_size=100)
+        qs = QueryService(url=TARPIT, json_decoder=decoder, enforce_json=True)
+        mount(qs._httpclient, cdl)
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        del decoded[:]
+        pages = [p.json()["rowsInPage"] for p in qs.iter_job_results(job_id=job_id)]
+        assert pages == [100, 100, 50]
+        assert len(decoded) == 3
+
+        del decoded[:]
+        rows = list(qs.iter_records(job_id=job_id, chunk_size=64))
+        assert [row["seq"] for row in rows] == list(range(250))
+        assert len(decoded) == 250
+
+    def test_run_many(self):
+        cdl = MockCDL(rows=150, page_size=100, pending_polls=1)
+        qs = QueryService(url=TARPIT, wait_policy=AdaptiveWait(jitter=False))
+        mount(qs._httpclient, cdl)
+        queries = ["SELECT %d" % i for i in range(20)]
+        runs = list(qs.run_many(queries, max_concurrency=4, drain=True))
+        assert sorted(r.index for r in runs) == list(range(20))
+        assert all(r.ok and r.rows == 150 and len(r.pages) == 2 for r in runs)
+        assert set(runs[0].timing) == {"submit", "wait", "drain", "total"}
+        assert qs.stats.create_query == 20
+        assert all(r.pages == [] for r in qs.run_many(queries[:2]))
+
+    def test_run_many_close_cancels(self):
+        cdl = MockCDL(rows=10)
+        submitted = threading.Barrier(4, timeout=5)  # every query has its job
+        create_job = cdl.create_job
+
+        def create_slow_job(job_id=None, params=None):
+            job_id = create_job(
+                job_id, params, pending_polls=0 if params["query"] == "fast" else 10000
+            )
+            submitted.wait()
+            return job_id
+
+        cdl.create_job = create_slow_job
+        handle = cdl.handle
+        cancelled = threading.Event()
+
+        def counting_handle(method, path, params, body):
+            result = handle(method, path, params, body)
+            states = [j["state"] for j in cdl.jobs.values()]
+            if method == "DELETE" and states.count("CANCELLED") == 3:
+                cancelled.set()
+            return result
+
+        cdl.handle = counting_handle
+        qs = QueryService(url=TARPIT, wait_policy=FixedWait(0.05))
+        mount(qs._httpclient, cdl)
+        it = qs.run_many(["fast", "slow", "slow", "slow"], max_concurrency=4)
+        fast = next(it).job_id
+        started = time.time()
+        it.close()
+        assert time.time() - started < 0.2
+        assert cancelled.wait(5)
+        assert [j["state"] for k, j in cdl.jobs.items() if k != fast] == ["CANCELLED"] * 3
+        assert cdl.jobs[fast]["state"] == "DONE"
+
+    def test_run_many_submit_kwargs(self):
+        cdl = MockCDL(rows=150, page_size=100)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        runs = list(
+            qs.run_many(
+                ["SELECT 1"], json={"jobId": "mine"}, page_size=50, drain=True
+            )
+        )
+        assert runs[0].job_id == "mine"
+        assert [p["rowsInPage"] for p in runs[0].pages] == [50, 50, 50]
+
+    def test_run_many_error(self):
+        cdl = MockCDL(rows=10)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        cdl.handle = lambda *args: (500, {"errors": [{"message": "boom"}]})
+        runs = list(qs.run_many([{"query": "SELECT 1"}], drain=False))
+        assert runs[0].state == "ERROR"
+        assert "boom" in runs[0].error
+
+    def test_run_many_unexpected_error(self):
+        cdl = MockCDL(rows=10)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        cdl.handle = lambda *args: (201, {"uri": "/query/v2/jobs/x"})  # no jobId
+        runs = list(qs.run_many(["SELECT 1", "SELECT 2"]))
+        assert [r.state for r in runs] == ["ERROR", "ERROR"]
+        assert "jobId" in runs[0].error
+
+    def test_job_limit_cancels(self):
+        cdl = MockCDL(rows=250, page_size=100)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        with qs.job("SELECT 1") as job:
+            rows = list(job.records(limit=10))
+            assert job.cancelled
+        assert len(rows) == 10
+        assert cdl.jobs[job.job_id]["state"] == "CANCELLED"
+        assert qs.stats.cancel_job == 1
+
+    def test_job_drained_not_cancelled(self):
+        cdl = MockCDL(rows=250, page_size=100)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        with qs.job({"query": "SELECT 1"}) as job:
+            assert len(list(job.pages())) == 3
+        assert job.finished and not job.cancelled
+        assert qs.stats.cancel_job == 0
+
+    def test_job_exception_cancels(self):
+        cdl = MockCDL(rows=250, page_size=100)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        with pytest.raises(RuntimeError):
+            with qs.job("SELECT 1") as job:
+                for row in job.records():
+                    raise RuntimeError("consumer failed")
+        assert cdl.jobs[job.job_id]["state"] == "CANCELLED"
+
+    def test_job_deadline(self):
+        cdl = MockCDL(rows=250, page_size=100)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        with pytest.raises(DeadlineExceededError):
+            with qs.job("SELECT 1", deadline=0) as job:
+                list(job.records())
+        assert cdl.jobs[job.job_id]["state"] == "CANCELLED"
+        assert qs.stats.cancel_job == 1
+
+    def test_job_deadline_while_pending(self):
+        cdl = MockCDL(rows=250, page_size=100, pending_polls=30)
+        qs = QueryService(url=TARPIT, wait_policy=FixedWait(0.05))
+        mount(qs._httpclient, cdl)
+        for drain in (lambda job: list(job.records()), lambda job: list(job.pages())):
+            started = time.time()
+            with pytest.raises(DeadlineExceededError):
+                with qs.job("SELECT 1", deadline=0.2) as job:
+                    drain(job)
+            assert time.time() - started < 0.5
+            assert cdl.jobs[job.job_id]["state"] == "CANCELLED"
+        assert qs.stats.cancel_job == 2
+
+    def test_iter_jobs(self):
+        cdl = MockCDL()
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        ids = [cdl.create_job() for _ in range(25)]
+        assert [j["jobId"] for j in qs.iter_jobs(page_size=10)] == ids
+        assert qs.stats.list_jobs == 3
+        assert [j["jobId"] for j in qs.iter_jobs(page_size=10, max_jobs=12)] == ids[:12]
+
+    def test_iter_jobs_shared_submit_time(self):
+        cdl = MockCDL()
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        ids = [cdl.create_job() for _ in range(7)]
+        for job_id, t in zip(ids, [1000, 1000, 1000, 1001, 1001, 1001, 1002]):
+            cdl.jobs[job_id]["submitTime"] = t
+        handle = cdl.handle
+
+        def unsorted(method, path, params, body):
+            status, payload = handle(method, path, params, body)
+            if method == "GET" and path == "/query/v2/jobs":
+                payload = payload[::-1]
+            return status, payload
+
+        for h in (handle, unsorted):
+            cdl.handle = h
+            jobs = [j["jobId"] for j in qs.iter_jobs(page_size=2)]
+            assert sorted(jobs) == sorted(ids)
+            jobs = [j["jobId"] for j in qs.iter_jobs(page_size=2, created_before=1001)]
+            assert sorted(jobs) == sorted(ids[:6])
+            jobs = [j["jobId"] for j in qs.iter_jobs(page_size=2, max_jobs=5)]
+            assert len(jobs) == len(set(jobs)) == 5
+
+    def test_poll_jobs(self):
+        cdl = MockCDL()
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        ids = [cdl.create_job() for _ in range(250)]
+        cdl.jobs[ids[0]]["state"] = "DONE"
+        jobs = qs.poll_jobs(ids[:200], created_after=0)
+        assert sorted(jobs) == sorted(ids[:200])
+        assert jobs[ids[0]]["state"] == "DONE"
+        assert qs.stats.list_jobs == 2 and qs.stats.get_job == 0
+
+        jobs = qs.poll_jobs(ids[:3] + ["missing"], state="DONE")
+        assert jobs[ids[0]]["state"] == "DONE"
+        assert sorted(jobs) == sorted(ids[:3])
+        assert qs.stats.list_jobs == 3 and qs.stats.get_job == 3
+
+    def test_poll_jobs_bounded(self):
+        cdl = MockCDL()
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        hour = 3600000
+        for _ in range(500):
+            cdl.jobs[cdl.create_job()]["submitTime"] -= hour
+        mine = [
+            qs.create_query(query_params={"query": "SELECT %d" % i}).json()["jobId"]
+            for i in range(5)
+        ]
+        for _ in range(500):
+            cdl.jobs[cdl.create_job()]["submitTime"] += hour
+        # recorded submit times bound the listing; unknown IDs are not scanned for
+        jobs = qs.poll_jobs(mine + ["missing"], page_size=1000)
+        assert sorted(jobs) == sorted(mine)
+        assert qs.stats.list_jobs == 1 and qs.stats.get_job == 1
+        listed = [p for _, path, p in cdl.requests if path == "/query/v2/jobs"]
+        assert int(listed[-1]["createdAfter"]) > 0
+        # later polls use the submit times seen in the listing
+        jobs = qs.poll_jobs(mine, page_size=2)
+        assert sorted(jobs) == sorted(mine)
+        assert qs.stats.list_jobs == 4
+
+    def test_coalesce(self):
+        cdl = MockCDL(latency=0.1)
+        qs = QueryService(url=TARPIT, coalesce=True)
+        mount(qs._httpclient, cdl)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            job_ids = set(
+                pool.map(
+                    lambda sql: qs.create_query(query_params={"query": sql}).json()[
+                        "jobId"
+                    ],
+                    ["SELECT 1", " SELECT 1 "] * 4,
+                )
+            )
+            assert len(job_ids) == 1
+            job_id = job_ids.pop()
+            states = set(
+                pool.map(
+                    lambda _: qs.get_job(job_id=job_id).json()["state"], range(8)
+                )
+            )
+        assert states == {"DONE"}
+        assert qs.stats.create_query == 1 and qs.stats.get_job == 1
+        assert qs.stats.coalesced == 14
+
+    def test_coalesce_copies_response(self):
+        cdl = MockCDL(latency=0.1)
+        qs = QueryService(url=TARPIT, coalesce=True)
+        mount(qs._httpclient, cdl)
+        job_id = cdl.create_job()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            responses = list(pool.map(lambda _: qs.get_job(job_id=job_id), range(4)))
+        assert qs.stats.get_job == 1 and qs.stats.coalesced == 3
+        assert len(set(id(r) for r in responses)) == 4
+        payloads = [r.json() for r in responses]
+        payloads[0]["state"] = "MUTATED"
+        assert [p["state"] for p in payloads[1:]] == ["DONE"] * 3
+
+    def test_session_headers_seen_by_all_methods(self):
+        cdl = MockCDL()
+        qs = QueryService(url=TARPIT, headers={"X-Tenant": "a"})
+        mount(qs._httpclient, cdl)
+        job_id = cdl.create_job()
+        qs.get_job(job_id=job_id)
+        qs._httpclient.session.headers["X-Tenant"] = "b"
+        for r in (qs.get_job(job_id=job_id), qs.list_jobs()):
+            assert r.request.headers["X-Tenant"] == "b"
+
+    def test_coalesce_not_shared_by_jobs(self):
+        cdl = MockCDL(rows=250, page_size=100, latency=0.05)
+        qs = QueryService(url=TARPIT, coalesce=True)
+        mount(qs._httpclient, cdl)
+
+        def first_row(_):
+            with qs.job("SELECT 1") as job:
+                next(job.records())
+                return job.job_id
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            job_ids = set(pool.map(first_row, range(4)))
+        assert len(job_ids) == 4
+        assert qs.stats.coalesced == 0
+        assert all(cdl.jobs[j]["state"] == "CANCELLED" for j in job_ids)
+
+    def test_shared_across_threads(self):
+        cdl = MockCDL(rows=250, page_size=50)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+
+        def drain(i):
+            r = qs.create_query(query_params={"query": "SELECT %d" % i})
+            return sum(1 for _ in qs.iter_records(job_id=r.json()["jobId"]))
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            counts = list(pool.map(drain, range(32)))
+        assert counts == [250] * 32
+        assert qs.stats.create_query == 32
+        assert qs.stats.records == 32 * 250
+        assert qs.stats.transactions == sum(
+            qs.stats[k] for k in ("create_query", "get_job", "get_job_results")
+        )
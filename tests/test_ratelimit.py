@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for client-side rate limiting."""
+
+import os
+import sys
+import time
+from email.utils import formatdate
+
+import pytest
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake.exceptions import CortexError
+from pan_cortex_data_lake.query import QueryService
+from pan_cortex_data_lake.ratelimit import RateLimiter, TokenBucket, retry_after
+
+from tests.mock_cdl import MockCDL, mount
+
+TARPIT = os.environ.get("TARPIT", "http://10.255.255.1")
+
+
+class FakeResponse(object):
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class TestTokenBucket:
+    def test_rate(self):
+        bucket = TokenBucket(100, burst=1)
+        started = time.monotonic()
+        waited = sum(bucket.acquire() for _ in range(11))
+        assert time.monotonic() - started >= 0.09
+        assert waited >= 0.09
+
+    def test_throttle_and_recover(self):
+        bucket = TokenBucket(10, increase=2)
+        bucket.throttle(retry_after=0.05)
+        assert bucket.rate == 5
+        started = time.monotonic()
+        bucket.acquire()
+        assert time.monotonic() - started >= 0.05
+        for _ in range(5):
+            bucket.success()
+        assert bucket.rate == 10
+        for _ in range(10):
+            bucket.throttle()
+        assert bucket.rate == bucket.min_rate
+
+    def test_invalid(self):
+        with pytest.raises(CortexError):
+            TokenBucket(0)
+        with pytest.raises(CortexError):
+            RateLimiter({"bogus": 1})
+
+
+class TestRateLimiter:
+    def test_group(self):
+        group = RateLimiter.group
+        assert group("POST", "https://x:443/query/v2/jobs") == "submit"
+        assert group("GET", "https://x:443/query/v2/jobs") == "jobs"
+        assert group("DELETE", "https://x:443/query/v2/jobs/abc") == "jobs"
+        assert group("GET", "https://x:443/query/v2/jobResults/abc") == "results"
+        assert group("POST", "https://x:443/api/oauth2/RequestToken") == "token"
+        limiter = RateLimiter({"submit": 1}, default=None)
+        assert limiter.bucket("GET", "https://x/query/v2/jobs") is None
+
+    def test_retry_after(self):
+        assert retry_after(FakeResponse({"Retry-After": "2"})) == 2
+        assert retry_after(FakeResponse({})) == 1
+        assert retry_after(FakeResponse({"Retry-After": "soon"}), 3) == 3
+        later = formatdate(time.time() + 30, usegmt=True)
+        assert 25 < retry_after(FakeResponse({"Retry-After": later})) <= 30
+
+    def test_http_429(self):
+        cdl = MockCDL()
+        qs = QueryService(url=TARPIT, rate_limit={"submit": 100})
+        mount(qs._httpclient, cdl)
+        cdl.fail(429, times=2, headers={"Retry-After": "0.05"})
+        started = time.monotonic()
+        r = qs.create_query(query_params={"query": "SELECT 1"})
+        assert r.status_code == 201
+        assert time.monotonic() - started >= 0.1
+        assert qs.stats.throttled == 2
+        assert qs.stats.rate_limit_wait >= 0.1
+        assert qs._httpclient.rate_limit.buckets["submit"].rate == 26  # halved twice, then one success
+
+    def test_http_429_exhausted(self):
+        cdl = MockCDL()
+        qs = QueryService(url=TARPIT, rate_limit=RateLimiter(default=1000, max_retries=1))
+        mount(qs._httpclient, cdl)
+        cdl.fail(429, times=2, headers={"Retry-After": "0"})
+        assert qs.get_job(job_id="x").status_code == 429
+        assert qs.stats.throttled == 2
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for time-range sharded query execution."""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake.exceptions import CortexError
+from pan_cortex_data_lake.policies import RetryPolicy
+from pan_cortex_data_lake.query import QueryService
+from pan_cortex_data_lake.sharding import format_timestamp, time_shards
+
+from tests.mock_cdl import MockCDL, mount
+
+TARPIT = os.environ.get("TARPIT", "http://10.255.255.1")
+SQL = "SELECT * FROM t WHERE ts >= '{start}' AND ts < '{end}'"
+
+
+class ShardCDL(MockCDL):
+    """Tags rows with their query and fails selected jobs once."""
+
+    def __init__(self, fail=(), **kwargs):
+        super(ShardCDL, self).__init__(**kwargs)
+        self.fail = set(fail)
+
+    def _results(self, job, state, params):
+        query = job["params"]["query"]
+        if state == "DONE" and query in self.fail:
+            self.fail.discard(query)
+            return {"jobId": job["jobId"], "state": "FAILED"}
+        payload = super(ShardCDL, self)._results(job, state, params)
+        for row in payload.get("page", {}).get("result", {}).get("data", []):
+            row["query"] = query
+        return payload
+
+
+class TestTimeShards:
+    def test_shards(self):
+        shards = time_shards(0, 100, shards=3)
+        assert [s.index for s in shards] == [0, 1, 2]
+        assert shards[0].start == datetime(1970, 1, 1, tzinfo=shards[0].start.tzinfo)
+        assert shards[-1].end == shards[0].start + timedelta(seconds=100)
+        assert all(a.end == b.start for a, b in zip(shards, shards[1:]))
+
+    def test_shard_size(self):
+        shards = time_shards(0, 86400 * 30, shard_size=timedelta(days=7))
+        assert len(shards) == 5
+        assert shards[-1].end - shards[-1].start == timedelta(days=2)
+
+    def test_invalid(self):
+        with pytest.raises(CortexError):
+            time_shards(10, 0, shards=2)
+        with pytest.raises(CortexError):
+            time_shards(0, 10)
+
+    def test_format(self):
+        assert format_timestamp(time_shards(0, 1, shards=1)[0].start) == (
+            "1970-01-01 00:00:00"
+        )
+
+
+class TestIterSharded:
+    def queries(self, n):
+        return [
+            SQL.format(start=format_timestamp(s.start), end=format_timestamp(s.end))
+            for s in time_shards(0, 40, shards=n)
+        ]
+
+    def test_ordered(self):
+        cdl = ShardCDL(rows=120, page_size=50)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        rows = list(qs.iter_sharded(SQL, 0, 40, shards=4, max_concurrency=2))
+        assert [r["query"] for r in rows] == [
+            q for q in self.queries(4) for _ in range(120)
+        ]
+        assert qs.stats.create_query == 4
+
+    def test_unordered(self):
+        cdl = ShardCDL(rows=120, page_size=50)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        rows = list(qs.iter_sharded(SQL, 0, 40, shards=4, ordered=False))
+        assert len(rows) == 480
+        assert sorted(set(r["query"] for r in rows)) == sorted(self.queries(4))
+
+    def test_retry_failed_shard(self):
+        cdl = ShardCDL(fail=[self.queries(4)[2]], rows=10, page_size=10)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        rows = list(qs.iter_sharded(SQL, 0, 40, shards=4))
+        assert len(rows) == 40
+        assert qs.stats.create_query == 5
+
+    def test_retries_exhausted(self):
+        cdl = ShardCDL(fail=[self.queries(2)[0]], rows=10)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        with pytest.raises(CortexError):
+            list(qs.iter_sharded(SQL, 0, 40, shards=2, max_retries=0))
+
+    def test_retry_backoff(self):
+        delays = []
+
+        class Policy(RetryPolicy):
+            def delay(self, previous=None):
+                delays.append(previous)
+                return 0.01
+
+        cdl = ShardCDL(fail=[self.queries(2)[1]], rows=10)
+        qs = QueryService(url=TARPIT, retry_policy=Policy())
+        mount(qs._httpclient, cdl)
+        assert len(list(qs.iter_sharded(SQL, 0, 40, shards=2))) == 20
+        assert delays == [None]
+
+    def test_close_cancels_shards(self):
+        cdl = ShardCDL(rows=100, page_size=10)
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        for ordered in (True, False):
+            it = qs.iter_sharded(SQL, 0, 40, shards=4, ordered=ordered, buffer=1)
+            next(it)
+            it.close()
+        assert [j["state"] for j in cdl.jobs.values()] == ["CANCELLED"] * 8
+
+    def test_failure_cancels_shards(self):
+        cdl = ShardCDL(fail=[self.queries(2)[0]], rows=10)
+        create_job = cdl.create_job
+        cdl.create_job = lambda job_id=None, params=None: create_job(
+            job_id,
+            params,
+            pending_polls=0 if params["query"] == self.queries(2)[0] else 10000,
+        )
+        qs = QueryService(url=TARPIT)
+        mount(qs._httpclient, cdl)
+        with pytest.raises(CortexError):
+            list(qs.iter_sharded(SQL, 0, 40, shards=2, max_retries=0))
+        slow = [j for j in cdl.jobs.values() if j["params"]["query"] == self.queries(2)[1]]
+        assert [j["state"] for j in slow] == ["CANCELLED"]
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for per-phase request timing hooks."""
+
+import json
+import os
+import sys
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake.httpclient import HTTPClient
+from pan_cortex_data_lake.query import QueryService
+from pan_cortex_data_lake.timing import TimedHTTPAdapter
+
+from tests.mock_cdl import MockCDL, mount
+
+TARPIT = os.environ.get("TARPIT", "http://10.255.255.1")
+
+
+class FakeCredentials(object):
+    class _Creds(object):
+        access_token = "token"
+
+    def get_credentials(self):
+        return self._Creds()
+
+    def jwt_is_expired(self, token):
+        return False
+
+
+class Recorder(object):
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, phase, seconds, timing):
+        self.calls.append((phase, seconds, timing))
+
+    def phases(self):
+        return [c[0] for c in self.calls]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        body = json.dumps({"state": "DONE", "rowsInPage": 0}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("x-request-id", "req-1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestTiming:
+    def test_unused(self):
+        c = HTTPClient(url=TARPIT)
+        assert not isinstance(c.adapter, TimedHTTPAdapter)
+        assert c.timing_hooks == []
+
+    def test_phases(self):
+        hook = Recorder()
+        qs = QueryService(
+            url=TARPIT, credentials=FakeCredentials(), timing_hooks=[hook]
+        )
+        mount(qs._httpclient, MockCDL(rows=10, page_size=10))
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        assert hook.phases() == ["credential", "connect", "ttfb", "download", "decode"]
+        timing = hook.calls[0][2]
+        assert timing.request_id and timing.status_code == 201
+        assert timing.method == "POST" and timing.url.endswith("/query/v2/jobs")
+        assert all(seconds >= 0 for _, seconds, _ in hook.calls)
+
+        del hook.calls[:]
+        rows = list(qs.iter_records(job_id=job_id))
+        assert len(rows) == 10
+        assert "download" in hook.phases() and "decode" not in hook.phases()
+
+    def test_hook_errors_ignored(self):
+        def broken(phase, seconds, timing):
+            raise ValueError(phase)
+
+        qs = QueryService(url=TARPIT, timing_hooks=[broken])
+        mount(qs._httpclient, MockCDL(rows=10, page_size=10))
+        assert qs.create_query(query_params={"query": "SELECT 1"}).status_code == 201
+
+    def test_connect(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        t = threading.Thread(target=server.serve_forever)
+        t.daemon = True
+        t.start()
+        try:
+            hook = Recorder()
+            c = HTTPClient(
+                url="http://127.0.0.1", port=server.server_port, timing_hooks=[hook]
+            )
+            for _ in range(2):
+                c.request(method="GET", endpoint="/query/v2/jobs/x").json()
+            connects = [s for p, s, _ in hook.calls if p == "connect"]
+            assert connects[0] > 0 and connects[1] == 0  # reused connection
+            assert hook.calls[0][2].request_id == "req-1"
+        finally:
+            server.shutdown()
+            server.server_close()
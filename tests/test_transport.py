@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the HTTP/2 transport adapter."""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake.exceptions import HTTPError
+from pan_cortex_data_lake.httpclient import HTTPClient
+from pan_cortex_data_lake.policies import RetryPolicy
+from pan_cortex_data_lake.query import QueryService
+from pan_cortex_data_lake.transport import HTTP2Adapter
+
+from tests.mock_cdl import MockCDL, httpx_transport
+
+TARPIT = os.environ.get("TARPIT", "http://10.255.255.1")
+
+
+def service(cdl, transport=None, **kwargs):
+    qs = QueryService(url=TARPIT, **kwargs)
+    adapter = HTTP2Adapter(transport=transport or httpx_transport(cdl))
+    qs._httpclient.session.mount("http://", adapter)
+    return qs
+
+
+class TestHTTP2Adapter:
+    def test_http2_option(self):
+        pytest.importorskip("h2")
+        c = HTTPClient(url=TARPIT, http2=True, pool_maxsize=4)
+        assert isinstance(c.adapter, HTTP2Adapter)
+        assert c.session.get_adapter("https://x") is c.adapter
+
+    def test_pages(self):
+        cdl = MockCDL(rows=1050, page_size=100)
+        qs = service(cdl)
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        seqs = []
+        for p in qs.iter_job_results(job_id=job_id, workers=4):
+            assert p.status_code == 200
+            seqs.extend(row["seq"] for row in p.json()["page"]["result"]["data"])
+        assert seqs == list(range(1050))
+
+    def test_stream(self):
+        cdl = MockCDL(rows=250, page_size=100)
+        qs = service(cdl)
+        job_id = qs.create_query(query_params={"query": "SELECT 1"}).json()["jobId"]
+        records = qs.iter_records(job_id=job_id, chunk_size=7)
+        assert [r["seq"] for r in records] == list(range(250))
+
+    def test_connection_error(self):
+        cdl, calls = MockCDL(), []
+        inner = httpx_transport(cdl)
+
+        def handler(request):
+            calls.append(request.method)
+            if len(calls) == 1:
+                raise httpx.ConnectError("refused", request=request)
+            return inner.handle_request(request)
+
+        qs = service(
+            cdl,
+            transport=httpx.MockTransport(handler),
+            retry_policy=RetryPolicy(base=0.001),
+        )
+        job_id = cdl.create_job()
+        assert qs.get_job(job_id=job_id).status_code == 200
+        assert qs.stats.retries == 1
+        calls[:] = []
+        with pytest.raises(HTTPError):
+            qs.cancel_job(job_id=job_id)
+
+    def test_proxies(self):
+        pytest.importorskip("h2")
+        seen = []
+
+        class Proxy(BaseHTTPRequestHandler):
+            def do_GET(self):
+                seen.append(self.path)
+                body = json.dumps({"jobId": "abc", "state": "DONE"}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Proxy)
+        server.daemon_threads = True
+        t = threading.Thread(target=server.serve_forever)
+        t.daemon = True
+        t.start()
+        try:
+            proxy = "http://127.0.0.1:%d" % server.server_port
+            qs = QueryService(url=TARPIT, port=80, http2=True, proxies={"http": proxy})
+            assert qs.get_job(job_id="abc").json()["state"] == "DONE"
+            assert qs.list_jobs().status_code == 200
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert seen == [TARPIT + "/query/v2/jobs/abc", TARPIT + "/query/v2/jobs"]
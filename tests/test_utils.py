@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for SDK utilities."""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+curpath = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(curpath, os.pardir)]
+
+from pan_cortex_data_lake.exceptions import CortexError
+from pan_cortex_data_lake.utils import (
+    ApiStats,
+    JSONStream,
+    SingleFlight,
+    json_decoder,
+    merge,
+    prefetch,
+)
+
+
+class TestApiStats:
+    def test_concurrent_incr(self):
+        stats = ApiStats({"records": 0})
+
+        def work():
+            for _ in range(10000):
+                stats.incr("transactions")
+                stats.incr("records", 2)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert stats.transactions == 80000
+        assert stats["records"] == 160000
+        assert dict(stats) == {"transactions": 80000, "records": 160000}
+        assert json.loads(json.dumps(stats)) == stats
+        stats.incr("records")  # exited threads' shards were folded
+        assert len(stats._shards) == 1
+
+    def test_assign(self):
+        stats = ApiStats(transactions=3)
+        stats.incr("transactions", 2)
+        stats.incr("cache_hits")
+        assert stats == {"transactions": 5, "cache_hits": 1}
+        stats.transactions = 0
+        stats.incr("transactions")
+        assert stats.transactions == 1
+        assert stats.missing is None
+        del stats.cache_hits
+        assert "cache_hits" not in stats
+
+
+class TestPrefetch:
+    def test_order(self):
+        assert list(prefetch(range(100), 3)) == list(range(100))
+
+    def test_exception(self):
+        def gen():
+            yield 1
+            raise ValueError("boom")
+
+        it = prefetch(gen(), 2)
+        assert next(it) == 1
+        with pytest.raises(ValueError):
+            next(it)
+
+    def test_close(self):
+        closed = threading.Event()
+
+        def gen():
+            try:
+                for i in range(10 ** 6):
+                    yield i
+            finally:
+                closed.set()
+
+        it = prefetch(gen(), 2)
+        assert next(it) == 0
+        it.close()
+        assert closed.is_set()
+
+
+class TestMerge:
+    def test_merge(self):
+        sources = [range(i * 100, (i + 1) * 100) for i in range(5)]
+        assert sorted(merge(sources, size=4, workers=3)) == list(range(500))
+
+    def test_merge_exception(self):
+        def bad():
+            yield 1
+            raise ValueError("boom")
+
+        it = merge([range(1000), bad()], size=1, workers=2)
+        with pytest.raises(ValueError):
+            list(it)
+
+
+class TestJSONStream:
+    def test_items(self):
+        doc = {
+            "jobId": "x",
+            "page": {"result": {"data": [{"n": i, "s": u"\u00e9" * i} for i in range(20)]}},
+            "state": "DONE",
+            "rowsInPage": 20,
+        }
+        b = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+        for n in (1, 3, 64, len(b)):
+            js = JSONStream(b[i:i + n] for i in range(0, len(b), n))
+            assert list(js.items("page", "result", "data")) == doc["page"]["result"]["data"]
+            assert js.fields["state"] == "DONE"
+            assert js.fields["rowsInPage"] == 20
+
+    def test_missing_path(self):
+        js = JSONStream([b'{"state": "RUNNING"}'])
+        assert list(js.items("page", "result", "data")) == []
+        assert js.fields == {"state": "RUNNING"}
+
+    def test_truncated(self):
+        js = JSONStream([b'{"page": {"result": {"data": [1, 2'])
+        with pytest.raises(ValueError):
+            list(js.items("page", "result", "data"))
+
+    def test_decoder(self):
+        data = [1, -2.5e3, None, True, "a]\\\"}", {"b": ["[", {}]}, [[], "x"]]
+        b = json.dumps({"page": {"result": {"data": data}}, "state": "DONE"}).encode()
+        decoded = []
+
+        def decoder(raw):
+            decoded.append(raw)
+            return json.loads(raw.decode("utf-8"))
+
+        for n in (1, 2, 5, len(b)):
+            del decoded[:]
+            chunks = (b[i:i + n] for i in range(0, len(b), n))
+            js = JSONStream(chunks, decoder=decoder)
+            assert list(js.items("page", "result", "data")) == data
+            assert len(decoded) == len(data)
+            assert js.fields["state"] == "DONE"
+        js = JSONStream([b'{"page": {"result": {"data": [{"a": 1'], decoder=decoder)
+        with pytest.raises(ValueError):
+            list(js.items("page", "result", "data"))
+
+
+class TestJSONDecoder:
+    def test_builtin(self):
+        assert json_decoder("json")(b'{"a": 1}') == {"a": 1}
+        assert json_decoder("json")('{"a": 1}') == {"a": 1}
+        assert json_decoder("auto")(b'{"a": 1}') == {"a": 1}
+        assert json_decoder(len) is len
+
+    def test_unsupported(self):
+        with pytest.raises(CortexError):
+            json_decoder("yaml")
+
+
+class TestSingleFlight:
+    def test_coalesce(self):
+        flights, calls, results = SingleFlight(), [], []
+        started, release = threading.Event(), threading.Event()
+
+        def fn():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return "x"
+
+        leader = threading.Thread(target=lambda: results.append(flights.do("k", fn)))
+        leader.start()
+        started.wait()
+        followers = [
+            threading.Thread(target=lambda: results.append(flights.do("k", fn)))
+            for _ in range(4)
+        ]
+        for t in followers:
+            t.start()
+        time.sleep(0.1)  # let the followers join the flight
+        release.set()
+        for t in [leader] + followers:
+            t.join()
+        assert len(calls) == 1
+        assert sorted(results) == [("x", False)] + [("x", True)] * 4
+        assert len(flights) == 0
+        assert flights.do("k", lambda: "y") == ("y", False)
+
+    def test_error(self):
+        flights = SingleFlight()
+
+        def fn():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            flights.do("k", fn)
+        assert len(flights) == 0